@@ -1,15 +1,36 @@
-from .nos import plot_nos
-from .jbi_case_report import plot_jbi_case_report
-from .jbi_case_series import plot_jbi_case_series
-from .grade import plot_grade
-from .robis import plot_robis
-from .mmat import plot_mmat
-
-__all__ = [
-    "plot_nos",
-    "plot_jbi_case_report",
-    "plot_jbi_case_series",
-    "plot_grade",
-    "plot_robis",
-    "plot_mmat"
-]
\ No newline at end of file
+import importlib
+
+# Plot functions load on first use, so ``import critiplot`` (and the
+# numpy/matplotlib-only render modules) work without pandas installed
+_PLOTTERS = {
+    "plot_nos": "nos",
+    "plot_jbi_case_report": "jbi_case_report",
+    "plot_jbi_case_series": "jbi_case_series",
+    "plot_grade": "grade",
+    "plot_robis": "robis",
+    "plot_mmat": "mmat",
+    "plot_aggregate": "aggregate",
+    "plot_diff": "diff",
+    "summarize": "summary",
+}
+
+__all__ = list(_PLOTTERS)
+
+
+def __getattr__(name):
+    if name not in _PLOTTERS:
+        raise AttributeError(f"module 'critiplot' has no attribute {name!r}")
+    try:
+        module = importlib.import_module(f".{_PLOTTERS[name]}", __name__)
+    except ModuleNotFoundError as e:
+        if e.name not in ("pandas", "pyarrow"):
+            raise
+        raise ImportError(f"{name} parses input files and needs {e.name}; "
+                          "install it with: pip install 'critiplot[pandas]'") from e
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
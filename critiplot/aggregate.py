@@ -0,0 +1,215 @@
+import math
+import os
+from typing import NamedTuple
+
+import pandas as pd
+from matplotlib.artist import setp
+from matplotlib.lines import Line2D
+
+from . import jbi_case_report, jbi_case_series, mmat, nos, robis
+from .cache import load_or_process
+from .render import (ThemedFigure, check_output_format, legend_handles, new_figure, output_targets,
+                     render_variants)
+
+
+class AggregateTool(NamedTuple):
+    """How to load one input of a tool and turn it into study judgments.
+
+    ``rated`` marks the cells that count towards a domain's total even
+    without a judgment, as in the tool's own summary bars.
+    """
+    read: object
+    process: object
+    judgments: object
+    theme_options: dict
+    categories: list
+    rated: object = None
+
+
+TOOLS = {
+    "nos": AggregateTool(nos.read_input_file, nos.process_detailed_nos, nos.study_judgments,
+                         nos.THEME_OPTIONS, ["High", "Moderate", "Low"]),
+    "robis": AggregateTool(robis.read_input_file, robis.process_robis, robis.study_judgments,
+                           robis.THEME_OPTIONS, ["High", "Unclear", "Low"]),
+    "jbi_case_report": AggregateTool(jbi_case_report.read_input_file, jbi_case_report.process_jbi_case_report,
+                                     jbi_case_report.study_judgments, jbi_case_report.THEME_OPTIONS,
+                                     ["High", "Unclear", "Low", "Not Applicable"]),
+    "jbi_case_series": AggregateTool(jbi_case_series.read_input_file, jbi_case_series.process_jbi_case_series,
+                                     jbi_case_series.study_judgments, jbi_case_series.THEME_OPTIONS,
+                                     ["High", "Unclear", "Low", "Not Applicable"]),
+    "mmat": AggregateTool(mmat.read_input_file, mmat.process_mmat, mmat.study_judgments,
+                          mmat.THEME_OPTIONS, ["High", "Moderate", "Low"], mmat.rated_cells),
+}
+# Judgment of cells that are rated but not drawn; they only add to the total
+UNJUDGED = "Unjudged"
+
+SAVED_MESSAGE = "✅ Aggregate plot saved to {}"
+
+
+def get_tool(tool: str) -> AggregateTool:
+    if tool not in TOOLS:
+        raise ValueError(f"Tool {tool} cannot be aggregated. Choose from {list(TOOLS.keys())}")
+    return TOOLS[tool]
+
+
+def judgment_table(input_files: list, tool: str, labels: list = None, cache: bool = False) -> pd.DataFrame:
+    """Stack every input's judgments into one long table of (review, domain, judgment).
+
+    Each input is read, normalized and reduced to its judgments in turn, so
+    only the long table is kept; the three columns are categorical. Cells
+    without a judgment are dropped, except those the tool rates (an MMAT
+    Overall_Rating of Yes/No/Can't tell), which are kept as ``UNJUDGED``.
+    ``labels`` names the reviews and defaults to the input file stems.
+    """
+    spec = get_tool(tool)
+    if labels is None:
+        labels = [os.path.splitext(os.path.basename(f))[0] for f in input_files]
+    if len(labels) != len(input_files):
+        raise ValueError(f"Got {len(labels)} labels for {len(input_files)} input files")
+    if len(set(labels)) != len(labels):
+        raise ValueError("Review labels must be unique; pass labels=[...] to name the inputs")
+
+    frames = []
+    domains = {}
+    for label, input_file in zip(labels, input_files):
+        if not os.path.exists(input_file):
+            raise FileNotFoundError(f"Input file not found: {input_file}")
+        df = load_or_process(input_file, tool, lambda: spec.process(spec.read(input_file)), cache)
+        judgments = spec.judgments(df)
+        if spec.rated is not None:
+            judgments = judgments.mask(judgments.isna() & spec.rated(df).to_numpy(), UNJUDGED)
+        domains.update(dict.fromkeys(judgments.columns))
+        long = judgments.melt(var_name="domain", value_name="judgment").dropna(subset=["judgment"])
+        long.insert(0, "review", label)
+        frames.append(long)
+
+    table = pd.concat(frames, ignore_index=True)
+    return table.astype({
+        "review": pd.CategoricalDtype(labels, ordered=True),
+        "domain": pd.CategoricalDtype(list(domains), ordered=True),
+        "judgment": pd.CategoricalDtype([*spec.categories, UNJUDGED] if spec.rated else spec.categories),
+    })
+
+
+def review_percentages(table: pd.DataFrame, categories: list) -> pd.DataFrame:
+    """Percent of judged studies per (review, domain) and judgment, in one group-by pass.
+
+    ``UNJUDGED`` cells count towards the total and are then left out of
+    the columns, so those rows sum to less than 100.
+    """
+    percentages = (
+        table.groupby(["review", "domain"], observed=True)["judgment"]
+        .value_counts(normalize=True)
+        .mul(100)
+        .unstack("judgment", fill_value=0)
+    )
+    return percentages.reindex(columns=categories, fill_value=0)
+
+
+def build_aggregate_figure(percentages: pd.DataFrame, tool: str, theme: str = "default") -> ThemedFigure:
+    """Lay out one stacked-bar facet per domain with a bar per review"""
+    spec = get_tool(tool)
+    if theme not in spec.theme_options:
+        raise ValueError(f"Theme {theme} not available. Choose from {list(spec.theme_options.keys())}")
+    colors = spec.theme_options[theme]
+
+    reviews = list(percentages.index.get_level_values("review").categories)
+    domains = list(percentages.index.get_level_values("domain").categories)
+    n_cols = min(4, len(domains))
+    n_rows = math.ceil(len(domains) / n_cols)
+    facet_height = max(3.0, 0.35 * len(reviews) + 1.5)
+
+    fig = new_figure(figsize=(5.5 * n_cols + 3, facet_height * n_rows))
+    axes = fig.subplots(n_rows, n_cols, sharey=True, squeeze=False)
+    themed = ThemedFigure(fig, spec.theme_options, lambda family, colors: [])
+
+    inverted_reviews = reviews[::-1]
+    for ax, domain in zip(axes.flat, domains):
+        domain_percentages = percentages.xs(domain, level="domain").reindex(inverted_reviews, fill_value=0)
+        left = None
+        for risk in spec.categories:
+            values = domain_percentages[risk].to_numpy()
+            bars = ax.barh(inverted_reviews, values, left=left, color=colors.get(risk, "#BBBBBB"),
+                           edgecolor='black', height=0.90)
+            for patch in bars:
+                themed.bind(patch, risk)
+            left = values if left is None else left + values
+
+        ax.set_title(domain, fontsize=16, fontweight="bold")
+        ax.set_xlim(0, 100)
+        ax.set_xticks([0, 50, 100])
+        ax.tick_params(axis='both', labelsize=12)
+        ax.grid(axis='x', linestyle='--', alpha=0.25)
+        for label in ax.get_yticklabels() + ax.get_xticklabels():
+            label.set_fontweight("bold")
+    for ax in axes.flat[len(domains):]:
+        ax.axis('off')
+
+    fig.supxlabel("Percentage of Studies (%)", fontsize=16, fontweight="bold")
+    fig.suptitle(f"{tool.replace('_', ' ').upper()} Risk-of-Bias Distribution Across {len(reviews)} Reviews",
+                 fontsize=20, fontweight="bold")
+
+    legend_elements = [
+        Line2D([0], [0], marker='s', color='w', label=risk,
+               markerfacecolor=colors.get(risk, "#BBBBBB"), markersize=16)
+        for risk in spec.categories[::-1]
+    ]
+    legend = fig.legend(handles=legend_elements, title="Risk", loc='upper left',
+                        bbox_to_anchor=(1.0, 0.95), fontsize=14, title_fontsize=16)
+    legend.get_frame().set_edgecolor('black')
+    setp(legend.get_title(), fontweight="bold")
+    for handle, risk in zip(legend_handles(legend), spec.categories[::-1]):
+        themed.bind(handle, risk)
+
+    fig.tight_layout()
+    themed.set_theme(theme)
+    return themed
+
+
+def plot_aggregate(input_files: list, output_file: str = None, tool: str = "robis", theme: str = "default",
+                   labels: list = None, cache: bool = False, outputs: dict = None, max_memory=None,
+                   png_options: dict = None, vector_options: dict = None, deterministic: bool = False):
+    """
+    Compare domain-level risk-of-bias distributions across many reviews in one figure.
+
+    Parameters:
+    -----------
+    input_files : list
+        One input file per review, in any format the tool's plot function reads
+    output_file : str
+        Path to save the faceted plot (supports .png, .pdf, .svg, .eps)
+    tool : str, optional
+        "nos", "robis", "jbi_case_report", "jbi_case_series" or "mmat". Default is "robis"
+    theme : str, optional
+        Any theme of the tool. Default is "default"
+    labels : list, optional
+        Review names, one per input file. Default is the input file stems
+    cache : bool, optional
+        Reuse each input's Feather sidecar of normalized data. Default is False
+    outputs : dict, optional
+        Extra {output_path: theme} variants recolored from one layout pass
+    max_memory : int or str, optional
+        Memory budget for saving, as for the plot_* functions
+    png_options : dict, optional
+        PNG encoding options, as for the plot_* functions
+    vector_options : dict, optional
+        SVG/PDF/EPS text options, as for the plot_* functions
+    deterministic : bool, optional
+        Byte-reproducible saves that skip unchanged outputs, as for the plot_* functions
+
+    Returns:
+    --------
+    pd.DataFrame
+        Percentages indexed by (review, domain) with one column per judgment
+    """
+    spec = get_tool(tool)
+    targets = output_targets(output_file, theme, outputs, spec.theme_options)
+    for path, _ in targets:
+        check_output_format(path)
+
+    table = judgment_table(input_files, tool, labels, cache)
+    percentages = review_percentages(table, spec.categories)
+    render_variants(lambda t: build_aggregate_figure(percentages, tool, t), targets, SAVED_MESSAGE, max_memory,
+                    png_options=png_options, vector_options=vector_options,
+                    deterministic=deterministic)
+    return percentages
@@ -0,0 +1,101 @@
+import math
+import multiprocessing
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+from .memory import AGG_MAX_PIXELS, band_bbox, draw_band, measure_bands
+from .png import PNG_SIGNATURE, png_chunk
+
+# Raw RGBA bytes a worker holds for one band; taller figures get more bands than workers
+BAND_BYTES = 256 * 2 ** 20
+ADLER_BASE = 65521
+
+# The figure being saved, set before the pool forks so every worker inherits it
+_job = None
+
+
+def adler32_combine(adler1: int, adler2: int, len2: int) -> int:
+    """Adler-32 of A + B from the checksums of A and B and the length of B (as zlib's adler32_combine)"""
+    rem = len2 % ADLER_BASE
+    sum1 = adler1 & 0xFFFF
+    sum2 = rem * sum1 % ADLER_BASE
+    sum1 = (sum1 + (adler2 & 0xFFFF) + ADLER_BASE - 1) % ADLER_BASE
+    sum2 = (sum2 + (adler1 >> 16) + (adler2 >> 16) + ADLER_BASE - rem) % ADLER_BASE
+    return sum1 | sum2 << 16
+
+
+def band_rows(width: int, height: int, processes: int) -> int:
+    """Rows per band: an even split over ``processes``, within Agg's limit and ``BAND_BYTES``"""
+    limit = min(AGG_MAX_PIXELS - 1, max(1, BAND_BYTES // (4 * width + 1)))
+    return min(limit, math.ceil(height / processes))
+
+
+def _render_band(index: int) -> tuple:
+    """Draw and deflate band ``index`` of ``_job``; returns (raw deflate, adler32, length)"""
+    fig, bands, dpi, extents, level, save_options = _job
+    scanlines = draw_band(fig, bands[index], dpi, extents, save_options)
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    mode = zlib.Z_FINISH if index == len(bands) - 1 else zlib.Z_SYNC_FLUSH
+    data = compressor.compress(scanlines) + compressor.flush(mode)
+    return data, zlib.adler32(scanlines), len(scanlines)
+
+
+def fork_context():
+    """The "fork" multiprocessing context, or None where processes can't be forked"""
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context("fork")
+
+
+def save_banded_png(fig, output_file: str, dpi: float, processes: int = None, compression: int = 6,
+                    **save_options):
+    """Save ``fig`` as an RGBA PNG whose horizontal bands are drawn in parallel processes.
+
+    The tight bounding box is measured once, so every band shares the same
+    x-layout, and the workers are forked after the figure is built: each
+    draws its bands (header, legend and summary land in whichever band
+    covers them) and returns them as raw deflate ended by a sync flush.
+    The parent writes the bands in order as IDAT chunks and closes the zlib
+    stream with the Adler-32 combined from the bands' checksums. Where
+    ``fork`` is unavailable (Windows, or ``processes`` of 1) the bands are
+    drawn one after the other in this process, giving the same file.
+    """
+    global _job
+    processes = processes or os.cpu_count() or 1
+    save_options.pop("bbox_inches", None)
+    bbox, extents = measure_bands(fig, dpi, save_options.pop("pad_inches", None))
+    width, height = int(bbox.width * dpi), int(bbox.height * dpi)
+    rows = band_rows(width, height, processes)
+    bands = [band_bbox(bbox, height, y, min(rows, height - y), dpi) for y in range(0, height, rows)]
+
+    context = fork_context() if processes > 1 and len(bands) > 1 else None
+    ppm = int(round(dpi / 0.0254))
+    tmp_path = f"{output_file}.tmp"
+    _job = (fig, bands, dpi, extents, compression, save_options)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(PNG_SIGNATURE)
+            f.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+            f.write(png_chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1)))
+            f.write(png_chunk(b"IDAT", zlib.compress(b"", compression)[:2]))
+            checksum = zlib.adler32(b"")
+            if context is None:
+                checksum = _write_bands(f, map(_render_band, range(len(bands))), checksum)
+            else:
+                with ProcessPoolExecutor(max_workers=min(processes, len(bands)), mp_context=context) as pool:
+                    checksum = _write_bands(f, pool.map(_render_band, range(len(bands))), checksum)
+            f.write(png_chunk(b"IDAT", struct.pack(">I", checksum)))
+            f.write(png_chunk(b"IEND", b""))
+    finally:
+        _job = None
+    os.replace(tmp_path, output_file)
+
+
+def _write_bands(f, rendered, checksum: int) -> int:
+    """Write each band's deflate data as an IDAT chunk, folding its Adler-32 into ``checksum``"""
+    for data, adler, length in rendered:
+        f.write(png_chunk(b"IDAT", data))
+        checksum = adler32_combine(checksum, adler, length)
+    return checksum
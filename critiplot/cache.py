@@ -0,0 +1,102 @@
+import json
+import os
+
+import pandas as pd
+
+CACHE_FORMAT = 2
+METADATA_KEY = b"critiplot"
+
+
+def cache_path(input_file: str, tool: str) -> str:
+    """Sidecar path holding the normalized data of ``input_file`` for ``tool``"""
+    return f"{input_file}.{tool}.feather"
+
+
+def _source_key(input_file: str, tool: str) -> dict:
+    stat = os.stat(input_file)
+    return {"format": CACHE_FORMAT, "tool": tool, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _mixed_columns(df: pd.DataFrame) -> list:
+    """Object columns holding both numbers and strings, which Arrow cannot store"""
+    mixed = []
+    for col in df.columns:
+        if df[col].dtype == object:
+            types = {type(v) for v in df[col].dropna()}
+            if len(types) > 1:
+                mixed.append(col)
+    return mixed
+
+
+def _restore_mixed(value):
+    if isinstance(value, str) and value.lstrip("-").isdigit():
+        return int(value)
+    return value
+
+
+def load_processed(input_file: str, tool: str):
+    """Return the cached normalized DataFrame, or None if missing or stale"""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    path = cache_path(input_file, tool)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        table = feather.read_table(path, memory_map=True)
+        meta = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b"{}"))
+    except (pa.ArrowInvalid, OSError, ValueError):
+        return None
+    if meta.get("key") != _source_key(input_file, tool):
+        return None
+
+    df = table.to_pandas()
+    for col in meta.get("mixed", []):
+        df[col] = df[col].map(_restore_mixed).astype(object)
+    return df
+
+
+def store_processed(df: pd.DataFrame, input_file: str, tool: str):
+    """Write the normalized DataFrame as a Feather sidecar next to ``input_file``"""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    mixed = _mixed_columns(df)
+    stored = df.astype({col: str for col in mixed}) if mixed else df
+    table = pa.Table.from_pandas(stored, preserve_index=False)
+    meta = dict(table.schema.metadata or {})
+    meta[METADATA_KEY] = json.dumps({"key": _source_key(input_file, tool), "mixed": mixed}).encode()
+
+    path = cache_path(input_file, tool)
+    tmp_path = f"{path}.tmp"
+    try:
+        feather.write_feather(table.replace_schema_metadata(meta), tmp_path)
+        os.replace(tmp_path, path)
+    except (OSError, pa.ArrowException) as e:
+        print(f"⚠️ Warning: could not write cache {path}: {e}")
+
+
+def load_or_process(input_file: str, tool: str, build, cache: bool = False) -> pd.DataFrame:
+    """Run ``build()`` to read and normalize ``input_file``, reusing the sidecar cache.
+
+    Parameters:
+    -----------
+    input_file : str
+        Path to the source data file
+    tool : str
+        Tool name keying the sidecar, e.g. "nos"
+    build : callable
+        Zero-argument function returning the processed DataFrame
+    cache : bool, optional
+        When True, load a fresh ``<input_file>.<tool>.feather`` sidecar if one
+        exists and otherwise write one after ``build()``. The sidecar is
+        invalidated whenever the source file's size or mtime change.
+    """
+    if not cache:
+        return build()
+    df = load_processed(input_file, tool)
+    if df is None:
+        df = build()
+        store_processed(df, input_file, tool)
+    return df
@@ -0,0 +1,357 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+
+from . import grade, jbi_case_report, jbi_case_series, mmat, nos, robis
+from .aggregate import TOOLS as AGGREGATE_TOOLS, plot_aggregate
+from .collapse import COLLAPSE_ORDERS
+from .diff import plot_diff
+from .grade import plot_grade
+from .jbi_case_report import plot_jbi_case_report
+from .jbi_case_series import plot_jbi_case_series
+from .mmat import plot_mmat
+from .nos import plot_nos
+from .png import PNG_ENCODERS, PNG_GRIDS
+from .robis import plot_robis
+from .schema import SchemaError
+from .text_metrics import LABEL_MODES, load_text_cache, save_text_cache
+from .vector import VECTOR_TEXT_MODES
+
+PLOTTERS = {
+    "nos": plot_nos,
+    "robis": plot_robis,
+    "jbi_case_report": plot_jbi_case_report,
+    "jbi_case_series": plot_jbi_case_series,
+    "grade": plot_grade,
+    "mmat": plot_mmat,
+}
+
+PROCESSORS = {
+    "nos": (nos.read_input_file, nos.process_detailed_nos),
+    "robis": (robis.read_input_file, robis.process_robis),
+    "jbi_case_report": (jbi_case_report.read_input_file, jbi_case_report.process_jbi_case_report),
+    "jbi_case_series": (jbi_case_series.read_input_file, jbi_case_series.process_jbi_case_series),
+    "grade": (grade.read_input_file, grade.process_grade),
+    "mmat": (mmat.read_input_file, mmat.process_mmat),
+}
+
+# Text caches already merged into this (worker) process
+_loaded_text_caches = set()
+
+
+def output_path(template: str, input_file: str, tool: str, theme: str) -> str:
+    """Fill ``{stem}``, ``{name}``, ``{dir}``, ``{tool}`` and ``{theme}`` in an output template"""
+    name = os.path.basename(input_file)
+    fields = {
+        "stem": os.path.splitext(name)[0],
+        "name": name,
+        "dir": os.path.dirname(input_file) or ".",
+        "tool": tool,
+        "theme": theme,
+    }
+    try:
+        return template.format(**fields)
+    except (KeyError, IndexError) as e:
+        raise ValueError(f"Unknown field {e} in output template {template!r}. "
+                         f"Use {', '.join('{' + f + '}' for f in fields)}")
+
+
+def written_files(tool: str, output_file: str) -> list:
+    """Files a render of ``output_file`` produces (one per category for MMAT)"""
+    if tool == "mmat":
+        paths = [mmat.category_output_file(output_file, category) for category in mmat.CATEGORIES]
+    else:
+        paths = [output_file]
+    return [path for path in paths if os.path.exists(path)]
+
+
+def is_up_to_date(tool: str, input_file: str, output_file: str) -> bool:
+    """Make-style check: every output exists and is newer than the input"""
+    files = written_files(tool, output_file)
+    if not files:
+        return False
+    source_mtime = os.stat(input_file).st_mtime_ns
+    return all(os.stat(path).st_mtime_ns >= source_mtime for path in files)
+
+
+def render_one(job: tuple) -> tuple:
+    """Read, normalize and render one input; returns (input, output, error, seconds)"""
+    tool, input_file, output_file, theme, options, text_cache_file = job
+    start = time.perf_counter()
+    try:
+        if text_cache_file and text_cache_file not in _loaded_text_caches:
+            load_text_cache(text_cache_file)
+            _loaded_text_caches.add(text_cache_file)
+        out_dir = os.path.dirname(output_file)
+        if out_dir:
+            os.makedirs(out_dir, exist_ok=True)
+        with contextlib.redirect_stdout(io.StringIO()):
+            PLOTTERS[tool](input_file, output_file, theme, **options)
+        if options.get("deterministic"):
+            # Unchanged outputs keep their old mtime; refresh it so the
+            # make-style check skips them next time
+            for path in written_files(tool, output_file):
+                os.utime(path)
+        if text_cache_file:
+            save_text_cache(text_cache_file)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return input_file, output_file, error, time.perf_counter() - start
+
+
+def render(args) -> int:
+    """Render every input, skipping up-to-date outputs, and print a throughput summary"""
+    jobs, seen, skipped = [], {}, 0
+    options = {"cache": args.cache}
+    if args.max_memory:
+        options["max_memory"] = args.max_memory
+    png_options = png_args(args)
+    if png_options is not None:
+        options["png_options"] = png_options
+    vector_options = vector_args(args)
+    if vector_options is not None:
+        options["vector_options"] = vector_options
+    if args.deterministic:
+        options["deterministic"] = True
+    if args.label_width:
+        options["label_options"] = {"max_width": args.label_width, "mode": args.label_mode}
+    try:
+        filter = filter_args(args)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    if filter:
+        options["filter"] = filter
+    if args.sort_by:
+        options["sort_by"] = args.sort_by
+    if args.collapse:
+        if args.tool == "grade":
+            print("❌ --collapse is not available for GRADE")
+            return 1
+        options["collapse"] = args.collapse
+
+    for input_file in args.inputs:
+        if not os.path.exists(input_file):
+            print(f"❌ Input file not found: {input_file}")
+            return 1
+        output_file = output_path(args.output, input_file, args.tool, args.theme)
+        if output_file in seen:
+            print(f"❌ Inputs {seen[output_file]} and {input_file} both map to {output_file}; "
+                  "add {stem} to the output template")
+            return 1
+        seen[output_file] = input_file
+        if not args.force and is_up_to_date(args.tool, input_file, output_file):
+            skipped += 1
+            continue
+        jobs.append((args.tool, input_file, output_file, args.theme, options, args.text_cache))
+
+    start = time.perf_counter()
+    input_bytes = sum(os.path.getsize(job[1]) for job in jobs)
+    if args.jobs > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.jobs, len(jobs))) as pool:
+            results = pool.map(render_one, jobs)
+            failed = report(results)
+    else:
+        failed = report(map(render_one, jobs))
+    elapsed = time.perf_counter() - start
+
+    rendered = len(jobs) - failed
+    elapsed = max(elapsed, 1e-9)
+    print(f"Rendered {rendered} file(s), skipped {skipped} up to date, {failed} failed "
+          f"in {elapsed:.1f}s ({rendered / elapsed:.2f} files/s, {input_bytes / 1024 / elapsed:.0f} KB/s input)")
+    return 1 if failed else 0
+
+
+def png_args(args) -> dict:
+    """PNG encoding options given on the command line, or None to keep matplotlib's writer"""
+    png_options = {
+        "compression": args.png_compression,
+        "palette": args.png_palette or None,
+        "encoder": args.png_encoder,
+        "workers": args.png_workers,
+        "grid": args.png_grid,
+        "processes": args.png_processes,
+    }
+    png_options = {key: value for key, value in png_options.items() if value is not None}
+    return png_options or None
+
+
+def add_png_arguments(parser):
+    parser.add_argument("--png-compression", type=int, choices=range(10), metavar="0-9",
+                        help="zlib level for PNG output (lower is faster, larger)")
+    parser.add_argument("--png-palette", action="store_true", help="Write 8-bit palette PNGs")
+    parser.add_argument("--png-encoder", choices=sorted(PNG_ENCODERS), help="PNG compressor")
+    parser.add_argument("--png-workers", type=int, help="Threads for the parallel PNG encoder")
+    parser.add_argument("--png-grid", choices=PNG_GRIDS, help="Draw the study grid with matplotlib or paint it with numpy")
+    parser.add_argument("--png-processes", type=int,
+                        help="Draw horizontal bands of each PNG in this many processes and stitch them")
+
+
+def filter_args(args) -> dict:
+    """Parse repeated --filter KEY=VALUE options, e.g. year=2018: or risk=High,Unclear"""
+    filter = {}
+    for option in args.filter or []:
+        key, sep, value = option.partition("=")
+        if not sep:
+            raise ValueError(f"Filter {option!r} must look like KEY=VALUE")
+        if key == "year":
+            first, colon, last = value.partition(":")
+            filter[key] = (int(first) if first else None, int(last) if last else None) if colon else int(value)
+        else:
+            filter[key] = value.split(",")
+    return filter or None
+
+
+def vector_args(args) -> dict:
+    """SVG/PDF/EPS options given on the command line, or None for the defaults"""
+    return {"text": args.vector_text} if args.vector_text else None
+
+
+def add_output_arguments(parser):
+    parser.add_argument("--vector-text", choices=list(VECTOR_TEXT_MODES),
+                        help="Store SVG/PDF/EPS text as glyph outlines (path) or as text with embedded fonts (font)")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="Write byte-reproducible files and keep outputs whose contents did not change")
+
+
+def report(results) -> int:
+    """Print one line per finished job and return the number of failures"""
+    failed = 0
+    for input_file, output_file, error, seconds in results:
+        if error:
+            failed += 1
+            print(f"❌ {input_file}: {error}")
+        else:
+            print(f"✅ {input_file} -> {output_file} ({seconds:.1f}s)")
+    return failed
+
+
+def aggregate(args) -> int:
+    """Render one faceted figure comparing every input review"""
+    for input_file in args.inputs:
+        if not os.path.exists(input_file):
+            print(f"❌ Input file not found: {input_file}")
+            return 1
+    plot_aggregate(args.inputs, args.output, tool=args.tool, theme=args.theme, cache=args.cache,
+                   max_memory=args.max_memory, png_options=png_args(args),
+                   vector_options=vector_args(args), deterministic=args.deterministic)
+    return 0
+
+
+def diff(args) -> int:
+    """Plot the judgments that changed between two assessment rounds"""
+    for input_file in (args.old, args.new):
+        if not os.path.exists(input_file):
+            print(f"❌ Input file not found: {input_file}")
+            return 1
+    changes = plot_diff(args.old, args.new, args.output, tool=args.tool, theme=args.theme, cache=args.cache,
+                        max_memory=args.max_memory, png_options=png_args(args),
+                        vector_options=vector_args(args), deterministic=args.deterministic)
+    print(f"{len(changes)} changed cell(s) in {changes['study'].nunique()} study(ies)")
+    return 0
+
+
+def validate(args) -> int:
+    """Check every input against its tool's schema and list all problems per file"""
+    read, process = PROCESSORS[args.tool]
+    failed = 0
+    for input_file in args.inputs:
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                rows = len(process(read(input_file)))
+        except SchemaError as e:
+            failed += 1
+            print(f"❌ {input_file}: {len(e.errors)} problem(s)")
+            for error in e.errors:
+                print(f"   - {error}")
+            continue
+        except (OSError, ValueError) as e:
+            failed += 1
+            print(f"❌ {input_file}: {e}")
+            continue
+        print(f"✅ {input_file}: {rows} row(s) valid")
+    return 1 if failed else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="critiplot", description="Risk-of-bias plots from the command line")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    render_parser = commands.add_parser("render", help="Render one plot per input file")
+    render_parser.add_argument("inputs", nargs="+", help="Input CSV, Excel, Parquet or Feather files")
+    render_parser.add_argument("--tool", required=True, choices=sorted(PLOTTERS))
+    render_parser.add_argument("--theme", default="default")
+    render_parser.add_argument("-o", "--output", default="{dir}/{stem}.png",
+                               help="Output template with {stem}, {name}, {dir}, {tool} and {theme} "
+                                    "(default: {dir}/{stem}.png)")
+    render_parser.add_argument("-j", "--jobs", type=int, default=1, help="Parallel worker processes")
+    render_parser.add_argument("-f", "--force", action="store_true",
+                               help="Render even when outputs are newer than their inputs")
+    render_parser.add_argument("--cache", action="store_true", help="Keep normalized data in Feather sidecars")
+    render_parser.add_argument("--max-memory", help='Memory budget per render, e.g. "1GB"')
+    add_png_arguments(render_parser)
+    add_output_arguments(render_parser)
+    render_parser.add_argument("--label-width", type=float, metavar="INCHES",
+                               help="Fit study labels to this width")
+    render_parser.add_argument("--label-mode", choices=LABEL_MODES, default="truncate",
+                               help="Truncate long labels with an ellipsis or wrap them (default: truncate)")
+    render_parser.add_argument("--collapse", choices=COLLAPSE_ORDERS,
+                               help="One row per distinct judgment pattern, ordered by frequency or severity")
+    render_parser.add_argument("--filter", action="append", metavar="KEY=VALUE",
+                               help="Plot a subset: year=2018: (a year or FIRST:LAST range), risk=High,Unclear "
+                                    "or category=Randomized (MMAT); repeat to combine")
+    render_parser.add_argument("--sort-by", action="append", metavar="KEY",
+                               help="Sort rows by year, risk, label or category (MMAT); --sort-by=-KEY sorts descending")
+    render_parser.add_argument("--text-cache", metavar="PATH",
+                               help="JSON file of text metrics shared by workers and later runs")
+    render_parser.set_defaults(func=render)
+
+    validate_parser = commands.add_parser("validate", help="Check inputs without rendering")
+    validate_parser.add_argument("inputs", nargs="+", help="Input CSV, Excel, Parquet or Feather files")
+    validate_parser.add_argument("--tool", required=True, choices=sorted(PROCESSORS))
+    validate_parser.set_defaults(func=validate)
+
+    aggregate_parser = commands.add_parser("aggregate", help="Compare many reviews in one faceted figure")
+    aggregate_parser.add_argument("inputs", nargs="+", help="One input file per review")
+    aggregate_parser.add_argument("--tool", required=True, choices=sorted(AGGREGATE_TOOLS))
+    aggregate_parser.add_argument("--theme", default="default")
+    aggregate_parser.add_argument("-o", "--output", required=True, help="Output file")
+    aggregate_parser.add_argument("--cache", action="store_true", help="Keep normalized data in Feather sidecars")
+    aggregate_parser.add_argument("--max-memory", help='Memory budget for the save, e.g. "1GB"')
+    add_png_arguments(aggregate_parser)
+    add_output_arguments(aggregate_parser)
+    aggregate_parser.set_defaults(func=aggregate)
+
+    diff_parser = commands.add_parser("diff", help="Plot only the judgments changed between two rounds")
+    diff_parser.add_argument("old", help="Round 1 input file")
+    diff_parser.add_argument("new", help="Round 2 input file")
+    diff_parser.add_argument("--tool", required=True, choices=sorted(AGGREGATE_TOOLS))
+    diff_parser.add_argument("--theme", default="default")
+    diff_parser.add_argument("-o", "--output", required=True, help="Output file")
+    diff_parser.add_argument("--cache", action="store_true", help="Keep normalized data in Feather sidecars")
+    diff_parser.add_argument("--max-memory", help='Memory budget for the save, e.g. "1GB"')
+    add_png_arguments(diff_parser)
+    add_output_arguments(diff_parser)
+    diff_parser.set_defaults(func=diff)
+    return parser
+
+
+def main(argv=None) -> int:
+    matplotlib.use("Agg")
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
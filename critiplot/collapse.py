@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+COLLAPSE_ORDERS = ("frequency", "severity")
+
+
+def check_collapse(collapse: str):
+    if collapse is not None and collapse not in COLLAPSE_ORDERS:
+        raise ValueError(f"Collapse order {collapse} not available. Choose from {list(COLLAPSE_ORDERS)}")
+
+
+def domain_counts(judgments: pd.DataFrame) -> dict:
+    """{domain: {risk: n}} over every study, in the form the build_*_figure ``counts`` take"""
+    return {domain: {risk: int(n) for risk, n in column.value_counts().items()}
+            for domain, column in judgments.items()}
+
+
+def collapse_patterns(df: pd.DataFrame, judgments: pd.DataFrame, label_column: str,
+                      order: str = "frequency") -> pd.DataFrame:
+    """Keep one row of ``df`` per distinct judgment pattern, labelled with its number of studies.
+
+    Each judgment row is encoded as integer codes and the distinct rows are
+    found with one ``np.unique(..., axis=0)``. The first study of a pattern
+    stands in for all of them and its label becomes "<label> (n=<count>)".
+    Patterns are ranked by ``order``: "frequency" (most studies) or
+    "severity" (most High judgments, then most Moderate/Unclear, then most
+    studies), with ties in input order. The plots draw the first row at
+    the bottom, so the top-ranked pattern comes last and is drawn on top.
+    """
+    check_collapse(order)
+    values = judgments.to_numpy(dtype=object)
+    codes = pd.factorize(values.ravel())[0].reshape(values.shape)
+    _, first, counts = np.unique(codes, axis=0, return_index=True, return_counts=True)
+
+    # np.lexsort sorts ascending by the last key first; the top-ranked pattern ends up last
+    keys = [-first, counts]
+    if order == "severity":
+        patterns = values[first]
+        keys += [np.isin(patterns, ["Moderate", "Unclear"]).sum(axis=1), (patterns == "High").sum(axis=1)]
+    ranked = np.lexsort(keys)
+
+    collapsed = df.iloc[first[ranked]].copy()
+    collapsed[label_column] = [f"{label} (n={n})" for label, n in zip(collapsed[label_column], counts[ranked])]
+    return collapsed.reset_index(drop=True)
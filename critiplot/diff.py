@@ -0,0 +1,192 @@
+import os
+
+import numpy as np
+import pandas as pd
+from matplotlib.artist import setp
+from matplotlib.font_manager import FontProperties
+from matplotlib.lines import Line2D
+
+from .aggregate import get_tool
+from .cache import load_or_process
+from .incremental import study_keys
+from .render import (ThemedFigure, check_output_format, legend_handles, new_figure, output_targets,
+                     render_variants)
+from .text_metrics import fit_label
+
+SAVED_MESSAGE = "✅ Diff plot saved to {}"
+DIFF_COLUMNS = ["study", "domain", "old", "new", "status"]
+DOMAIN_WIDTH = 1.6
+
+
+def judgment_diff(old: pd.DataFrame, new: pd.DataFrame) -> pd.DataFrame:
+    """Changed cells between two judgment matrices, one row per (study, domain).
+
+    Both matrices are keyed with ``study_keys`` and joined through a hash
+    index (``Index.get_indexer``); the changed cells of the shared studies
+    are one vectorized comparison, kept as the coordinates of the sparse
+    mask. Studies only in ``new`` are "added", studies only in ``old``
+    "removed"; their judged cells are listed with the other side None.
+    """
+    domains = list(dict.fromkeys([*map(str, old.columns), *map(str, new.columns)]))
+    old = old.set_axis(study_keys(old.index)).set_axis(list(map(str, old.columns)), axis=1).reindex(columns=domains)
+    new = new.set_axis(study_keys(new.index)).set_axis(list(map(str, new.columns)), axis=1).reindex(columns=domains)
+    old_values = old.to_numpy(dtype=object)
+    new_values = new.to_numpy(dtype=object)
+
+    position = old.index.get_indexer(new.index)
+    shared = position >= 0
+    before = old_values[position[shared]]
+    after = new_values[shared]
+    before_missing, after_missing = pd.isna(before), pd.isna(after)
+    changed = (before_missing != after_missing) | (~before_missing & ~after_missing & (before != after))
+    rows, cols = np.nonzero(changed)
+    shared_keys = new.index[shared]
+
+    parts = [(shared_keys[rows], cols, before[rows, cols], after[rows, cols], "changed")]
+    added_rows, added_cols = np.nonzero(~pd.isna(new_values[~shared]))
+    parts.append((new.index[~shared][added_rows], added_cols, None, new_values[~shared][added_rows, added_cols], "added"))
+    removed = ~old.index.isin(new.index)
+    removed_rows, removed_cols = np.nonzero(~pd.isna(old_values[removed]))
+    parts.append((old.index[removed][removed_rows], removed_cols, old_values[removed][removed_rows, removed_cols],
+                  None, "removed"))
+
+    frames = [
+        pd.DataFrame({"study": np.asarray(keys, dtype=object), "domain": np.asarray(domains, dtype=object)[cols],
+                      "old": old_cells, "new": new_cells, "status": status})
+        for keys, cols, old_cells, new_cells, status in parts if len(keys)
+    ]
+    if not frames:
+        return pd.DataFrame(columns=DIFF_COLUMNS)
+    table = pd.concat(frames, ignore_index=True)
+    table = table.astype(object).where(table.notna(), None)
+    return table.astype({"domain": pd.CategoricalDtype(domains, ordered=True)})
+
+
+def build_diff_figure(changes: pd.DataFrame, tool: str, theme: str = "default", n_studies: int = None) -> ThemedFigure:
+    """Draw only the changed rows: round 1 (circle) -> round 2 (square) per changed cell"""
+    spec = get_tool(tool)
+    if theme not in spec.theme_options:
+        raise ValueError(f"Theme {theme} not available. Choose from {list(spec.theme_options.keys())}")
+    colors = spec.theme_options[theme]
+
+    codes, studies = pd.factorize(changes["study"])
+    domains = list(changes["domain"].cat.categories)
+    x = changes["domain"].cat.codes.to_numpy().astype(float)
+    y = codes.astype(float)
+    labels = [f"{study} ({status})" if status != "changed" else study
+              for study, status in changes.drop_duplicates("study")[["study", "status"]].itertuples(index=False)]
+
+    width = max(8.0, (DOMAIN_WIDTH + 0.2) * len(domains) + 4)
+    fig = new_figure(figsize=(width, max(3.0, 0.6 * len(studies) + 2.5)))
+    ax = fig.subplots()
+    themed = ThemedFigure(fig, spec.theme_options, lambda family, colors: [])
+
+    for column, offset, marker in [("old", -0.22, "o"), ("new", 0.22, "s")]:
+        keys = changes[column].to_numpy()
+        drawn = pd.notna(keys)
+        points = ax.scatter(x[drawn] + offset, y[drawn], s=420, marker=marker, edgecolor="black", linewidth=1.2,
+                            facecolors=[colors.get(k, themed.fallback) for k in keys[drawn]], zorder=3)
+        themed.bind(points, list(keys[drawn]))
+    both = pd.notna(changes["old"]).to_numpy() & pd.notna(changes["new"]).to_numpy()
+    ax.scatter(x[both], y[both], s=160, marker=r"$\rightarrow$", color="black", zorder=3)
+
+    ax.set_xticks(range(len(domains)))
+    font = FontProperties(size=14, weight="bold")
+    ax.set_xticklabels([fit_label(d, DOMAIN_WIDTH * 72, font, "wrap") for d in domains], fontproperties=font)
+    ax.xaxis.tick_top()
+    ax.set_yticks(range(len(studies)))
+    ax.set_yticklabels(labels, fontsize=14, fontweight="bold")
+    ax.set_xlim(-0.5, len(domains) - 0.5)
+    ax.set_ylim(len(studies) - 0.5, -0.5)
+    ax.set_xticks(np.arange(-0.5, len(domains)), minor=True)
+    ax.set_yticks(np.arange(-0.5, len(studies)), minor=True)
+    ax.grid(which="minor", color="gray", linewidth=0.8)
+    ax.tick_params(which="minor", length=0)
+
+    n_cells = len(changes)
+    of_studies = f" of {n_studies}" if n_studies is not None else ""
+    ax.set_title(f"{tool.replace('_', ' ').upper()} Changed Judgments: {n_cells} cell(s) in "
+                 f"{len(studies)}{of_studies} studies", fontsize=18, fontweight="bold", pad=40)
+
+    legend_elements = [
+        Line2D([0], [0], marker='s', color='w', label=risk,
+               markerfacecolor=colors.get(risk, "#BBBBBB"), markersize=16)
+        for risk in spec.categories[::-1]
+    ]
+    legend_elements += [
+        Line2D([0], [0], marker='o', color='w', label="Round 1", markerfacecolor="white",
+               markeredgecolor="black", markersize=14),
+        Line2D([0], [0], marker='s', color='w', label="Round 2", markerfacecolor="white",
+               markeredgecolor="black", markersize=14),
+    ]
+    legend = ax.legend(handles=legend_elements, title="Risk", loc='upper left',
+                       bbox_to_anchor=(1.02, 1), fontsize=12, title_fontsize=14)
+    legend.get_frame().set_edgecolor('black')
+    setp(legend.get_title(), fontweight="bold")
+    for handle, risk in zip(legend_handles(legend), spec.categories[::-1]):
+        themed.bind(handle, risk)
+
+    themed.set_theme(theme)
+    return themed
+
+
+def load_judgments(input_file: str, tool: str, cache: bool = False) -> pd.DataFrame:
+    spec = get_tool(tool)
+    if not os.path.exists(input_file):
+        raise FileNotFoundError(f"Input file not found: {input_file}")
+    df = load_or_process(input_file, tool, lambda: spec.process(spec.read(input_file)), cache)
+    return spec.judgments(df)
+
+
+def plot_diff(old_file: str, new_file: str, output_file: str = None, tool: str = "robis", theme: str = "default",
+              cache: bool = False, outputs: dict = None, max_memory=None, png_options: dict = None,
+              vector_options: dict = None, deterministic: bool = False):
+    """
+    Plot only the judgments that changed between two assessment rounds.
+
+    Parameters:
+    -----------
+    old_file : str
+        Round 1 input, in any format the tool's plot function reads
+    new_file : str
+        Round 2 input of the same tool
+    output_file : str, optional
+        Path to save the diff plot (supports .png, .pdf, .svg, .eps). With
+        neither ``output_file`` nor ``outputs`` only the changes are returned
+    tool : str, optional
+        "nos", "robis", "jbi_case_report", "jbi_case_series" or "mmat". Default is "robis"
+    theme : str, optional
+        Any theme of the tool. Default is "default"
+    cache : bool, optional
+        Reuse each input's Feather sidecar of normalized data. Default is False
+    outputs : dict, optional
+        Extra {output_path: theme} variants recolored from one layout pass
+    max_memory : int or str, optional
+        Memory budget for saving, as for the plot_* functions
+    png_options : dict, optional
+        PNG encoding options, as for the plot_* functions
+    vector_options : dict, optional
+        SVG/PDF/EPS text options, as for the plot_* functions
+    deterministic : bool, optional
+        Byte-reproducible saves that skip unchanged outputs, as for the plot_* functions
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per changed cell: study, domain, old and new judgment and a
+        status of "changed", "added" or "removed"
+    """
+    spec = get_tool(tool)
+    targets = output_targets(output_file, theme, outputs, spec.theme_options, required=False)
+    for path, _ in targets:
+        check_output_format(path)
+
+    new = load_judgments(new_file, tool, cache)
+    changes = judgment_diff(load_judgments(old_file, tool, cache), new)
+    if changes.empty:
+        print("✅ No judgment changes between the two rounds")
+        return changes
+    render_variants(lambda t: build_diff_figure(changes, tool, t, len(new)), targets, SAVED_MESSAGE, max_memory,
+                    png_options=png_options, vector_options=vector_options,
+                    deterministic=deterministic)
+    return changes
@@ -1,14 +1,32 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import sys
+from matplotlib.artist import setp
 from matplotlib.patches import Patch
-import numpy as np
 import re
 import matplotlib
 import gc
+from .cache import load_or_process
+from .layout import GRADE_MAX_HEIGHT, grade_layout
+from .reader import read_table, sniff_csv
+from .render import ThemedFigure, legend_handles, new_figure, output_targets, render_variants, row_lines
+from .schema import Column, Schema, register_schema
+from .subset import select_studies, study_index
 
 matplotlib.use('Agg')  
 
+SCHEMA = register_schema(Schema("grade", [
+    Column("Outcome"),
+    Column("Study", required=False),
+    Column("Risk of Bias", dtype="str"),
+    Column("Inconsistency", dtype="str"),
+    Column("Indirectness", dtype="str"),
+    Column("Imprecision", dtype="str"),
+    Column("Publication Bias", aliases=("Other Considerations",), dtype="str"),
+    Column("Overall Certainty", dtype="str"),
+]))
+INPUT_COLUMNS = SCHEMA.read_columns
+INPUT_DTYPES = SCHEMA.read_dtypes
+
 def process_grade(df: pd.DataFrame) -> pd.DataFrame:
     """Process GRADE data with memory optimizations"""
     
@@ -20,15 +38,10 @@ def process_grade(df: pd.DataFrame) -> pd.DataFrame:
     
 
     df = df.rename(columns=lambda x: x.replace('_', ' '))
-    
-    column_map = {
-        "Other Considerations": "Publication Bias"
-    }
-    df = df.rename(columns=column_map)
+    df = SCHEMA.validate(df)
     
 
-    domain_columns = ["Risk of Bias", "Inconsistency", "Indirectness", "Imprecision", "Publication Bias", "Overall Certainty"]
-    for col in domain_columns:
+    for col in SCHEMA.names[2:]:
         if col in df.columns:
             df[col] = df[col].astype(str)
            
@@ -57,11 +70,6 @@ def process_grade(df: pd.DataFrame) -> pd.DataFrame:
             df[col] = df[col].str.lower().map(mapping_dict).fillna(df[col])
     
 
-    required_columns = ["Outcome","Risk of Bias","Inconsistency","Indirectness","Imprecision","Publication Bias","Overall Certainty"]
-    missing = [c for c in required_columns if c not in df.columns]
-    if missing:
-        raise ValueError(f"Missing required columns: {missing}")
-
     domain_values = {"Not serious", "Serious", "Very serious"}
     certainty_values = {"High", "Moderate", "Low", "Very low"}
     
@@ -91,76 +99,40 @@ def map_color(certainty, colors):
     """Map certainty level to color"""
     return colors.get(certainty, "grey")
 
-def grade_plot(df: pd.DataFrame, output_file: str, theme="default"):
-    """Create GRADE plot with professional design similar to robvis"""
-    theme_options = {
-        "green": {  
-            "High":"#276A42", "Moderate":"#58C85A", "Low":"#FFDA45", "Very low":"#DD4242",
-            "Not serious":"#58C85A", "Serious":"#DD4242", "Very serious":"#691625",
-            "Not reported":"#999999"  
-        },
-        "default": {  
-            "High":"#2E7D32", "Moderate":"#F78710", "Low":"#F4C81B", "Very low":"#C62828",
-            "Not serious":"#2E7D32", "Serious":"#FCB33C", "Very serious":"#C62828",
-            "Not reported":"#999999"
-        },
-        "blue": {  
-            "High":"#006699", "Moderate":"#3399CC", "Low":"#F4C81B", "Very low":"#CC3333",
-            "Not serious":"#3399CC", "Serious":"#CC3333", "Very serious":"#8B0000",
-            "Not reported":"#999999"  
-        }
+THEME_OPTIONS = {
+    "green": {  
+        "High":"#276A42", "Moderate":"#58C85A", "Low":"#FFDA45", "Very low":"#DD4242",
+        "Not serious":"#58C85A", "Serious":"#DD4242", "Very serious":"#691625",
+        "Not reported":"#999999"  
+    },
+    "default": {  
+        "High":"#2E7D32", "Moderate":"#F78710", "Low":"#F4C81B", "Very low":"#C62828",
+        "Not serious":"#2E7D32", "Serious":"#FCB33C", "Very serious":"#C62828",
+        "Not reported":"#999999"
+    },
+    "blue": {  
+        "High":"#006699", "Moderate":"#3399CC", "Low":"#F4C81B", "Very low":"#CC3333",
+        "Not serious":"#3399CC", "Serious":"#CC3333", "Very serious":"#8B0000",
+        "Not reported":"#999999"  
     }
+}
 
-    if theme not in theme_options:
-        raise ValueError("Invalid theme.")
-    colors = theme_options[theme]
-
-    n_studies = len(df)
-    
-
-    base_plot_height = 2.8  
-    
-    if n_studies <= 5:
-        height_per_study = 0.3 
-    elif n_studies <= 10:
-        height_per_study = 0.49  
-    elif n_studies <= 20:
-        height_per_study = 0.63  
-    elif n_studies <= 50:
-        height_per_study = 0.85  
-    else:
-        height_per_study = 0.9 
-    
-    plot_height = base_plot_height + (n_studies * height_per_study)
-    
-    legend_text_height = 3.0 
-    
-    total_figure_height = plot_height + legend_text_height
-    
+SAVED_MESSAGE = "✅ GRADE plot saved to {}"
 
-    max_figure_height = 100.0
-    if total_figure_height > max_figure_height:
-        scale_factor = max_figure_height / total_figure_height
-        plot_height = plot_height * scale_factor
-        total_figure_height = max_figure_height
-        print(f"Scaling down figure to {max_figure_height} inches to prevent memory issues")
-    
+def build_grade_figure(df: pd.DataFrame, theme="default") -> ThemedFigure:
+    """Lay out the GRADE figure once; the result can be re-themed and saved repeatedly"""
+    if theme not in THEME_OPTIONS:
+        raise ValueError("Invalid theme.")
+    colors = THEME_OPTIONS[theme]
 
-    dpi = 300
-    max_pixels = 178956970  
-    safe_max_pixels = max_pixels * 0.85
-    estimated_pixels = 24 * total_figure_height * dpi * dpi
-    
-    if estimated_pixels > safe_max_pixels:
-        dpi = int(np.sqrt(safe_max_pixels / (24 * total_figure_height)))
-        dpi = max(dpi, 50)
-        print(f"Reducing DPI to {dpi} to prevent image size error")
-    
-    fig = plt.figure(figsize=(16.8, total_figure_height), facecolor='white')
-    
-    ax_bottom = legend_text_height / total_figure_height
-    ax_height = plot_height / total_figure_height
-    ax = fig.add_axes([0.08, ax_bottom, 0.84, ax_height])
+    layout = grade_layout(len(df))
+    if layout.scaled:
+        print(f"Scaling down figure to {GRADE_MAX_HEIGHT} inches to prevent memory issues")
+    if layout.dpi != 300:
+        print(f"Reducing DPI to {layout.dpi} to prevent image size error")
+    
+    fig = new_figure(figsize=layout.figsize, facecolor='white')
+    ax = fig.add_axes(layout.plot_rect)
 
     domains = ["Risk of Bias","Inconsistency","Indirectness","Imprecision","Publication Bias"]
     overall_certainty = "Overall Certainty"
@@ -173,8 +145,7 @@ def grade_plot(df: pd.DataFrame, output_file: str, theme="default"):
     
 
     y_positions = list(range(len(outcome_pos))) + [-0.5, len(outcome_pos)-0.5]
-    for y in y_positions:
-        ax.axhline(y, color='#cccccc', linewidth=1.0, zorder=0)
+    row_lines(ax, y_positions, colors='#cccccc', linewidth=1.0, zorder=0)
     
     ax.axvline(len(domains)-0.5, color='#999999', linewidth=1.5, linestyle='--', zorder=0)
     
@@ -193,29 +164,35 @@ def grade_plot(df: pd.DataFrame, output_file: str, theme="default"):
         "Very low": "x"
     }
     
-  
-    for _, row in df.iterrows():
-        y_pos = outcome_pos[row["Outcome_Display"]]
+    def draw_cells(family, colors):
+        bindings = []
+        for _, row in df.iterrows():
+            y_pos = outcome_pos[row["Outcome_Display"]]
+            
+            for domain in domains:
+                certainty = row[domain]
+                x_pos = domain_pos[domain]
+                color = map_color(certainty, colors)
+                
+                square = ax.scatter(x_pos, y_pos, c=color, s=1960, marker="s", edgecolor='white', linewidth=2, zorder=1)  
+                symbol = domain_symbol_map.get(certainty, "?")
+                ax.text(x_pos, y_pos, symbol, color='black', fontsize=37.73, ha='center', va='center', zorder=2) 
+                bindings.append((square, [certainty]))
         
-        for domain in domains:
-            certainty = row[domain]
-            x_pos = domain_pos[domain]
+     
+        for _, row in df.iterrows():
+            y_pos = outcome_pos[row["Outcome_Display"]]
+            certainty = row[overall_certainty]
+            x_pos = overall_pos
             color = map_color(certainty, colors)
             
-            ax.scatter(x_pos, y_pos, c=color, s=1960, marker="s", edgecolor='white', linewidth=2, zorder=1)  
-            symbol = domain_symbol_map.get(certainty, "?")
-            ax.text(x_pos, y_pos, symbol, color='black', fontsize=37.73, ha='center', va='center', zorder=2) 
-    
- 
-    for _, row in df.iterrows():
-        y_pos = outcome_pos[row["Outcome_Display"]]
-        certainty = row[overall_certainty]
-        x_pos = overall_pos
-        color = map_color(certainty, colors)
-        
-        ax.scatter(x_pos, y_pos, c=color, s=2240, marker="o", edgecolor='white', linewidth=2, zorder=1)
-        symbol = certainty_symbol_map.get(certainty, "?")
-        ax.text(x_pos, y_pos, symbol, color='black', fontsize=37.73, ha='center', va='center', zorder=2)  
+            circle = ax.scatter(x_pos, y_pos, c=color, s=2240, marker="o", edgecolor='white', linewidth=2, zorder=1)
+            symbol = certainty_symbol_map.get(certainty, "?")
+            ax.text(x_pos, y_pos, symbol, color='black', fontsize=37.73, ha='center', va='center', zorder=2)  
+            bindings.append((circle, [certainty]))
+        return bindings
+
+    themed = ThemedFigure(fig, THEME_OPTIONS, draw_cells, fallback="grey")
     
 
     ax.set_yticks(range(len(outcome_order)))
@@ -254,33 +231,32 @@ def grade_plot(df: pd.DataFrame, output_file: str, theme="default"):
     ]
     
 
-    legend_bottom = 0.2
-    legend_height = 1.05  
-    
-    legend_bottom_fig = legend_bottom / total_figure_height
-    legend_height_fig = legend_height / total_figure_height
-    
-    legend_ax1 = fig.add_axes([0.62, legend_bottom_fig, 0.18, legend_height_fig])
-    legend_ax2 = fig.add_axes([0.82, legend_bottom_fig, 0.18, legend_height_fig])
+    legend_ax1 = fig.add_axes(layout.legend_rects[0])
+    legend_ax2 = fig.add_axes(layout.legend_rects[1])
     
     domain_leg = legend_ax1.legend(handles=domain_legend_elements, title="Domain Judgments", 
                                   loc='center', frameon=True, framealpha=1, edgecolor='black', 
                                   borderpad=1, fancybox=False, handlelength=2.0, handleheight=1.5)
     legend_ax1.axis('off')
 
-    plt.setp(domain_leg.get_texts(), fontweight="normal", fontsize=18.33)  
-    plt.setp(domain_leg.get_title(), fontweight="bold", fontsize=20.48) 
+    setp(domain_leg.get_texts(), fontweight="normal", fontsize=18.33)  
+    setp(domain_leg.get_title(), fontweight="bold", fontsize=20.48) 
     
     certainty_leg = legend_ax2.legend(handles=certainty_legend_elements, title="Overall Certainty", 
                                      loc='center', frameon=True, framealpha=1, edgecolor='black', 
                                      borderpad=1, fancybox=False, handlelength=2.0, handleheight=1.5)
     legend_ax2.axis('off')
 
-    plt.setp(certainty_leg.get_texts(), fontweight="normal", fontsize=18.33) 
-    plt.setp(certainty_leg.get_title(), fontweight="bold", fontsize=20.48)  
+    setp(certainty_leg.get_texts(), fontweight="normal", fontsize=18.33) 
+    setp(certainty_leg.get_title(), fontweight="bold", fontsize=20.48)  
+
+    for handle, level in zip(legend_handles(domain_leg), ["Not serious", "Serious", "Very serious", "Not reported"]):
+        themed.bind(handle, level)
+    for handle, level in zip(legend_handles(certainty_leg), ["High", "Moderate", "Low", "Very low"]):
+        themed.bind(handle, level)
     
 
-    text_ax = fig.add_axes([0.08, legend_bottom_fig, 0.52, legend_height_fig])
+    text_ax = fig.add_axes(layout.text_rect)
     text_ax.axis('off')
     
     explanatory_text = (
@@ -294,75 +270,89 @@ def grade_plot(df: pd.DataFrame, output_file: str, theme="default"):
     
     text_ax.text(0, 0.5, explanatory_text, fontsize=19.5, va='center', ha='left', wrap=True, fontweight="normal")  
     
-    plt.savefig(output_file, dpi=dpi, bbox_inches='tight', pad_inches=0.1, facecolor='white')
-    plt.close(fig)
+    themed.save_options.update(dpi=layout.dpi, pad_inches=0.1, facecolor='white')
+    themed.set_theme(theme)
+    return themed
+
+def grade_plot(df: pd.DataFrame, output_file: str, theme="default"):
+    """Create GRADE plot with professional design similar to robvis"""
+    render_variants(lambda t: build_grade_figure(df, t), [(output_file, theme)], SAVED_MESSAGE)
     gc.collect()  
-    print(f"✅ GRADE plot saved to {output_file}")
 
 def read_input_file(input_file: str) -> pd.DataFrame:
-    """Read input file with memory optimizations"""
+    """Read input file in a single sniffed parse of the GRADE columns"""
     if input_file.endswith(".csv"):
-        try:
-            usecols = ["Outcome", "Risk of Bias", "Inconsistency", "Indirectness", 
-                       "Imprecision", "Publication Bias", "Other Considerations", "Overall Certainty"]
-            df = pd.read_csv(input_file, engine='c', usecols=usecols)
-            print("Successfully read CSV file with default settings")
-        except:
-            try:
-                df = pd.read_csv(input_file, engine='c', encoding='latin1')
-                print("Successfully read CSV file with latin1 encoding")
-            except:
-                try:
-                    df = pd.read_csv(input_file, engine='c', sep=';')
-                    print("Successfully read CSV file with semicolon separator")
-                except:
-                    df = pd.read_csv(input_file, engine='python')
-                    print("Successfully read CSV file with python engine")
-        
-        if len(df) <= 20:
-            print("First 5 rows of CSV file:")
-            print(df.head())
-            print("\nData types:")
-            print(df.dtypes)
-            print("\nColumn names:")
-            print(df.columns.tolist())
-        
-        return df
+        fmt = sniff_csv(input_file)
+        df = read_table(input_file, INPUT_COLUMNS, INPUT_DTYPES, fmt=fmt)
+        print(f"Successfully read CSV file ({fmt.encoding} encoding, {fmt.delimiter!r} separator)")
+        source = "CSV"
     elif input_file.endswith(".xlsx") or input_file.endswith(".xls"):
         try:
-            df = pd.read_excel(input_file, engine='openpyxl')
-        except:
-            try:
-                df = pd.read_excel(input_file, engine='xlrd')
-            except Exception as e:
-                raise ValueError(f"Failed to read Excel file: {str(e)}")
-        
-        if len(df) <= 20:
-            print("First 5 rows of Excel file:")
-            print(df.head())
-            print("\nData types:")
-            print(df.dtypes)
-            print("\nColumn names:")
-            print(df.columns.tolist())
-        
-        return df
+            df = read_table(input_file, INPUT_COLUMNS, INPUT_DTYPES)
+        except ImportError as e:
+            raise ValueError(f"Failed to read Excel file: {str(e)}")
+        source = "Excel"
+    elif input_file.endswith((".parquet", ".feather", ".arrow")):
+        df = read_table(input_file, INPUT_COLUMNS, INPUT_DTYPES)
+        source = "columnar"
     else:
-        raise ValueError("Unsupported file format. Please use .csv or .xlsx/.xls")
+        raise ValueError("Unsupported file format. Please use .csv, .xlsx/.xls, .parquet or .feather/.arrow")
+
+    if len(df) <= 20:
+        print(f"First 5 rows of {source} file:")
+        print(df.head())
+        print("\nData types:")
+        print(df.dtypes)
+        print("\nColumn names:")
+        print(df.columns.tolist())
+
+    return df
 
-def plot_grade(input_file: str, output_file: str, theme="default"):
+def plot_grade(input_file: str, output_file: str = None, theme="default", cache: bool = False,
+               outputs: dict = None, max_memory=None, return_array: bool = False,
+               png_options: dict = None, label_options: dict = None, vector_options: dict = None,
+               deterministic: bool = False, filter: dict = None, sort_by=None):
     """Generate and save a GRADE traffic-light plot from input data.
     
     Args:
-        input_file: Path to input file (CSV or Excel)
+        input_file: Path to input file (CSV, Excel, Parquet or Feather)
         output_file: Path to save the output plot
         theme: Color theme to use for the plot (default: "default")
+        cache: Reuse a Feather sidecar of the processed data until the input changes
+        outputs: Extra {output_path: theme} variants rendered from one parse and
+            layout pass; each variant only recolors the existing artists
+        max_memory: Memory budget for saving, in bytes or as a size like "512MB".
+            Each save is planned to fit (full raster, PNG tiling, reduced dpi
+            or the vector backend) and the chosen strategy is printed
+        return_array: Also render the plot in ``theme`` into memory and return a
+            RenderedArray (a zero-copy (H, W, 4) uint8 view of the Agg buffer plus
+            layout metadata) instead of None; output_file may then be None
+        png_options: PNG encoding options such as {"compression": 1, "palette": True,
+            "encoder": "parallel", "workers": 4}; None keeps matplotlib's writer
+        label_options: Fit long outcome labels to {"max_width": inches, "mode": "truncate"
+            or "wrap"} using cached text widths; None keeps them as given
+        vector_options: How .svg/.pdf/.eps files store text: {"text": "path"} (glyph
+            outlines, the default) or {"text": "font"} (real text, smaller files)
+        deterministic: Write byte-reproducible files and leave an output untouched
+            (bytes and modification time) when its contents did not change
+        filter: Plot only the outcomes matching every key: "year" (a year or an
+            inclusive (first, last) range parsed from the outcome labels) and
+            "risk" (one or more Overall Certainty levels); None plots them all
+        sort_by: Order the outcomes by "year", "risk" (from High to Very low
+            certainty) or "label", or a list of those; "-" sorts descending
     """
-    df = read_input_file(input_file)
-    df = process_grade(df)
+    targets = output_targets(output_file, theme, outputs, THEME_OPTIONS, required=not return_array)
+    df = load_or_process(input_file, "grade", lambda: process_grade(read_input_file(input_file)), cache)
+    if filter or sort_by:
+        index = study_index(df["Outcome_Display"], df["Overall Certainty"], ["High", "Moderate", "Low", "Very low"])
+        df = select_studies(df, index, filter, sort_by)
     gc.collect()
-    grade_plot(df, output_file, theme)
+    result = render_variants(lambda t: build_grade_figure(df, t), targets, SAVED_MESSAGE, max_memory,
+                             theme if return_array else None, png_options, label_options,
+                             vector_options=vector_options, deterministic=deterministic)
     del df
     gc.collect()
+    return result
 
 if __name__ == "__main__":
     if len(sys.argv) not in [3,4]:
@@ -0,0 +1,140 @@
+import json
+import os
+from typing import NamedTuple
+
+import pandas as pd
+
+STATE_VERSION = 1
+
+
+class IncrementalUpdate(NamedTuple):
+    """Result of diffing new study judgments against the previous state file"""
+    changed: list
+    pages: set
+    counts: dict
+    state: dict
+    state_file: str
+
+
+def default_state_file(targets: list) -> str:
+    """State file stored next to the first output, e.g. out.png.state.json"""
+    return f"{targets[0][0]}.state.json"
+
+
+def study_keys(labels) -> list:
+    """Turn study labels into unique keys, numbering repeated labels"""
+    seen = {}
+    keys = []
+    for label in labels:
+        label = str(label)
+        n = seen.get(label, 0)
+        seen[label] = n + 1
+        keys.append(label if n == 0 else f"{label}#{n}")
+    return keys
+
+
+def load_state(state_file: str) -> dict:
+    if not os.path.exists(state_file):
+        return {}
+    try:
+        with open(state_file, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _add_row(counts: dict, page: str, domains: list, judgments: list, sign: int):
+    page_counts = counts.setdefault(page, {})
+    for domain, judgment in zip(domains, judgments):
+        if judgment is None:
+            continue
+        domain_counts = page_counts.setdefault(domain, {})
+        domain_counts[judgment] = domain_counts.get(judgment, 0) + sign
+        if domain_counts[judgment] == 0:
+            del domain_counts[judgment]
+
+
+def diff_studies(state_file: str, tool: str, judgments: pd.DataFrame, targets: list,
+                 pages=None, page_outputs=None) -> IncrementalUpdate:
+    """Compare study judgments with the last rendered state and update counts by delta.
+
+    Parameters:
+    -----------
+    state_file : str
+        JSON file holding the previous judgment matrix and domain counts
+    tool : str
+        Tool name; a state written by another tool is ignored
+    judgments : pd.DataFrame
+        One row per study, indexed by study label, one column per domain
+        holding the judgment (None to leave a cell out of the counts)
+    targets : list
+        (output_file, theme) pairs about to be rendered
+    pages : sequence, optional
+        Page name per study for tools that save one file per group (MMAT
+        categories). Defaults to a single unnamed page.
+    page_outputs : callable, optional
+        Maps a page name to the output files it produces; pages whose
+        files are missing are always re-rendered
+
+    Returns:
+    --------
+    IncrementalUpdate
+        Changed study keys, pages that need re-rendering, per-page counts
+        ``{page: {domain: {judgment: n}}}`` and the state to save once the
+        render succeeds
+    """
+    domains = [str(c) for c in judgments.columns]
+    keys = study_keys(judgments.index)
+    pages = [""] * len(keys) if pages is None else [str(p) for p in pages]
+    rows = [[None if pd.isna(v) else str(v) for v in row] for row in judgments.itertuples(index=False)]
+    targets = [list(t) for t in targets]
+    page_outputs = page_outputs or (lambda page: [path for path, _ in targets])
+
+    old = load_state(state_file)
+    compatible = (old.get("version") == STATE_VERSION and old.get("tool") == tool
+                  and old.get("domains") == domains)
+    old_studies = old.get("studies", {}) if compatible else {}
+    counts = old.get("counts", {}) if compatible else {}
+
+    new_studies = {key: {"page": page, "judgments": row} for key, page, row in zip(keys, pages, rows)}
+    changed = []
+    affected = set()
+    for key in old_studies.keys() - new_studies.keys():
+        entry = old_studies[key]
+        _add_row(counts, entry["page"], domains, entry["judgments"], -1)
+        changed.append(key)
+        affected.add(entry["page"])
+    for key, entry in new_studies.items():
+        previous = old_studies.get(key)
+        if previous == entry:
+            continue
+        if previous is not None:
+            _add_row(counts, previous["page"], domains, previous["judgments"], -1)
+            affected.add(previous["page"])
+        _add_row(counts, entry["page"], domains, entry["judgments"], 1)
+        changed.append(key)
+        affected.add(entry["page"])
+
+    order = {}
+    for key, page in zip(keys, pages):
+        order.setdefault(page, []).append(key)
+    old_order = old.get("order", {}) if compatible else {}
+    retarget = not compatible or old.get("targets") != targets
+    for page, page_keys in order.items():
+        if retarget or old_order.get(page) != page_keys:
+            affected.add(page)
+        if any(not os.path.exists(path) for path in page_outputs(page)):
+            affected.add(page)
+
+    counts = {page: page_counts for page, page_counts in counts.items() if page in order}
+    state = {"version": STATE_VERSION, "tool": tool, "domains": domains, "targets": targets,
+             "order": order, "studies": new_studies, "counts": counts}
+    return IncrementalUpdate(changed, affected & set(order), counts, state, state_file)
+
+
+def save_state(update: IncrementalUpdate):
+    """Write the state after a successful render"""
+    tmp_path = f"{update.state_file}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(update.state, f)
+    os.replace(tmp_path, update.state_file)
@@ -0,0 +1,73 @@
+import pandas as pd
+
+from .reader import read_table
+from .schema import Column, Schema, register_schema
+
+DOMAINS = [
+    "Demographics", "History", "ClinicalCondition", "Diagnostics",
+    "Intervention", "PostCondition", "AdverseEvents", "Lessons"
+]
+SCHEMA = register_schema(Schema("jbi_case_report", [
+    Column("Author,Year", aliases=("Author, Year",)),
+    Column("Author", required=False),
+    Column("Year", required=False),
+    *[Column(domain, dtype="str") for domain in DOMAINS],
+    Column("Total"),
+    Column("Overall RoB"),
+]))
+INPUT_COLUMNS = SCHEMA.read_columns
+INPUT_DTYPES = SCHEMA.read_dtypes
+
+def normalize_jbi_value(val):
+    """Normalizes input values to 1, 0, 'Unclear', or 'Not Applicable'."""
+    if pd.isna(val):
+        return "Unclear"
+    
+    s_val = str(val).strip().lower()
+    
+    if s_val in ['1', 'yes', 'low']:
+        return 1
+    if s_val in ['0', 'no', 'high']:
+        return 0
+    if s_val in ['unclear', '?']:
+        return "Unclear"
+    if s_val in ['not applicable', 'n/a', 'na', 'not applicable']:
+        return "Not Applicable"
+    
+    return "Unclear"
+
+def process_jbi_case_report(df: pd.DataFrame) -> pd.DataFrame:
+    df = SCHEMA.rename_aliases(df)
+    if "Author,Year" not in df.columns and "Author" in df.columns and "Year" in df.columns:
+        df["Author,Year"] = df["Author"].astype(str) + " " + df["Year"].astype(str)
+    df = SCHEMA.validate(df)
+
+    for col in DOMAINS:
+        df[col] = df[col].apply(normalize_jbi_value)
+
+    df["ComputedTotal"] = df[DOMAINS].apply(lambda row: sum(1 for x in row if x == 1), axis=1)
+    
+    mismatches = df[df["ComputedTotal"] != df["Total"]]
+    if not mismatches.empty:
+        print("⚠️ Warning: Total Score mismatches detected (Computed Total vs Input Total):")
+        print("Note: 'Unclear' and 'Not Applicable' are treated as 0 in the sum score.")
+        print(mismatches[["Author,Year", "Total", "ComputedTotal"]])
+
+    return df
+
+def stars_to_rob(score):
+    if score == 1: return "Low"      
+    if score == 0: return "High"     
+    if score == "Unclear": return "Unclear"
+    if score == "Not Applicable": return "Not Applicable"
+    return "Unclear" 
+
+def study_judgments(df: pd.DataFrame) -> pd.DataFrame:
+    """Risk per study and domain (plus "Overall RoB"), indexed by "Author,Year"."""
+    judgments = pd.DataFrame({domain: [stars_to_rob(score) for score in df[domain]] for domain in DOMAINS})
+    judgments["Overall RoB"] = [stars_to_rob(normalize_jbi_value(rob)) for rob in df["Overall RoB"]]
+    judgments.index = df["Author,Year"].to_numpy()
+    return judgments
+
+def read_input_file(file_path: str) -> pd.DataFrame:
+    return read_table(file_path, INPUT_COLUMNS, INPUT_DTYPES)
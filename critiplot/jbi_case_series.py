@@ -1,82 +1,19 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import sys
 import os
 from matplotlib.lines import Line2D
 import re
-from collections import defaultdict
-
-def normalize_jbi_value(val):
-    """Normalizes input values to 1, 0, 'Unclear', or 'Not Applicable'."""
-    if pd.isna(val):
-        return "Unclear"
-    
-    s_val = str(val).strip().lower()
-    
-    if s_val in ['1', 'yes', 'low']:
-        return 1
-    if s_val in ['0', 'no', 'high']:
-        return 0
-    if s_val in ['unclear', '?']:
-        return "Unclear"
-    if s_val in ['not applicable', 'n/a', 'na', 'not applicable']:
-        return "Not Applicable"
-    
-    return "Unclear"
-
-def process_jbi_case_series(df: pd.DataFrame) -> pd.DataFrame:
-    if "Author,Year" not in df.columns:
-        if "Author, Year" in df.columns:
-            df = df.rename(columns={"Author, Year": "Author,Year"})
-        elif "Author" in df.columns and "Year" in df.columns:
-            df["Author,Year"] = df["Author"].astype(str) + " " + df["Year"].astype(str)
-        else:
-            raise ValueError("Missing required columns: 'Author,Year' or 'Author'+'Year'")
-
-    required_columns = [
-        "Author,Year",
-        "InclusionCriteria","StandardMeasurement","ValidIdentification",
-        "ConsecutiveInclusion","CompleteInclusion","Demographics",
-        "ClinicalInfo","Outcomes","SiteDescription","Statistics",
-        "Total","Overall RoB"
-    ]
-    missing = [col for col in required_columns if col not in df.columns]
-    if missing:
-        raise ValueError(f"Missing required columns: {missing}")
-
-    domain_cols = [
-        "InclusionCriteria","StandardMeasurement","ValidIdentification",
-        "ConsecutiveInclusion","CompleteInclusion","Demographics",
-        "ClinicalInfo","Outcomes","SiteDescription","Statistics"
-    ]
-    
-
-    for col in domain_cols:
-        df[col] = df[col].apply(normalize_jbi_value)
-        
-        allowed = {1, 0, "Unclear", "Not Applicable"}
-        invalid = df[~df[col].isin(allowed)]
-        if not invalid.empty:
-            raise ValueError(f"Column {col} contains unprocessable values after normalization.")
-
-
-    df["ComputedTotal"] = df[domain_cols].apply(lambda row: sum(1 for x in row if x == 1), axis=1)
-    
-    mismatches = df[df["ComputedTotal"] != df["Total"]]
-    if not mismatches.empty:
-        print("⚠️ Total Score mismatches detected (Computed Total vs Input Total):")
-        print("Note: 'Unclear' and 'Not Applicable' are treated as 0 in the sum score.")
-        print(mismatches[["Author,Year","Total","ComputedTotal"]])
-
-    return df
-
-def stars_to_rob(score):
-    if score == 1: return "Low"       
-    if score == 0: return "High"      
-    if score == "Unclear": return "Unclear"
-    if score == "Not Applicable": return "Not Applicable"
-    return "Unclear" 
+from .cache import load_or_process
+from .collapse import check_collapse, collapse_patterns, domain_counts
+from .incremental import default_state_file, diff_studies, save_state
+from .jbi_case_series_data import (DOMAINS, normalize_jbi_value, process_jbi_case_series, read_input_file,
+                                   stars_to_rob, study_judgments)
+from .layout import figure_layout
+from .render import (ThemedFigure, check_output_format, legend_handles, new_figure, output_targets,
+                     render_variants, row_lines)
+from .subset import select_studies, study_index
+from .summary import judgment_counts, judgment_percent
 
 def map_color(score, colors):
     return colors.get(stars_to_rob(score), "#BBBBBB")
@@ -85,193 +22,98 @@ def make_readable(name: str) -> str:
     s1 = re.sub('([a-z])([A-Z])', r'\1 \2', name)
     return s1
 
-def professional_jbi_series_plot(df: pd.DataFrame, output_file: str, theme: str = "default"):
+THEME_OPTIONS = {
+    "default": {"Low":"#06923E","High":"#DC2525", "Unclear":"#F4BE3F", "Not Applicable":"#D3D3D3"},
+    "blue": {"Low":"#3a83b7","High":"#084582", "Unclear":"#7fb2e6", "Not Applicable":"#838383"},
+    "gray": {"Low":"#FF884DFF","High":"#5B6D80", "Unclear":"#D5617C", "Not Applicable":"#B0B0B0"},
+    "smiley": {"Low":"#06923E","High":"#DC2525", "Unclear":"#F4D03F", "Not Applicable":"#898989"},
+    "smiley_blue": {"Low":"#3a83b7","High":"#084582", "Unclear":"#7fb2e6", "Not Applicable":"#838383"}
+}
 
-    theme_options = {
-        "default": {"Low":"#06923E","High":"#DC2525", "Unclear":"#F4BE3F", "Not Applicable":"#D3D3D3"},
-        "blue": {"Low":"#3a83b7","High":"#084582", "Unclear":"#7fb2e6", "Not Applicable":"#838383"},
-        "gray": {"Low":"#FF884DFF","High":"#5B6D80", "Unclear":"#D5617C", "Not Applicable":"#B0B0B0"},
-        "smiley": {"Low":"#06923E","High":"#DC2525", "Unclear":"#F4D03F", "Not Applicable":"#898989"},
-        "smiley_blue": {"Low":"#3a83b7","High":"#084582", "Unclear":"#7fb2e6", "Not Applicable":"#838383"}
-    }
+SAVED_MESSAGE = "✅ Professional JBI Case Series plot saved to {}"
 
-    if theme not in theme_options:
-        raise ValueError(f"Theme {theme} not available. Choose from {list(theme_options.keys())}")
-    colors = theme_options[theme]
+def build_jbi_series_figure(df: pd.DataFrame, theme: str = "default", counts: dict = None) -> ThemedFigure:
+    """Lay out the JBI Case Series figure once; it can be re-themed and saved repeatedly.
 
-    domains = [
-        "InclusionCriteria","StandardMeasurement","ValidIdentification",
-        "ConsecutiveInclusion","CompleteInclusion","Demographics",
-        "ClinicalInfo","Outcomes","SiteDescription","Statistics"
-    ]
+    ``counts`` ({domain: {risk: n}}) supplies precomputed summary counts,
+    e.g. from an incremental update, instead of tallying the grid.
+    """
+    if theme not in THEME_OPTIONS:
+        raise ValueError(f"Theme {theme} not available. Choose from {list(THEME_OPTIONS.keys())}")
+    colors = THEME_OPTIONS[theme]
+
+    domains = DOMAINS
     readable_domains = [make_readable(d) for d in domains]
   
     all_domains = domains + ["Overall RoB"]
     all_readable_domains = readable_domains + ["Overall RoB"]
 
     n_studies = len(df)
-    per_study_height = 0.6     
-    min_first_plot_height = 4.0  
-    second_plot_height = 6.5  
-    gap_between_plots = 3.5  
-    top_margin = 1.0           
-    bottom_margin = 0.5        
-    
-    first_plot_height = max(min_first_plot_height, n_studies * per_study_height)
-    total_height = first_plot_height + gap_between_plots + second_plot_height + top_margin + bottom_margin
-    
-    fig = plt.figure(figsize=(18, total_height))
-    
-    ax0_bottom = (bottom_margin + second_plot_height + gap_between_plots) / total_height
-    ax0_height = first_plot_height / total_height
-    
-    ax1_bottom = bottom_margin / total_height
-    ax1_height = second_plot_height / total_height
-    
-    ax0 = fig.add_axes([0.12, ax0_bottom, 0.75, ax0_height])
-    ax1 = fig.add_axes([0.12, ax1_bottom, 0.75, ax1_height])
+    layout = figure_layout("jbi_case_series", n_studies)
+    fig = new_figure(figsize=layout.figsize)
+    ax0 = fig.add_axes(layout.grid_rect)
+    ax1 = fig.add_axes(layout.summary_rect)
     
     author_pos = {a:i for i,a in enumerate(df["Author,Year"].tolist())}
 
-    for y in range(len(author_pos)):
-        ax0.axhline(y, color='lightgray', linewidth=0.8, zorder=0)
-    ax0.axhline(-0.5, color='lightgray', linewidth=0.8, zorder=0)
-    ax0.axhline(len(author_pos)-0.5, color='lightgray', linewidth=0.8, zorder=0)
+    row_lines(ax0, [*range(len(author_pos)), -0.5, len(author_pos)-0.5], colors='lightgray', linewidth=0.8, zorder=0)
 
-    if theme.startswith("smiley"):
+    symbol_map = {"Low": "☺", "High": "☹", "Unclear": "?", "Not Applicable": "✖"}
 
-        symbol_map = {
-            0: "☹",      
-            1: "☺",       
-            "Unclear": "?",
-            "Not Applicable": "✖"
-        }
-        
-        for _, row in df.iterrows():
-            author = row["Author,Year"]
-            y_pos = author_pos[author]
-            
-            for domain in domains:
-                x_pos = all_readable_domains.index(make_readable(domain))
-                score = row[domain]
-                symbol = symbol_map.get(score, "?")
-                color = colors.get(stars_to_rob(score), "#BBBBBB")
-                
-                ax0.text(x_pos, y_pos, symbol, fontsize=36, ha='center', va='center', 
-                         color=color, fontweight='bold', zorder=1)
-            
-            x_pos = all_readable_domains.index("Overall RoB")
-            rob_status = row["Overall RoB"]
-            norm_rob = normalize_jbi_value(rob_status)
-            
-            if norm_rob == 1 or norm_rob == "Low":
-                symbol, color = "☺", colors["Low"]
-            elif norm_rob == 0 or norm_rob == "High":
-                symbol, color = "☹", colors["High"]
-            elif norm_rob == "Unclear":
-                symbol, color = "?", colors["Unclear"]
-            else:
-                symbol, color = "✖", colors["Not Applicable"]
-                
-            ax0.text(x_pos, y_pos, symbol, fontsize=36, ha='center', va='center', 
-                     color=color, fontweight='bold', zorder=1)
-        
-        ax0.set_xticks(range(len(all_readable_domains)))
-        ax0.set_xticklabels(all_readable_domains, fontsize=18, fontweight="bold", rotation=45, ha='right')
-        ax0.set_yticks(list(author_pos.values()))
-        ax0.set_yticklabels(list(author_pos.keys()), fontsize=18, fontweight="bold")
-        ax0.set_ylim(-0.5, len(author_pos)-0.5)
-        ax0.set_xlim(-0.5, len(all_readable_domains)-0.5)
-        ax0.set_facecolor('white')
-    else:
-        x_coords = []
-        y_coords = []
-        colors_list = []
-        
-        for _, row in df.iterrows():
-            author = row["Author,Year"]
-            y_pos = author_pos[author]
-            
-            for domain in domains:
-                x_coords.append(all_readable_domains.index(make_readable(domain)))
-                y_coords.append(y_pos)
-                colors_list.append(map_color(row[domain], colors))
-            
-            x_coords.append(all_readable_domains.index("Overall RoB"))
-            y_coords.append(y_pos)
-            
-            norm_rob = normalize_jbi_value(row["Overall RoB"])
-            rob_key = stars_to_rob(norm_rob)
-            rob_color = colors.get(rob_key, "#BBBBBB")
-            colors_list.append(rob_color)
-        
-        ax0.scatter(x_coords, y_coords, c=colors_list, s=900, marker="s", zorder=1)
-        ax0.set_xticks(range(len(all_readable_domains)))
-        ax0.set_xticklabels(all_readable_domains, fontsize=18, fontweight="bold", rotation=45, ha='right')
-        ax0.set_yticks(list(author_pos.values()))
-        ax0.set_yticklabels(list(author_pos.keys()), fontsize=18, fontweight="bold")
-        ax0.set_ylim(-0.5, len(author_pos)-0.5)
+    judgments = study_judgments(df)
+    rows = [author_pos[author] for author in df["Author,Year"]]
+    cells = [(x_pos, y_pos, risk)
+             for y_pos, risks in zip(rows, judgments.to_numpy(dtype=object)) for x_pos, risk in enumerate(risks)]
+
+    def draw_cells(family, colors):
+        if family == "smiley":
+            bindings = []
+            for x_pos, y_pos, risk in cells:
+                text = ax0.text(x_pos, y_pos, symbol_map.get(risk, "?"), fontsize=36, ha='center', va='center', 
+                                color=colors.get(risk, "#BBBBBB"), fontweight='bold', zorder=1)
+                bindings.append((text, risk))
+            return bindings
+
+        x_coords, y_coords, risks = zip(*cells) if cells else ((), (), ())
+        scatter = ax0.scatter(x_coords, y_coords, c=[colors.get(r, "#BBBBBB") for r in risks], s=900, marker="s", zorder=1)
+        return [(scatter, list(risks))]
 
+    themed = ThemedFigure(fig, THEME_OPTIONS, draw_cells)
+
+    ax0.set_xticks(range(len(all_readable_domains)))
+    ax0.set_xticklabels(all_readable_domains, fontsize=18, fontweight="bold", rotation=45, ha='right')
+    ax0.set_yticks(list(author_pos.values()))
+    ax0.set_yticklabels(list(author_pos.keys()), fontsize=18, fontweight="bold")
+    ax0.set_ylim(-0.5, len(author_pos)-0.5)
+    ax0.set_xlim(-0.5, len(all_readable_domains)-0.5)
+    ax0.set_facecolor('white')
     ax0.set_title("JBI Case Series Traffic-Light Plot", fontsize=24, fontweight="bold")
     ax0.set_xlabel("")
     ax0.set_ylabel("")
     ax0.grid(axis='x', linestyle='--', alpha=0.25)
 
-    risk_counts = defaultdict(lambda: defaultdict(int))
-    
-    for _, row in df.iterrows():
-        for domain in domains:
-            risk = stars_to_rob(row[domain])
-            readable_domain = make_readable(domain)
-            risk_counts[readable_domain][risk] += 1
-        
-        norm_rob = normalize_jbi_value(row["Overall RoB"])
-        risk_counts["Overall RoB"][stars_to_rob(norm_rob)] += 1
-    
-    inverted_domains = all_readable_domains[::-1]
-    
     categories = ["High", "Unclear", "Low", "Not Applicable"]
-    counts = {cat: [] for cat in categories}
-    
-    for domain in inverted_domains:
-        for cat in categories:
-            counts[cat].append(risk_counts[domain].get(cat, 0))
-    
-    totals = [sum(counts[cat][i] for cat in categories) for i in range(len(inverted_domains))]
-    
-    high_counts = counts["High"]
-    unclear_counts = counts["Unclear"]
-    low_counts = counts["Low"]
-    na_counts = counts["Not Applicable"]
-    
-    high_percent = [h / t * 100 if t > 0 else 0 for h, t in zip(high_counts, totals)]
-    unclear_percent = [u / t * 100 if t > 0 else 0 for u, t in zip(unclear_counts, totals)]
-    low_percent = [l / t * 100 if t > 0 else 0 for l, t in zip(low_counts, totals)]
-    na_percent = [n / t * 100 if t > 0 else 0 for n, t in zip(na_counts, totals)]
-    
+    if counts is None:
+        tally = judgment_counts(judgments, categories)[1][0]
+    else:
+        tally = np.array([[counts.get(domain, {}).get(cat, 0) for cat in categories] for domain in all_domains])
+
+    inverted_domains = all_readable_domains[::-1]
+    # (domains x categories) percentages, stacked left to right in category order
+    percent = judgment_percent(tally)[::-1]
+    left = np.zeros_like(percent)
+    left[:, 1:] = np.cumsum(percent[:, :-1], axis=1)
+
     y_positions = range(len(inverted_domains))
-    
-    ax1.barh(y_positions, high_percent, color=colors["High"], edgecolor='black', label='High', height=0.85)
-    ax1.barh(y_positions, unclear_percent, left=high_percent, color=colors["Unclear"], edgecolor='black', label='Unclear', height=0.85)
-    ax1.barh(y_positions, low_percent, left=[h+u for h,u in zip(high_percent, unclear_percent)], color=colors["Low"], edgecolor='black', label='Low', height=0.85)
-    ax1.barh(y_positions, na_percent, left=[h+u+l for h,u,l in zip(high_percent, unclear_percent, low_percent)], color=colors["Not Applicable"], edgecolor='black', label='Not Applicable', height=0.85)
-    
-    for i in range(len(inverted_domains)):
-        if high_percent[i] > 0:
-            ax1.text(high_percent[i]/2, i, f"{high_percent[i]:.0f}%", ha='center', va='center', 
-                     color='black', fontsize=16, fontweight='bold')
-        
-        if unclear_percent[i] > 0:
-            ax1.text(high_percent[i] + unclear_percent[i]/2, i, f"{unclear_percent[i]:.0f}%", ha='center', va='center', 
-                     color='black', fontsize=16, fontweight='bold')
-        
-        if low_percent[i] > 0:
-            ax1.text(high_percent[i] + unclear_percent[i] + low_percent[i]/2, i, f"{low_percent[i]:.0f}%", ha='center', va='center', 
-                     color='black', fontsize=16, fontweight='bold')
+    for i, cat in enumerate(categories):
+        container = ax1.barh(y_positions, percent[:, i], left=left[:, i], color=colors[cat], edgecolor='black',
+                             label=cat, height=0.85)
+        for patch in container:
+            themed.bind(patch, cat)
 
-        if na_percent[i] > 0:
-             ax1.text(high_percent[i] + unclear_percent[i] + low_percent[i] + na_percent[i]/2, i, f"{na_percent[i]:.0f}%", ha='center', va='center', 
-                     color='black', fontsize=16, fontweight='bold')
+    for i, j in zip(*np.nonzero(percent > 0)):
+        ax1.text(left[i, j] + percent[i, j]/2, i, f"{percent[i, j]:.0f}%", ha='center', va='center',
+                 color='black', fontsize=16, fontweight='bold')
     
     ax1.set_xlim(0,100)
     ax1.set_xticks([0,20,40,60,80,100])
@@ -283,8 +125,7 @@ def professional_jbi_series_plot(df: pd.DataFrame, output_file: str, theme: str
     ax1.set_title("Distribution of Risk-of-Bias Judgments by Domain", fontsize=24, fontweight="bold")
     ax1.grid(axis='x', linestyle='--', alpha=0.25)
     
-    for y in range(len(inverted_domains)):
-        ax1.axhline(y-0.5, color='lightgray', linewidth=0.8, zorder=0)
+    row_lines(ax1, [y - 0.5 for y in range(len(inverted_domains))], colors='lightgray', linewidth=0.8, zorder=0)
 
     legend_elements = [
         Line2D([0],[0], marker='s', color='w', label='Low Risk (Yes)', markerfacecolor=colors["Low"], markersize=18),
@@ -306,48 +147,123 @@ def professional_jbi_series_plot(df: pd.DataFrame, output_file: str, theme: str
     leg.get_title().set_fontweight('bold')   
     for text in leg.get_texts():
         text.set_fontweight('bold')         
+    for handle, risk in zip(legend_handles(leg), ["Low", "High", "Unclear", "Not Applicable"]):
+        themed.bind(handle, risk)
 
-    valid_ext = [".png",".pdf",".svg",".eps"]
-    ext = os.path.splitext(output_file)[1].lower()
-    if ext not in valid_ext:
-        raise ValueError(f"Unsupported file format: {ext}")
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
-    plt.close(fig)
-    print(f"✅ Professional JBI Case Series plot saved to {output_file}")
+    themed.set_theme(theme)
+    return themed
 
-def read_input_file(file_path: str) -> pd.DataFrame:
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext == ".csv":
-        return pd.read_csv(file_path, engine='c')
-    elif ext in [".xls",".xlsx"]:
-        return pd.read_excel(file_path, engine='openpyxl')
-    else:
-        raise ValueError(f"Unsupported file format: {ext}")
+def professional_jbi_series_plot(df: pd.DataFrame, output_file: str, theme: str = "default"):
+    check_output_format(output_file)
+    render_variants(lambda t: build_jbi_series_figure(df, t), [(output_file, theme)], SAVED_MESSAGE)
 
-def plot_jbi_case_series(input_file: str, output_file: str, theme: str = "default"):
+def plot_jbi_case_series(input_file: str, output_file: str = None, theme: str = "default", cache: bool = False,
+                         outputs: dict = None, incremental: bool = False, state_file: str = None, max_memory=None,
+                         return_array: bool = False, png_options: dict = None, label_options: dict = None,
+                         vector_options: dict = None,
+                         deterministic: bool = False, collapse: str = None,
+                         filter: dict = None, sort_by=None):
     """
     Generate a JBI Case Series plot from input data.
     
     Parameters:
     -----------
     input_file : str
-        Path to the input file (CSV or Excel)
+        Path to the input file (CSV, Excel, Parquet or Feather)
     output_file : str
         Path to save the output plot (PNG, PDF, SVG, or EPS)
     theme : str, optional
         Color theme for the plot (default: "default")
         Available themes: "default", "blue", "gray", "smiley", "smiley_blue"
+    cache : bool, optional
+        Store the normalized data as a Feather sidecar next to the input file
+        and reuse it on later calls until the input changes. Default is False
+    outputs : dict, optional
+        Extra {output_path: theme} variants, e.g. {"a.png": "default", "b.pdf": "blue"}.
+        The data is parsed and the figure laid out once; each variant only
+        recolors the existing artists before saving.
+    incremental : bool, optional
+        Keep the judgment matrix and domain counts in a state file, diff the
+        new input by "Author,Year", update the counts by delta and skip
+        rendering when no study changed. Default is False
+    state_file : str, optional
+        State file for incremental mode. Default is "<first output>.state.json"
+    max_memory : int or str, optional
+        Memory budget for saving, in bytes or as a size like "512MB". Each
+        save is planned to fit (full raster, PNG tiling, reduced dpi or the
+        vector backend for .pdf/.svg/.eps) and the chosen strategy is printed.
+        Default is None (no budget)
+    return_array : bool, optional
+        Also render the figure in ``theme`` straight into memory and return it
+        as a RenderedArray: a zero-copy ``(H, W, 4)`` uint8 view of the Agg
+        buffer plus layout metadata, with no PNG encode. ``output_file`` may
+        then be None. Default is False
+    png_options : dict, optional
+        PNG encoding options, e.g. {"compression": 1, "palette": True}:
+        ``compression`` is the zlib level (0-9, default 6), ``palette`` writes
+        an 8-bit indexed PNG (exact up to 256 colors, otherwise quantized),
+        ``encoder`` is "zlib" or "parallel" (multithreaded, ``workers``
+        threads). Default is None (matplotlib's PNG writer)
+    label_options : dict, optional
+        Fit long study labels to a width, e.g. {"max_width": 4, "mode": "wrap"}:
+        ``max_width`` is in inches and ``mode`` is "truncate" (cut with "…",
+        the default) or "wrap" (break at spaces), using cached text widths.
+        Default is None (labels as given)
+    vector_options : dict, optional
+        How .svg/.pdf/.eps files store text: {"text": "path"} (glyph
+        outlines, the default) or {"text": "font"} (real text with embedded
+        fonts; smaller files with many labels). Default is None
+    deterministic : bool, optional
+        Write byte-reproducible files (no dates or matplotlib version, fixed
+        SVG ids) and leave an output untouched (bytes and modification
+        time) when its contents did not change. Default is False
+    collapse : str, optional
+        Draw one row per distinct judgment pattern, labelled with its number
+        of studies and ordered by "frequency" or "severity"; the summary bars
+        still count every study. Default is None (one row per study)
+    filter : dict, optional
+        Plot only the studies matching every key: "year" (a year, or an
+        inclusive (first, last) range with None for an open end, parsed from
+        the labels), "risk" (one or more overall judgments), e.g.
+        {"year": (2018, None), "risk": "High"}. Default is None (all studies)
+    sort_by : str or list, optional
+        Order the rows by "year", "risk" (severity) or "label", or by a list
+        of those; a leading "-" sorts descending. Default is None (input order)
     
     Returns:
     --------
     None
     """
+    targets = output_targets(output_file, theme, outputs, THEME_OPTIONS, required=not return_array)
+    for path, _ in targets:
+        check_output_format(path)
+    check_collapse(collapse)
     if not os.path.exists(input_file):
         raise FileNotFoundError(f"Input file not found: {input_file}")
     
-    df = read_input_file(input_file)
-    df = process_jbi_case_series(df)
-    professional_jbi_series_plot(df, output_file, theme)
+    df = load_or_process(input_file, "jbi_case_series", lambda: process_jbi_case_series(read_input_file(input_file)), cache)
+    if filter or sort_by:
+        overall = [stars_to_rob(normalize_jbi_value(rob)) for rob in df["Overall RoB"]]
+        index = study_index(df["Author,Year"], overall, ["Not Applicable", "Low", "Unclear", "High"])
+        df = select_studies(df, index, filter, sort_by)
+    update = None
+    if incremental and targets:
+        update = diff_studies(state_file or default_state_file(targets), "jbi_case_series", study_judgments(df), targets)
+        if not update.pages:
+            if not return_array:
+                print("✅ No study changes since the last render; outputs are up to date")
+                return
+            targets = []
+    counts = update.counts.get("") if update else None
+    if collapse:
+        judgments = study_judgments(df)
+        df, counts = collapse_patterns(df, judgments, "Author,Year", collapse), domain_counts(judgments)
+    result = render_variants(lambda t: build_jbi_series_figure(df, t, counts), targets, SAVED_MESSAGE, max_memory,
+                             theme if return_array else None, png_options, label_options,
+                             vector_options=vector_options, deterministic=deterministic)
+    if update:
+        save_state(update)
+    return result
 
 if __name__ == "__main__":
     if len(sys.argv) not in [3,4]:
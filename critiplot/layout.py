@@ -0,0 +1,112 @@
+import bisect
+import math
+from functools import lru_cache
+from typing import NamedTuple
+
+import matplotlib
+from matplotlib.backends.backend_agg import RendererAgg
+
+
+class GridSpec(NamedTuple):
+    """Inches and axes x-extents of a tool's grid-above-summary figure"""
+    width: float
+    per_row: float
+    min_grid: float
+    summary: float
+    gap: float
+    top: float
+    bottom: float
+    grid_x: tuple = (0.12, 0.75)
+    summary_x: tuple = (0.12, 0.75)
+
+
+class FigureLayout(NamedTuple):
+    """Figure size and ``fig.add_axes`` rectangles for the study grid and summary chart"""
+    figsize: tuple
+    grid_rect: list
+    summary_rect: list
+
+
+class GradeLayout(NamedTuple):
+    """GRADE figure size, dpi and plot/legend rectangles"""
+    figsize: tuple
+    dpi: int
+    plot_rect: list
+    legend_rects: list
+    text_rect: list
+    scaled: bool
+
+
+LAYOUT_SPECS = {
+    "nos": GridSpec(18, 0.65, 4.0, 2.4, 1.7, 1.0, 0.5),
+    "robis": GridSpec(24, 0.65, 3.0, 3.5, 1.7, 1.0, 0.5),
+    "jbi_case_report": GridSpec(18, 0.65, 4.0, 6.5, 3.5, 1.0, 0.5),
+    "jbi_case_series": GridSpec(18, 0.6, 4.0, 6.5, 3.5, 1.0, 0.5),
+    "mmat": GridSpec(18, 0.6, 4.0, 3.4, 4.0, 1.0, 0.5, grid_x=(0.005, 0.92), summary_x=(0.05, 0.70)),
+}
+
+# GRADE row height by outcome count: up to 5 rows 0.3", up to 10 0.49", ...
+GRADE_ROW_LIMITS = [5, 10, 20, 50]
+GRADE_ROW_HEIGHTS = [0.3, 0.49, 0.63, 0.85, 0.9]
+GRADE_MAX_HEIGHT = 100.0
+GRADE_MAX_PIXELS = 178956970 * 0.85
+
+
+@lru_cache(maxsize=512)
+def figure_layout(tool: str, n_rows: int) -> FigureLayout:
+    """Geometry of a tool's figure for ``n_rows`` studies, memoized per (tool, n_rows)"""
+    spec = LAYOUT_SPECS[tool]
+    grid_height = max(spec.min_grid, n_rows * spec.per_row)
+    total_height = grid_height + spec.gap + spec.summary + spec.top + spec.bottom
+
+    grid_bottom = (spec.bottom + spec.summary + spec.gap) / total_height
+    summary_bottom = spec.bottom / total_height
+    return FigureLayout(
+        (spec.width, total_height),
+        [spec.grid_x[0], grid_bottom, spec.grid_x[1], grid_height / total_height],
+        [spec.summary_x[0], summary_bottom, spec.summary_x[1], spec.summary / total_height],
+    )
+
+
+@lru_cache(maxsize=512)
+def grade_layout(n_rows: int) -> GradeLayout:
+    """GRADE geometry for ``n_rows`` outcomes, capped at 100" high and ~152 MP at the chosen dpi"""
+    row_height = GRADE_ROW_HEIGHTS[bisect.bisect_left(GRADE_ROW_LIMITS, n_rows)]
+    plot_height = 2.8 + n_rows * row_height
+    legend_text_height = 3.0
+    total_height = plot_height + legend_text_height
+
+    scaled = total_height > GRADE_MAX_HEIGHT
+    if scaled:
+        plot_height = plot_height * (GRADE_MAX_HEIGHT / total_height)
+        total_height = GRADE_MAX_HEIGHT
+
+    dpi = 300
+    if 24 * total_height * dpi * dpi > GRADE_MAX_PIXELS:
+        dpi = max(int(math.sqrt(GRADE_MAX_PIXELS / (24 * total_height))), 50)
+
+    legend_bottom = 0.2 / total_height
+    legend_height = 1.05 / total_height
+    return GradeLayout(
+        (16.8, total_height),
+        dpi,
+        [0.08, legend_text_height / total_height, 0.84, plot_height / total_height],
+        [[0.62, legend_bottom, 0.18, legend_height], [0.82, legend_bottom, 0.18, legend_height]],
+        [0.08, legend_bottom, 0.52, legend_height],
+        scaled,
+    )
+
+
+def measure_tight_bbox(fig, dpi: float, pad=None):
+    """The padded tight bounding box (inches) ``savefig(bbox_inches="tight")`` would use.
+
+    Text extents depend only on the dpi, so a 1x1 Agg renderer measures the
+    same box without allocating a full-size canvas first.
+    """
+    pad = matplotlib.rcParams["savefig.pad_inches"] if pad in (None, "layout") else pad
+    screen_dpi = fig.dpi
+    fig.dpi = dpi
+    try:
+        return fig.get_tightbbox(RendererAgg(1, 1, dpi)).padded(pad)
+    finally:
+        fig.dpi = screen_dpi
@@ -0,0 +1,193 @@
+import io
+import os
+import re
+import struct
+import zlib
+from typing import NamedTuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import RendererAgg
+from matplotlib.collections import Collection
+from matplotlib.lines import Line2D
+from matplotlib.text import Text
+from matplotlib.transforms import Bbox
+
+from .layout import measure_tight_bbox
+from .png import PNG_SIGNATURE, png_chunk
+
+VECTOR_EXTENSIONS = [".pdf", ".svg", ".eps"]
+ARTIST_BYTES = 4096
+POINT_BYTES = 64
+RASTER_COPIES = 4
+AGG_MAX_PIXELS = 2 ** 16
+MIN_BAND_ROWS = 64
+MIN_DPI = 72
+UNITS = {"": 1, "K": 2 ** 10, "M": 2 ** 20, "G": 2 ** 30}
+
+
+class MemoryPlan(NamedTuple):
+    """How a figure is saved to stay under ``max_memory``"""
+    strategy: str
+    dpi: float
+    band_rows: int
+    estimate: int
+
+    def describe(self) -> str:
+        detail = {
+            "full": f"full raster at {self.dpi:g} dpi",
+            "vector": "vector backend, no raster buffer",
+            "tiled": f"tiled in bands of {self.band_rows} rows at {self.dpi:g} dpi",
+            "reduced dpi": f"tiled in bands of {self.band_rows} rows at a reduced {self.dpi:g} dpi",
+        }[self.strategy]
+        return f"{detail} (~{self.estimate / 2 ** 20:.0f} MB)"
+
+
+def parse_memory(value) -> int:
+    """Bytes from an int or a size string such as "512MB" or "2G" (binary units)"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMG]?)i?B?\s*", str(value), re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid max_memory: {value!r}. Use bytes or a size like '512MB'.")
+    return int(float(match.group(1)) * UNITS[match.group(2).upper()])
+
+
+def artist_bytes(fig) -> int:
+    """Rough memory held by the figure's artists while drawing"""
+    total = 0
+    for artist in fig.findobj():
+        total += ARTIST_BYTES
+        if isinstance(artist, Collection):
+            total += POINT_BYTES * len(artist.get_offsets())
+    return total
+
+
+def process_rss() -> int:
+    """Resident set size of this process in bytes, or 0 where /proc is unavailable"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0
+
+
+def plan_save(fig, output_file: str, dpi: float, max_memory) -> MemoryPlan:
+    """Pick the cheapest-looking strategy that keeps the save under ``max_memory``.
+
+    The budget covers the whole process: the current RSS (or, without
+    /proc, an estimate of the figure's artists) plus the raster buffers the
+    save allocates. Preference order is a plain save, PNG tiling at the
+    requested dpi, then tiling at a lower dpi (down to 72). Vector formats
+    never allocate an Agg buffer. Raises MemoryError when nothing fits.
+    """
+    budget = parse_memory(max_memory)
+    used = process_rss() or artist_bytes(fig)
+    if used >= budget:
+        raise MemoryError(f"Already using ~{used / 2 ** 20:.0f} MB, "
+                          f"more than max_memory ({budget / 2 ** 20:.0f} MB)")
+
+    ext = os.path.splitext(output_file)[1].lower()
+    if ext in VECTOR_EXTENSIONS:
+        return MemoryPlan("vector", dpi, 0, used)
+
+    raster_budget = budget - used
+    width_in, height_in = fig.get_size_inches()
+    width_px, height_px = width_in * dpi, height_in * dpi
+    full = int(width_px * height_px * 4 * RASTER_COPIES)
+    if full <= raster_budget and max(width_px, height_px) < AGG_MAX_PIXELS:
+        return MemoryPlan("full", dpi, 0, used + full)
+
+    row_bytes = width_px * 4 * RASTER_COPIES
+    rows = int(raster_budget // row_bytes)
+    if rows >= MIN_BAND_ROWS:
+        rows = min(rows, AGG_MAX_PIXELS - 1)
+        return MemoryPlan("tiled", dpi, rows, used + int(rows * row_bytes))
+
+    reduced = raster_budget / (width_in * 4 * RASTER_COPIES * MIN_BAND_ROWS)
+    if reduced >= MIN_DPI:
+        reduced = min(int(reduced), dpi)
+        row_bytes = width_in * reduced * 4 * RASTER_COPIES
+        return MemoryPlan("reduced dpi", reduced, MIN_BAND_ROWS, used + int(MIN_BAND_ROWS * row_bytes))
+
+    raise MemoryError(f"max_memory ({budget / 2 ** 20:.0f} MB) is too small to render {output_file} "
+                      f"even at {MIN_DPI} dpi; use a vector format (.pdf, .svg) or raise the budget")
+
+
+def _draw_band(fig, band: Bbox, dpi: float, culled: list, save_options: dict) -> np.ndarray:
+    """Draw one band as PNG scanlines (a zero filter byte before each RGBA row)"""
+    for artist in culled:
+        artist.set_visible(False)
+    buf = io.BytesIO()
+    try:
+        fig.savefig(buf, format="rgba", dpi=dpi, bbox_inches=band, **save_options)
+    finally:
+        for artist in culled:
+            artist.set_visible(True)
+    pixels = np.frombuffer(buf.getbuffer(), np.uint8)
+    width = int(band.width * dpi)
+    scanlines = np.zeros((len(pixels) // (width * 4), width * 4 + 1), np.uint8)
+    scanlines[:, 1:] = pixels.reshape(len(scanlines), width * 4)
+    return scanlines
+
+
+def measure_bands(fig, dpi: float, pad=None) -> tuple:
+    """The tight bbox from ``measure_tight_bbox`` and the (artist, window extent) of every text and line.
+
+    The extents, measured with a 1x1 renderer, let each band skip the
+    artists lying entirely outside it.
+    """
+    bbox = measure_tight_bbox(fig, dpi, pad)
+    screen_dpi = fig.dpi
+    fig.dpi = dpi
+    try:
+        renderer = RendererAgg(1, 1, dpi)
+        extents = [(artist, artist.get_window_extent(renderer)) for artist in fig.findobj(
+            lambda a: isinstance(a, (Text, Line2D)) and a.get_visible())]
+    finally:
+        fig.dpi = screen_dpi
+    return bbox, extents
+
+
+def band_bbox(bbox: Bbox, height: int, y: int, rows: int, dpi: float) -> Bbox:
+    """Bbox (inches) of the ``rows`` image rows starting ``y`` rows below the top of ``bbox``"""
+    # Agg keeps the bottom edge and truncates the height, so pad the top by
+    # half a pixel to get exactly ``rows`` rows
+    bottom = bbox.y0 + (height - y - rows) / dpi
+    return Bbox.from_extents(bbox.x0, bottom, bbox.x1, bottom + (rows + 0.5) / dpi)
+
+
+def draw_band(fig, band: Bbox, dpi: float, extents: list, save_options: dict) -> np.ndarray:
+    """PNG scanlines of one band, hiding the artists that lie entirely outside it"""
+    culled = [artist for artist, extent in extents
+              if extent.y1 < band.y0 * dpi - 2 or extent.y0 > band.y1 * dpi + 2]
+    return _draw_band(fig, band, dpi, culled, save_options)
+
+
+def save_tiled_png(fig, output_file: str, dpi: float, band_rows: int, compression: int = 6, **save_options):
+    """Save ``fig`` as an RGBA PNG by drawing and compressing one horizontal band at a time.
+
+    The tight bounding box is measured with a 1x1 renderer, each band is
+    drawn through ``savefig(bbox_inches=band)`` so Agg only allocates the
+    band, and rows are streamed into the PNG's zlib stream at level
+    ``compression``.
+    """
+    save_options.pop("bbox_inches", None)
+    bbox, extents = measure_bands(fig, dpi, save_options.pop("pad_inches", None))
+    width, height = int(bbox.width * dpi), int(bbox.height * dpi)
+
+    compressor = zlib.compressobj(compression)
+    ppm = int(round(dpi / 0.0254))
+    tmp_path = f"{output_file}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PNG_SIGNATURE)
+        f.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)))
+        f.write(png_chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1)))
+        for y in range(0, height, band_rows):
+            rows = min(band_rows, height - y)
+            band = band_bbox(bbox, height, y, rows, dpi)
+            data = compressor.compress(draw_band(fig, band, dpi, extents, save_options))
+            if data:
+                f.write(png_chunk(b"IDAT", data))
+        f.write(png_chunk(b"IDAT", compressor.flush()))
+        f.write(png_chunk(b"IEND", b""))
+    os.replace(tmp_path, output_file)
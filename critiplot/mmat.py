@@ -1,293 +1,330 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import sys
 import os
 import numpy as np
+from matplotlib.artist import setp
 from matplotlib.lines import Line2D
-from collections import defaultdict
+from .cache import load_or_process
+from .collapse import check_collapse, collapse_patterns
+from .incremental import default_state_file, diff_studies, save_state
+from .layout import figure_layout
+from .mmat_data import (CATEGORIES, criterion_distribution, get_criteria_columns, process_mmat, rated_cells,
+                        rating_to_risk, read_input_file, study_judgments)
+from .render import ThemedFigure, legend_handles, new_figure, output_targets, render_variants, row_lines
+from .subset import select_studies, study_index
 
-def process_mmat(df: pd.DataFrame) -> pd.DataFrame:
-    """Process MMAT data for visualization with memory optimizations"""
+THEME_OPTIONS = {
+    "default": {"Low":"#2E7D32", "Moderate":"#F9A825", "High":"#C62828"},
+    "blue": {"Low":"#3a83b7","Moderate":"#bdcfe7","High":"#084582"},
+    "gray": {"Low":"#63BF93FF","Moderate":"#5B6D80","High":"#FF884DFF"},
+    "smiley": {"Low":"#2E7D32", "Moderate":"#F9A825", "High":"#C62828"},
+    "smiley_blue": {"Low":"#3a83b7","Moderate":"#7fb2e6","High":"#084582"}
+}
+
+def category_output_file(output_file: str, category: str) -> str:
+    """Output path for one study category, e.g. out.png -> out_Qualitative.png"""
+    return output_file.replace(f".{output_file.split('.')[-1]}", f"_{category}.{output_file.split('.')[-1]}")
+
+def build_mmat_figure(category_df: pd.DataFrame, category: str, criteria_columns: list,
+                      theme: str = "default", counts: dict = None, distribution: np.ndarray = None) -> ThemedFigure:
+    """Lay out one category's MMAT figure once; it can be re-themed and saved repeatedly.
+
+    ``distribution`` is this category's slice of ``criterion_distribution``
+    and ``counts`` ({criterion: {risk: n}}) supplies precomputed summary
+    counts, e.g. from an incremental update; without either the summary is
+    computed from ``category_df``.
+    """
+    if theme not in THEME_OPTIONS:
+        raise ValueError(f"Theme {theme} not available. Choose from {list(THEME_OPTIONS.keys())}")
+    colors = THEME_OPTIONS[theme]
+
+    n_studies = len(category_df)
+    n_criteria = len(criteria_columns)
+
+    layout = figure_layout("mmat", n_studies)
+    fig = new_figure(figsize=layout.figsize)
+    ax0 = fig.add_axes(layout.grid_rect)
+    ax1 = fig.add_axes(layout.summary_rect)
     
-    non_criteria_columns = {"Author_Year", "Study_Category", "Overall_Rating"}
-    criteria_columns = [col for col in df.columns if col not in non_criteria_columns]
+    study_order = category_df["Study_Display"].tolist()
+    author_pos = {a: i for i, a in enumerate(study_order)}
+    all_criteria = criteria_columns + ["Overall Rating"]
+    criterion_pos = {c: i for i, c in enumerate(all_criteria)}
     
-    required_columns = non_criteria_columns.union(criteria_columns)
-    missing = [col for col in required_columns if col not in df.columns]
-    if missing:
-        raise ValueError(f"Missing required columns: {missing}")
+    row_lines(ax0, [*range(len(author_pos)), -0.5, len(author_pos)-0.5], colors='lightgray', linewidth=0.8, zorder=0)
+
+    cells = []
+    for _, row in category_df.iterrows():
+        y_pos = author_pos[row["Study_Display"]]
+        for criterion in criteria_columns:
+            cells.append((criterion_pos[criterion], y_pos, rating_to_risk(row[criterion])))
+        cells.append((criterion_pos["Overall Rating"], y_pos, rating_to_risk(row["Overall_Rating"])))
+
+    def draw_cells(family, colors):
+        if family == "smiley":
+            symbol_map = {"Low": "☺", "High": "☹", "Moderate": "😐"}
+            bindings = []
+            for x_pos, y_pos, risk in cells:
+                text = ax0.text(x_pos, y_pos, symbol_map[risk], fontsize=35, ha='center', va='center', 
+                                color=colors[risk], fontweight='bold', zorder=1)
+                bindings.append((text, risk))
+            return bindings
+
+        x_coords, y_coords, risks = zip(*cells) if cells else ((), (), ())
+        scatter = ax0.scatter(x_coords, y_coords, c=[colors[r] for r in risks], s=1000, marker="s", 
+                              edgecolor='white', linewidth=1, zorder=1)
+        return [(scatter, list(risks))]
+
+    themed = ThemedFigure(fig, THEME_OPTIONS, draw_cells)
+    
+    ax0.set_xlim(-0.5, len(all_criteria)-0.5)
+    ax0.set_ylim(-0.5, n_studies-0.5)
+    ax0.set_xticks(range(len(all_criteria)))
+    ax0.set_xticklabels(all_criteria, fontsize=18, fontweight="bold", rotation=45, ha='right')
+    ax0.set_yticks(list(author_pos.values()))
+    ax0.set_yticklabels(list(author_pos.keys()), fontsize=18, fontweight="bold", rotation=0)
+    ax0.set_facecolor('white')
+    ax0.set_title(f"MMAT Traffic-Light Plot - {category}", fontsize=22, fontweight="bold")
+    ax0.set_xlabel("")
+    ax0.set_ylabel("")
+    ax0.grid(axis='x', linestyle='--', alpha=0.25)
     
-    valid_categories = {"Qualitative", "Randomized", "Non-randomized", "Descriptive", "Mixed Methods"}
-    invalid_categories = set(df["Study_Category"].unique()) - valid_categories
-    if invalid_categories:
-        raise ValueError(f"Invalid study categories: {invalid_categories}")
+    risks = ["High", "Moderate", "Low"]
+    if counts is not None:
+        distribution = np.array([[counts.get(criterion, {}).get(risk, 0) for risk in risks]
+                                 for criterion in all_criteria]) / n_studies * 100
+    elif distribution is None:
+        distribution = criterion_distribution(category_df, criteria_columns)[1][0]
     
-    valid_ratings = {"Yes", "No", "Can't tell"}
-    for col in criteria_columns:
-        invalid_ratings = set(df[col].unique()) - valid_ratings
-        if invalid_ratings:
-            raise ValueError(f"Invalid ratings for {col}: {invalid_ratings}")
+    inverted_criteria = all_criteria[::-1]
+    bar_height = 0.90
+    percent = distribution[::-1]
+    left = np.zeros_like(percent)
+    left[:, 1:] = np.cumsum(percent[:, :-1], axis=1)
     
-    valid_overall_ratings = {"Yes", "No", "Can't tell", "High", "Moderate", "Low"}
-    invalid_overall = set(df["Overall_Rating"].unique()) - valid_overall_ratings
-    if invalid_overall:
-        raise ValueError(f"Invalid ratings for Overall_Rating: {invalid_overall}")
+    for i, risk in enumerate(risks):
+        bars = ax1.barh(
+            inverted_criteria, 
+            percent[:, i], 
+            left=left[:, i] if i else None, 
+            color=colors[risk], 
+            edgecolor='black', 
+            label=risk, 
+            height=bar_height
+        )
+        for patch in bars:
+            themed.bind(patch, risk)
     
-    df["Study_Display"] = df["Author_Year"]
+    for i, j in zip(*np.nonzero(percent > 0)):
+        ax1.text(left[i, j] + percent[i, j]/2, i, f"{percent[i, j]:.0f}%", 
+                ha='center', va='center', color='black', 
+                fontsize=16, fontweight='bold')
     
-    return df
+    ax1.set_xlim(0, 100)
+    ax1.set_xticks([0, 20, 40, 60, 80, 100])
+    ax1.set_xticklabels([0, 20, 40, 60, 80, 100], fontsize=18, fontweight='bold')
+    ax1.set_yticks(range(len(inverted_criteria)))
+    ax1.set_yticklabels(inverted_criteria, fontsize=18, fontweight='bold')
+    ax1.set_xlabel("Percentage of Studies (%)", fontsize=18, fontweight="bold")
+    ax1.set_ylabel("")
+    ax1.set_title(f"Distribution of Ratings by Criterion - {category}", fontsize=22, fontweight="bold")
+    ax1.grid(axis='x', linestyle='--', alpha=0.25)
+    
+    row_lines(ax1, [y - 0.5 for y in range(len(inverted_criteria))], colors='lightgray', linewidth=0.8, zorder=0)
+    
+    legend_elements = [
+        Line2D([0], [0], marker='s', color='w', label='Yes/Low Risk', 
+              markerfacecolor=colors["Low"], markersize=18),
+        Line2D([0], [0], marker='s', color='w', label='Unclear/Moderate Risk', 
+              markerfacecolor=colors["Moderate"], markersize=18),
+        Line2D([0], [0], marker='s', color='w', label='No/High Risk', 
+              markerfacecolor=colors["High"], markersize=18)
+    ]
+    legend = ax1.legend(
+        handles=legend_elements,
+        title="Criterion Risk",
+        bbox_to_anchor=(1.02, 1),
+        loc='upper left',
+        fontsize=18,
+        title_fontsize=20,
+        frameon=True,
+        fancybox=True,
+        edgecolor='black'
+    )
+    setp(legend.get_title(), fontweight='bold')
+    for text in legend.get_texts():
+        text.set_fontweight('bold')
+    for handle, risk in zip(legend_handles(legend), ["Low", "Moderate", "High"]):
+        themed.bind(handle, risk)
 
-def get_criteria_columns(df: pd.DataFrame) -> list:
-    """Get criteria columns from the dataframe"""
-    non_criteria_columns = {"Author_Year", "Study_Category", "Overall_Rating", "Study_Display"}
-    return [col for col in df.columns if col not in non_criteria_columns]
+    themed.set_theme(theme)
+    return themed
 
-def rating_to_risk(rating):
-    """Convert MMAT rating to risk level"""
-    if rating in {"Yes", "Low"}:
-        return "Low"
-    elif rating in {"No", "High"}:
-        return "High"
-    return "Moderate"
+def render_mmat_variants(df: pd.DataFrame, targets: list, pages: set = None, counts: dict = None,
+                         max_memory=None, array_theme: str = None, png_options: dict = None,
+                         label_options: dict = None, vector_options: dict = None,
+                         deterministic: bool = False, collapse: str = None) -> dict:
+    """Render every study category once, saving each (output_file, theme) variant.
 
-def mmat_plot(df: pd.DataFrame, output_file: str, theme: str = "default"):
-    """Create MMAT visualization with memory optimizations"""
-    
+    ``pages`` limits rendering to those categories and ``counts`` maps a
+    category to its precomputed summary counts (both from an incremental update).
+    With ``collapse`` each category draws one row per distinct judgment
+    pattern; its summary bars still come from every study.
+    ``max_memory``, ``png_options``, ``label_options``, ``vector_options`` and
+    ``deterministic`` apply to each figure. With
+    ``array_theme`` every category is also rendered into memory; returns
+    {category: RenderedArray}.
+    """
     criteria_columns = get_criteria_columns(df)
+    categories, distributions = criterion_distribution(df, criteria_columns)
+    category_rows = df.groupby("Study_Category").indices
+    arrays = {}
     
-    theme_options = {
-        "default": {"Low":"#2E7D32", "Moderate":"#F9A825", "High":"#C62828"},
-        "blue": {"Low":"#3a83b7","Moderate":"#bdcfe7","High":"#084582"},
-        "gray": {"Low":"#63BF93FF","Moderate":"#5B6D80","High":"#FF884DFF"},
-        "smiley": {"Low":"#2E7D32", "Moderate":"#F9A825", "High":"#C62828"},
-        "smiley_blue": {"Low":"#3a83b7","Moderate":"#7fb2e6","High":"#084582"}
-    }
-
-    if theme not in theme_options:
-        raise ValueError(f"Theme {theme} not available. Choose from {list(theme_options.keys())}")
-    colors = theme_options[theme]
-    
-    categories = sorted(df["Study_Category"].unique())
-    
-    for category in categories:
-        category_mask = df["Study_Category"] == category
-        category_df = df[category_mask].copy()
-        n_studies = len(category_df)
-        n_criteria = len(criteria_columns)
-
-        per_study_height = 0.6
-        min_first_plot_height = 4.0
-        second_plot_height = 3.4
-        gap_between_plots = 4.0
-        top_margin = 1.0
-        bottom_margin = 0.5
-        
-        first_plot_height = max(min_first_plot_height, n_studies * per_study_height)
-        total_height = first_plot_height + gap_between_plots + second_plot_height + top_margin + bottom_margin
-        
-        fig = plt.figure(figsize=(18, total_height))
-        
-        
-        ax0_bottom = (bottom_margin + second_plot_height + gap_between_plots) / total_height
-        ax0_height = first_plot_height / total_height
-        ax1_bottom = bottom_margin / total_height
-        ax1_height = second_plot_height / total_height
-        
-        ax0 = fig.add_axes([0.005, ax0_bottom, 0.92, ax0_height])
-        ax1 = fig.add_axes([0.05, ax1_bottom, 0.70, ax1_height])
-        
-        study_order = category_df["Study_Display"].tolist()
-        author_pos = {a: i for i, a in enumerate(study_order)}
-        all_criteria = criteria_columns + ["Overall Rating"]
-        criterion_pos = {c: i for i, c in enumerate(all_criteria)}
-        
-        for y in range(len(author_pos)):
-            ax0.axhline(y, color='lightgray', linewidth=0.8, zorder=0)
-        ax0.axhline(-0.5, color='lightgray', linewidth=0.8, zorder=0)
-        ax0.axhline(len(author_pos)-0.5, color='lightgray', linewidth=0.8, zorder=0)
-        
-        if theme.startswith("smiley"):
-            symbol_map = {"Yes": "☺", "No": "☹", "Can't tell": "😐", 
-                         "Low": "☺", "High": "☹", "Moderate": "😐"}
-            
-            for _, row in category_df.iterrows():
-                y_pos = author_pos[row["Study_Display"]]
-                
-            
-                for criterion in criteria_columns:
-                    rating = row[criterion]
-                    symbol = symbol_map.get(rating, "😐")
-                    risk = rating_to_risk(rating)
-                    x_pos = criterion_pos[criterion]
-                    ax0.text(x_pos, y_pos, symbol, fontsize=35, ha='center', va='center', 
-                            color=colors[risk], fontweight='bold', zorder=1)
-                
-                
-                overall_rating = row["Overall_Rating"]
-                symbol = symbol_map.get(overall_rating, "😐")
-                risk = rating_to_risk(overall_rating)
-                x_pos = criterion_pos["Overall Rating"]
-                ax0.text(x_pos, y_pos, symbol, fontsize=35, ha='center', va='center', 
-                        color=colors[risk], fontweight='bold', zorder=1)
-        else:
-            x_coords = []
-            y_coords = []
-            point_colors = []
-            
-            for _, row in category_df.iterrows():
-                y_pos = author_pos[row["Study_Display"]]
-                
-                
-                for criterion in criteria_columns:
-                    rating = row[criterion]
-                    risk = rating_to_risk(rating)
-                    x_coords.append(criterion_pos[criterion])
-                    y_coords.append(y_pos)
-                    point_colors.append(colors[risk])
-                
-        
-                overall_rating = row["Overall_Rating"]
-                risk = rating_to_risk(overall_rating)
-                x_coords.append(criterion_pos["Overall Rating"])
-                y_coords.append(y_pos)
-                point_colors.append(colors[risk])
-            
-            ax0.scatter(x_coords, y_coords, c=point_colors, s=1000, marker="s", 
-                       edgecolor='white', linewidth=1, zorder=1)
-        
-        ax0.set_xlim(-0.5, len(all_criteria)-0.5)
-        ax0.set_ylim(-0.5, n_studies-0.5)
-        ax0.set_xticks(range(len(all_criteria)))
-        ax0.set_xticklabels(all_criteria, fontsize=18, fontweight="bold", rotation=45, ha='right')
-        ax0.set_yticks(list(author_pos.values()))
-        ax0.set_yticklabels(list(author_pos.keys()), fontsize=18, fontweight="bold", rotation=0)
-        ax0.set_facecolor('white')
-        ax0.set_title(f"MMAT Traffic-Light Plot - {category}", fontsize=22, fontweight="bold")
-        ax0.set_xlabel("")
-        ax0.set_ylabel("")
-        ax0.grid(axis='x', linestyle='--', alpha=0.25)
-        
-        bar_data = defaultdict(lambda: defaultdict(float))
-        
-        for criterion in criteria_columns:
-            rating_counts = category_df[criterion].value_counts(normalize=True)
-            for rating in ["Yes", "No", "Can't tell"]:
-                percentage = rating_counts.get(rating, 0) * 100
-                bar_data[criterion][rating_to_risk(rating)] += percentage
-        
-        overall_counts = category_df["Overall_Rating"].value_counts(normalize=True)
-        for rating in ["High", "Moderate", "Low"]:
-            percentage = overall_counts.get(rating, 0) * 100
-            bar_data["Overall Rating"][rating_to_risk(rating)] += percentage
-        
-        inverted_criteria = all_criteria[::-1]
-        bar_height = 0.90
-        
-        bottom = None
-        for risk in ["High", "Moderate", "Low"]:
-            values = [bar_data[criterion].get(risk, 0) for criterion in inverted_criteria]
-            ax1.barh(
-                inverted_criteria, 
-                values, 
-                left=bottom, 
-                color=colors[risk], 
-                edgecolor='black', 
-                label=risk, 
-                height=bar_height
-            )
-            if bottom is None:
-                bottom = np.array(values)
-            else:
-                bottom = bottom + np.array(values)
-        
-        for i, criterion in enumerate(inverted_criteria):
-            left = 0
-            for risk in ["High", "Moderate", "Low"]:
-                width = bar_data[criterion].get(risk, 0)
-                if width > 0:
-                    ax1.text(left + width/2, i, f"{width:.0f}%", 
-                            ha='center', va='center', color='black', 
-                            fontsize=16, fontweight='bold')
-                    left += width
-        
-        ax1.set_xlim(0, 100)
-        ax1.set_xticks([0, 20, 40, 60, 80, 100])
-        ax1.set_xticklabels([0, 20, 40, 60, 80, 100], fontsize=18, fontweight='bold')
-        ax1.set_yticks(range(len(inverted_criteria)))
-        ax1.set_yticklabels(inverted_criteria, fontsize=18, fontweight='bold')
-        ax1.set_xlabel("Percentage of Studies (%)", fontsize=18, fontweight="bold")
-        ax1.set_ylabel("")
-        ax1.set_title(f"Distribution of Ratings by Criterion - {category}", fontsize=22, fontweight="bold")
-        ax1.grid(axis='x', linestyle='--', alpha=0.25)
-        
-        for y in range(len(inverted_criteria)):
-            ax1.axhline(y-0.5, color='lightgray', linewidth=0.8, zorder=0)
-        
-        legend_elements = [
-            Line2D([0], [0], marker='s', color='w', label='Yes/Low Risk', 
-                  markerfacecolor=colors["Low"], markersize=18),
-            Line2D([0], [0], marker='s', color='w', label='Unclear/Moderate Risk', 
-                  markerfacecolor=colors["Moderate"], markersize=18),
-            Line2D([0], [0], marker='s', color='w', label='No/High Risk', 
-                  markerfacecolor=colors["High"], markersize=18)
-        ]
-        legend = ax1.legend(
-            handles=legend_elements,
-            title="Criterion Risk",
-            bbox_to_anchor=(1.02, 1),
-            loc='upper left',
-            fontsize=18,
-            title_fontsize=20,
-            frameon=True,
-            fancybox=True,
-            edgecolor='black'
+    for category, distribution in zip(categories, distributions):
+        # Unchanged categories are not saved again but still rendered to arrays
+        skip_files = pages is not None and category not in pages
+        if skip_files and array_theme is None:
+            continue
+        category_df = df.take(category_rows[category])
+        category_counts = counts.get(category) if counts else None
+        if collapse:
+            # The bars use this category's distribution over all of its studies
+            category_df = collapse_patterns(category_df, study_judgments(category_df), "Study_Display", collapse)
+            category_counts = None
+        result = render_variants(
+            lambda t: build_mmat_figure(category_df, category, criteria_columns, t, category_counts,
+                                        distribution),
+            [] if skip_files else [(category_output_file(path, category), t) for path, t in targets],
+            f"✅ {category} plot saved to {{}}",
+            max_memory,
+            array_theme,
+            png_options,
+            label_options,
+            vector_options,
+            deterministic
         )
-        plt.setp(legend.get_title(), fontweight='bold')
-        for text in legend.get_texts():
-            text.set_fontweight('bold')
-        
-        category_output_file = output_file.replace(f".{output_file.split('.')[-1]}", f"_{category}.{output_file.split('.')[-1]}")
-        plt.savefig(category_output_file, dpi=300, bbox_inches='tight')
-        plt.close(fig)
-        print(f"✅ {category} plot saved to {category_output_file}")
+        if result is not None:
+            arrays[category] = result
         
         del category_df
-        del bar_data
+    return arrays
 
-def read_input_file(file_path: str) -> pd.DataFrame:
-    """Read input file (CSV or Excel) with memory optimizations"""
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext == ".csv":
-        return pd.read_csv(file_path, engine='c')
-    elif ext in [".xls", ".xlsx"]:
-        return pd.read_excel(file_path, engine='openpyxl')
-    else:
-        raise ValueError(f"Unsupported file format: {ext}. Provide a CSV or Excel file.")
+def mmat_plot(df: pd.DataFrame, output_file: str, theme: str = "default"):
+    """Create MMAT visualization with memory optimizations"""
+    if theme not in THEME_OPTIONS:
+        raise ValueError(f"Theme {theme} not available. Choose from {list(THEME_OPTIONS.keys())}")
+    render_mmat_variants(df, [(output_file, theme)])
 
-def plot_mmat(input_file: str, output_file: str, theme: str = "default"):
+def plot_mmat(input_file: str, output_file: str = None, theme: str = "default", cache: bool = False,
+              outputs: dict = None, incremental: bool = False, state_file: str = None, max_memory=None,
+              return_array: bool = False, png_options: dict = None, label_options: dict = None,
+              vector_options: dict = None,
+              deterministic: bool = False, collapse: str = None,
+              filter: dict = None, sort_by=None):
     """
     Generate MMAT traffic-light plots from input data.
     
     Parameters:
     -----------
     input_file : str
-        Path to the input CSV or Excel file containing MMAT data
+        Path to the input CSV, Excel, Parquet or Feather file containing MMAT data
     output_file : str
         Path to save to output plot (supports .png, .pdf, .svg, .eps)
     theme : str, optional
         Color theme for the plot. Options: "default", "blue", "gray", "smiley", "smiley_blue"
-        
+    cache : bool, optional
+        Store the normalized data as a Feather sidecar next to the input file
+        and reuse it on later calls until the input changes. Default is False
+    outputs : dict, optional
+        Extra {output_path: theme} variants, e.g. {"a.png": "default", "b.pdf": "blue"}.
+        Each category figure is laid out once; each variant only recolors the
+        existing artists before saving.
+    incremental : bool, optional
+        Keep the judgment matrix and per-category counts in a state file, diff
+        the new input by study and only re-render the categories whose
+        studies changed (or whose files are missing). Default is False
+    state_file : str, optional
+        State file for incremental mode. Default is "<first output>.state.json"
+    max_memory : int or str, optional
+        Memory budget for saving, in bytes or as a size like "512MB". Each
+        save is planned to fit (full raster, PNG tiling, reduced dpi or the
+        vector backend for .pdf/.svg/.eps) and the chosen strategy is printed.
+        Default is None (no budget)
+    return_array : bool, optional
+        Also render each category in ``theme`` straight from the Agg canvas and
+        return the images; output_file may then be None. Default is False
+    png_options : dict, optional
+        PNG encoding options for every category file: ``compression`` (zlib
+        level 0-9), ``palette`` (8-bit indexed PNG), ``encoder`` ("zlib" or
+        "parallel") and ``workers``. Default is None (matplotlib's PNG writer)
+    label_options : dict, optional
+        Fit long study labels to a width, e.g. {"max_width": 4, "mode": "wrap"}:
+        ``max_width`` is in inches and ``mode`` is "truncate" (cut with "…",
+        the default) or "wrap" (break at spaces), using cached text widths.
+        Default is None (labels as given)
+    vector_options : dict, optional
+        How .svg/.pdf/.eps files store text: {"text": "path"} (glyph
+        outlines, the default) or {"text": "font"} (real text with embedded
+        fonts; smaller files with many labels). Default is None
+    deterministic : bool, optional
+        Write byte-reproducible files (no dates or matplotlib version, fixed
+        SVG ids) and leave an output untouched (bytes and modification
+        time) when its contents did not change. Default is False
+    collapse : str, optional
+        Draw one row per distinct judgment pattern in each category, labelled
+        with its number of studies and ordered by "frequency" or "severity";
+        the summary bars still count every study. Default is None (one row
+        per study)
+    filter : dict, optional
+        Plot only the studies matching every key: "year" (a year, or an
+        inclusive (first, last) range with None for an open end, parsed from
+        the labels), "risk" (one or more overall judgments) and "category", e.g.
+        {"year": (2018, None), "risk": "High"}. Default is None (all studies)
+    sort_by : str or list, optional
+        Order the rows by "year", "risk" (severity), "label" or "category",
+        or by a list of those; a leading "-" sorts descending. Default is
+        None (input order)
+    
     Returns:
     --------
     None
-        The plot is saved to the specified output file path
+        The plot is saved to the specified output file path(s)
+    dict
+        Only with ``return_array=True``: {category: RenderedArray}, each a
+        zero-copy (H, W, 4) uint8 view plus layout metadata
     """
-    df = read_input_file(input_file)
-    df = process_mmat(df)
-    mmat_plot(df, output_file, theme)
+    targets = output_targets(output_file, theme, outputs, THEME_OPTIONS, required=not return_array)
+    check_collapse(collapse)
+    df = load_or_process(input_file, "mmat", lambda: process_mmat(read_input_file(input_file)), cache)
+    if filter or sort_by:
+        index = study_index(df["Study_Display"], [rating_to_risk(r) for r in df["Overall_Rating"]],
+                            ["Low", "Moderate", "High"], df["Study_Category"])
+        df = select_studies(df, index, filter, sort_by)
+    array_theme = theme if return_array else None
+    if not (incremental and targets):
+        arrays = render_mmat_variants(df, targets, max_memory=max_memory, array_theme=array_theme,
+                                      png_options=png_options, label_options=label_options,
+                                      vector_options=vector_options, deterministic=deterministic,
+                                      collapse=collapse)
+        del df
+        return arrays if return_array else None
+
+    update = diff_studies(
+        state_file or default_state_file(targets), "mmat", study_judgments(df), targets,
+        pages=df["Study_Category"],
+        page_outputs=lambda category: [category_output_file(path, category) for path, _ in targets],
+    )
+    if not update.pages:
+        if not return_array:
+            print("✅ No study changes since the last render; outputs are up to date")
+            return
+        targets = []
+    arrays = render_mmat_variants(df, targets, update.pages, update.counts, max_memory, array_theme,
+                                  png_options, label_options, vector_options, deterministic, collapse)
+    save_state(update)
     
     del df
+    return arrays if return_array else None
 
 if __name__ == "__main__":
     if len(sys.argv) not in [3,4]:
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from .reader import read_table
+from .schema import Column, Schema, register_schema
+
+CATEGORIES = ["Qualitative", "Randomized", "Non-randomized", "Descriptive", "Mixed Methods"]
+SCHEMA = register_schema(Schema("mmat", [
+    Column("Author_Year"),
+    Column("Study_Category", allowed=frozenset(CATEGORIES)),
+    Column("Overall_Rating", allowed=frozenset({"Yes", "No", "Can't tell", "High", "Moderate", "Low"})),
+], other=Column("criterion", allowed=frozenset({"Yes", "No", "Can't tell"}))))
+
+RATINGS = ["Yes", "No", "Can't tell", "High", "Moderate", "Low"]
+
+def process_mmat(df: pd.DataFrame) -> pd.DataFrame:
+    """Process MMAT data for visualization with memory optimizations"""
+    df = SCHEMA.validate(df)
+    
+    df["Study_Display"] = df["Author_Year"]
+    
+    return df
+
+def get_criteria_columns(df: pd.DataFrame) -> list:
+    """Get criteria columns from the dataframe"""
+    non_criteria_columns = {*SCHEMA.names, "Study_Display"}
+    return [col for col in df.columns if col not in non_criteria_columns]
+
+def rating_to_risk(rating):
+    """Convert MMAT rating to risk level"""
+    if rating in {"Yes", "Low"}:
+        return "Low"
+    elif rating in {"No", "High"}:
+        return "High"
+    return "Moderate"
+
+def criterion_distribution(df: pd.DataFrame, criteria_columns: list) -> tuple:
+    """Percentage of studies per category, criterion (plus "Overall Rating") and risk in one grouped count.
+
+    The criteria and Overall_Rating are melted to one long categorical
+    table and counted by (Study_Category, criterion, rating) at once.
+    Returns the sorted categories and a (categories, criteria + 1,
+    ["High", "Moderate", "Low"]) array; percentages are of the studies
+    rated on that criterion, and an Overall_Rating of Yes/No/Can't tell
+    counts towards the total but not towards any risk.
+    """
+    categories = sorted(df["Study_Category"].unique())
+    columns = [*criteria_columns, "Overall_Rating"]
+    long = df[["Study_Category", *columns]].melt(id_vars="Study_Category", var_name="criterion",
+                                                 value_name="rating")
+    long = long.astype({
+        "Study_Category": pd.CategoricalDtype(categories),
+        "criterion": pd.CategoricalDtype(columns),
+        "rating": pd.CategoricalDtype(RATINGS),
+    })
+    counts = long.groupby(["Study_Category", "criterion", "rating"], observed=False).size().to_numpy()
+    counts = counts.reshape(len(categories), len(columns), len(RATINGS))
+    totals = counts.sum(axis=2, keepdims=True)
+    share = np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0) * 100
+    # Criteria are rated No/Can't tell/Yes, the overall rating High/Moderate/Low
+    distribution = share[..., [RATINGS.index(r) for r in ["No", "Can't tell", "Yes"]]]
+    distribution[:, -1] = share[:, -1, [RATINGS.index(r) for r in ["High", "Moderate", "Low"]]]
+    return categories, distribution
+
+def study_judgments(df: pd.DataFrame) -> pd.DataFrame:
+    """Risk per study and criterion (plus "Overall Rating"), indexed by "Study_Display".
+
+    Cells left out of the summary bars (an Overall_Rating of Yes/No/Can't tell)
+    are None.
+    """
+    criteria_columns = get_criteria_columns(df)
+    judgments = pd.DataFrame({
+        criterion: [rating_to_risk(r) if r in {"Yes", "No", "Can't tell"} else None for r in df[criterion]]
+        for criterion in criteria_columns
+    })
+    judgments["Overall Rating"] = [
+        rating_to_risk(r) if r in {"High", "Moderate", "Low"} else None for r in df["Overall_Rating"]
+    ]
+    judgments.index = df["Study_Display"].to_numpy()
+    return judgments
+
+def rated_cells(df: pd.DataFrame) -> pd.DataFrame:
+    """Which ``study_judgments`` cells count towards the totals of ``criterion_distribution``.
+
+    Any rating of the scale counts, so an Overall_Rating of Yes/No/Can't tell
+    is True here though its judgment is None; missing ratings are False.
+    """
+    rated = df[[*get_criteria_columns(df), "Overall_Rating"]].isin(RATINGS)
+    rated.columns = [*rated.columns[:-1], "Overall Rating"]
+    rated.index = df["Study_Display"].to_numpy()
+    return rated
+
+def read_input_file(file_path: str) -> pd.DataFrame:
+    """Read input file (CSV or Excel) in a single sniffed parse"""
+    return read_table(file_path)
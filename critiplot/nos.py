@@ -1,152 +1,79 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 import os
 import sys
 from collections import defaultdict
+from matplotlib.artist import setp
 from matplotlib.lines import Line2D
-
-
-def process_detailed_nos(df: pd.DataFrame) -> pd.DataFrame:
-    """Process NOS data with validation and memory optimizations"""
-    required_columns = [
-        "Author, Year",
-        "Representativeness", "Non-exposed Selection", "Exposure Ascertainment", "Outcome Absent at Start",
-        "Comparability (Age/Gender)", "Comparability (Other)",
-        "Outcome Assessment", "Follow-up Length", "Follow-up Adequacy",
-        "Total Score", "Overall RoB"
-    ]
-
-    missing = [col for col in required_columns if col not in df.columns]
-    if missing:
-        raise ValueError(f"Missing required columns: {missing}")
-
-    numeric_cols = required_columns[1:-2]
-    for col in numeric_cols:
-        if not pd.api.types.is_numeric_dtype(df[col]):
-            raise ValueError(f"Column {col} must be numeric.")
-        if df[col].min() < 0 or df[col].max() > 5:
-            raise ValueError(f"Column {col} contains invalid star values (0-5 allowed).")
-
-    df["Selection"] = df["Representativeness"] + df["Non-exposed Selection"] + df["Exposure Ascertainment"] + df["Outcome Absent at Start"]
-    df["Comparability"] = df["Comparability (Age/Gender)"] + df["Comparability (Other)"]
-    df["Outcome/Exposure"] = df["Outcome Assessment"] + df["Follow-up Length"] + df["Follow-up Adequacy"]
-
-    df["ComputedTotal"] = df["Selection"] + df["Comparability"] + df["Outcome/Exposure"]
-    mismatches = df[df["ComputedTotal"] != df["Total Score"]]
-    if not mismatches.empty:
-        print("⚠️ Warning: Total Score mismatches detected:")
-        print(mismatches[["Author, Year", "Total Score", "ComputedTotal"]])
-
-    return df
-
-def stars_to_rob(stars, domain):
-    """Convert stars to risk of bias"""
-    if domain == "Selection":
-        return "Low" if stars >= 3 else "Moderate" if stars == 2 else "High"
-    elif domain == "Comparability":
-        return "Low" if stars == 2 else "Moderate" if stars == 1 else "High"
-    elif domain == "Outcome/Exposure":
-        return "Low" if stars == 3 else "Moderate" if stars == 2 else "High"
-    return "High"
+from .cache import load_or_process
+from .collapse import check_collapse, collapse_patterns, domain_counts
+from .incremental import default_state_file, diff_studies, save_state
+from .layout import figure_layout
+from .nos_data import (DOMAINS, RISK_COLUMNS, assign_risks, process_detailed_nos, read_input_file, resolve_rules,
+                       stars_to_rob, study_judgments)
+from .render import (ThemedFigure, check_output_format, legend_handles, new_figure, output_targets,
+                     render_variants, row_lines)
+from .subset import select_studies, study_index
 
 def map_color(stars, domain, colors):
     """Map stars to color based on domain"""
     risk = stars_to_rob(stars, domain)
     return colors.get(risk, "#BBBBBB")
 
-def professional_plot(df: pd.DataFrame, output_file: str, theme: str = "default"):
-    """Create professional NOS plot with optimized layout and rendering"""
-    theme_options = {
-        "default": {"Low":"#2E7D32", "Moderate":"#F9A825", "High":"#C62828"},
-        "blue": {"Low":"#3a83b7","Moderate":"#bdcfe7","High":"#084582"},
-        "gray": {"Low":"#63BF93FF","Moderate":"#5B6D80","High":"#FF884DFF"},
-        "smiley": {"Low":"#2E7D32", "Moderate":"#F9A825", "High":"#C62828"},
-        "smiley_blue": {"Low":"#3a83b7","Moderate":"#7fb2e6","High":"#084582"}
-    }
+THEME_OPTIONS = {
+    "default": {"Low":"#2E7D32", "Moderate":"#F9A825", "High":"#C62828"},
+    "blue": {"Low":"#3a83b7","Moderate":"#bdcfe7","High":"#084582"},
+    "gray": {"Low":"#63BF93FF","Moderate":"#5B6D80","High":"#FF884DFF"},
+    "smiley": {"Low":"#2E7D32", "Moderate":"#F9A825", "High":"#C62828"},
+    "smiley_blue": {"Low":"#3a83b7","Moderate":"#7fb2e6","High":"#084582"}
+}
 
-    if theme not in theme_options:
-        raise ValueError(f"Theme {theme} not available. Choose from {list(theme_options.keys())}")
-    colors = theme_options[theme]
+SAVED_MESSAGE = "✅ Professional combined plot saved to {}"
 
-    domains = ["Selection", "Comparability", "Outcome/Exposure", "Overall RoB"]
-    
+def build_nos_figure(df: pd.DataFrame, theme: str = "default", counts: dict = None) -> ThemedFigure:
+    """Lay out the NOS figure once; the result can be re-themed and saved repeatedly.
 
-    n_studies = len(df)
-    per_study_height = 0.65
-    min_first_plot_height = 4.0
-    second_plot_height = 2.4
-    gap_between_plots = 1.7
-    top_margin = 1.0
-    bottom_margin = 0.5
-    
-    first_plot_height = max(min_first_plot_height, n_studies * per_study_height)
-    total_height = first_plot_height + gap_between_plots + second_plot_height + top_margin + bottom_margin
-    
-    fig = plt.figure(figsize=(18, total_height))
-    
+    ``counts`` ({domain: {risk: n}}) supplies precomputed summary counts,
+    e.g. from an incremental update, instead of tallying the grid.
+    """
+    if theme not in THEME_OPTIONS:
+        raise ValueError(f"Theme {theme} not available. Choose from {list(THEME_OPTIONS.keys())}")
+    colors = THEME_OPTIONS[theme]
 
-    ax0_bottom = (bottom_margin + second_plot_height + gap_between_plots) / total_height
-    ax0_height = first_plot_height / total_height
-    ax1_bottom = bottom_margin / total_height
-    ax1_height = second_plot_height / total_height
+    domains = DOMAINS
     
-    ax0 = fig.add_axes([0.12, ax0_bottom, 0.75, ax0_height])
-    ax1 = fig.add_axes([0.12, ax1_bottom, 0.75, ax1_height])
+
+    n_studies = len(df)
+    layout = figure_layout("nos", n_studies)
+    fig = new_figure(figsize=layout.figsize)
+    ax0 = fig.add_axes(layout.grid_rect)
+    ax1 = fig.add_axes(layout.summary_rect)
     
-    domain_pos = {d: i for i, d in enumerate(domains)}
     author_pos = {a: i for i, a in enumerate(df["Author, Year"].tolist())}
     
 
-    for y in range(len(author_pos)):
-        ax0.axhline(y, color='lightgray', linewidth=0.8, zorder=0)
-    ax0.axhline(-0.5, color='lightgray', linewidth=0.8, zorder=0)
-    ax0.axhline(len(author_pos)-0.5, color='lightgray', linewidth=0.8, zorder=0)
-    
-    if theme.startswith("smiley"):
+    row_lines(ax0, [*range(len(author_pos)), -0.5, len(author_pos)-0.5], colors='lightgray', linewidth=0.8, zorder=0)
 
-        symbol_map = {"Low": "☺", "Moderate": "😐", "High": "☹"}
-        
-        for _, row in df.iterrows():
-            y_pos = author_pos[row["Author, Year"]]
-            
+    risk_matrix = df[[RISK_COLUMNS[domain] for domain in domains[:-1]] + ["Overall RoB"]].to_numpy(dtype=object)
+    y_positions = df["Author, Year"].map(author_pos).to_numpy()
+    cells = [(x_pos, y_pos, risk) for y_pos, row in zip(y_positions, risk_matrix.tolist())
+             for x_pos, risk in enumerate(row)]
 
-            for domain in domains[:-1]:
-                stars = row[domain]
-                risk = stars_to_rob(stars, domain)
-                symbol = symbol_map.get(risk, "?")
-                x_pos = domain_pos[domain]
-                ax0.text(x_pos, y_pos, symbol, fontsize=35, ha='center', va='center', 
-                        color=colors[risk], fontweight='bold', zorder=1)
-            
+    def draw_cells(family, colors):
+        if family == "smiley":
+            symbol_map = {"Low": "☺", "Moderate": "😐", "High": "☹"}
+            bindings = []
+            for x_pos, y_pos, risk in cells:
+                text = ax0.text(x_pos, y_pos, symbol_map.get(risk, "?"), fontsize=35, ha='center', va='center',
+                                color=colors.get(risk, "#BBBBBB"), fontweight='bold', zorder=1)
+                bindings.append((text, risk))
+            return bindings
 
-            overall_rob = row["Overall RoB"]
-            symbol = symbol_map.get(overall_rob, "?")
-            x_pos = domain_pos["Overall RoB"]
-            ax0.text(x_pos, y_pos, symbol, fontsize=35, ha='center', va='center', 
-                    color=colors.get(overall_rob, "#BBBBBB"), fontweight='bold', zorder=1)
-    else:
+        x_coords, y_coords, risks = zip(*cells) if cells else ((), (), ())
+        scatter = ax0.scatter(x_coords, y_coords, c=[colors.get(r, "#BBBBBB") for r in risks], s=1200, marker="s",
+                              edgecolor='white', linewidth=1, zorder=1)
+        return [(scatter, list(risks))]
 
-        x_coords = []
-        y_coords = []
-        point_colors = []
-        
-        for _, row in df.iterrows():
-            y_pos = author_pos[row["Author, Year"]]
-            
-            for domain in domains[:-1]:
-                stars = row[domain]
-                risk = stars_to_rob(stars, domain)
-                x_coords.append(domain_pos[domain])
-                y_coords.append(y_pos)
-                point_colors.append(colors[risk])
-            
-            overall_rob = row["Overall RoB"]
-            x_coords.append(domain_pos["Overall RoB"])
-            y_coords.append(y_pos)
-            point_colors.append(colors.get(overall_rob, "#BBBBBB"))
-        
-        ax0.scatter(x_coords, y_coords, c=point_colors, s=1200, marker="s", 
-                   edgecolor='white', linewidth=1, zorder=1)
+    themed = ThemedFigure(fig, THEME_OPTIONS, draw_cells)
     
 
     ax0.set_xticks(range(len(domains)))
@@ -164,15 +91,16 @@ def professional_plot(df: pd.DataFrame, output_file: str, theme: str = "default"
 
     bar_data = defaultdict(lambda: defaultdict(int))
     
-    for _, row in df.iterrows():
-        for domain in domains[:-1]:
-            risk = stars_to_rob(row[domain], domain)
-            bar_data[domain][risk] += 1
-        bar_data["Overall RoB"][row["Overall RoB"]] += 1
+    if counts is None:
+        for x_pos, _, risk in cells:
+            bar_data[domains[x_pos]][risk] += 1
+    else:
+        for domain, risk_counts in counts.items():
+            bar_data[domain].update(risk_counts)
     
 
-    total_studies = len(df)
     for domain in bar_data:
+        total_studies = sum(bar_data[domain].values())
         for risk in bar_data[domain]:
             bar_data[domain][risk] = (bar_data[domain][risk] / total_studies) * 100
     
@@ -183,7 +111,7 @@ def professional_plot(df: pd.DataFrame, output_file: str, theme: str = "default"
     bottom = None
     for risk in ["High", "Moderate", "Low"]:
         values = [bar_data[domain].get(risk, 0) for domain in inverted_domains]
-        ax1.barh(
+        bars = ax1.barh(
             inverted_domains, 
             values, 
             left=bottom, 
@@ -192,6 +120,8 @@ def professional_plot(df: pd.DataFrame, output_file: str, theme: str = "default"
             label=risk, 
             height=bar_height
         )
+        for patch in bars:
+            themed.bind(patch, risk)
         if bottom is None:
             bottom = values
         else:
@@ -219,8 +149,7 @@ def professional_plot(df: pd.DataFrame, output_file: str, theme: str = "default"
     ax1.set_title("Distribution of Risk-of-Bias Judgments by Domain", fontsize=25, fontweight='bold')
     ax1.grid(axis='x', linestyle='--', alpha=0.25)
     
-    for y in range(len(inverted_domains)):
-        ax1.axhline(y-0.5, color='lightgray', linewidth=0.8, zorder=0)
+    row_lines(ax1, [y - 0.5 for y in range(len(inverted_domains))], colors='lightgray', linewidth=0.8, zorder=0)
     
  
     legend_elements = [
@@ -242,58 +171,137 @@ def professional_plot(df: pd.DataFrame, output_file: str, theme: str = "default"
         fancybox=True,
         edgecolor='black'
     )
-    plt.setp(legend.get_title(), fontweight='bold')
+    setp(legend.get_title(), fontweight='bold')
     for text in legend.get_texts():
         text.set_fontweight('normal')
-    
- 
-    valid_ext = [".png", ".pdf", ".svg", ".eps"]
-    ext = os.path.splitext(output_file)[1].lower()
-    if ext not in valid_ext:
-        raise ValueError(f"Unsupported file format: {ext}. Use one of {valid_ext}")
-    
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
-    plt.close()
-    print(f"✅ Professional combined plot saved to {output_file}")
-    
-    
-    del bar_data
+    for handle, risk in zip(legend_handles(legend), ["Low", "Moderate", "High"]):
+        themed.bind(handle, risk)
 
-def read_input_file(file_path: str) -> pd.DataFrame:
-    """Read input file"""
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext == ".csv":
-        return pd.read_csv(file_path, engine='c')
-    elif ext in [".xls", ".xlsx"]:
-        return pd.read_excel(file_path, engine='openpyxl')
-    else:
-        raise ValueError(f"Unsupported file format: {ext}. Provide a CSV or Excel file.")
+    themed.set_theme(theme)
+    return themed
 
-def plot_nos(input_file: str, output_file: str, theme: str = "default"):
+def professional_plot(df: pd.DataFrame, output_file: str, theme: str = "default"):
+    """Create professional NOS plot with optimized layout and rendering"""
+    check_output_format(output_file)
+    render_variants(lambda t: build_nos_figure(df, t), [(output_file, theme)], SAVED_MESSAGE)
+
+def plot_nos(input_file: str, output_file: str = None, theme: str = "default", cache: bool = False,
+             outputs: dict = None, incremental: bool = False, state_file: str = None, max_memory=None,
+             return_array: bool = False, png_options: dict = None, rules: dict = None,
+             label_options: dict = None, vector_options: dict = None,
+             deterministic: bool = False, collapse: str = None,
+             filter: dict = None, sort_by=None):
     """
     Generate a NOS traffic-light plot from input data using the updated logic.
     
     Parameters:
     -----------
     input_file : str
-        Path to the input CSV or Excel file containing NOS data
+        Path to the input CSV, Excel, Parquet or Feather file containing NOS data
     output_file : str
         Path to save the output plot (supports .png, .pdf, .svg, .eps)
     theme : str, optional
         Color theme for the plot. Options: "default", "blue", "gray", "smiley", "smiley_blue"
-        
+    cache : bool, optional
+        Store the normalized data as a Feather sidecar next to the input file
+        and reuse it on later calls until the input changes. Default is False
+    outputs : dict, optional
+        Extra {output_path: theme} variants, e.g. {"a.png": "default", "b.pdf": "blue"}.
+        The data is parsed and the figure laid out once; each variant only
+        recolors the existing artists before saving.
+    incremental : bool, optional
+        Keep the judgment matrix and domain counts in a state file, diff the
+        new input by "Author, Year", update the counts by delta and skip
+        rendering when no study changed. Default is False
+    state_file : str, optional
+        State file for incremental mode. Default is "<first output>.state.json"
+    max_memory : int or str, optional
+        Memory budget for saving, in bytes or as a size like "512MB". Each
+        save is planned to fit (full raster, PNG tiling, reduced dpi or the
+        vector backend for .pdf/.svg/.eps) and the chosen strategy is printed.
+        Default is None (no budget)
+    return_array : bool, optional
+        Also render the figure in ``theme`` straight into memory and return it
+        as a RenderedArray: a zero-copy ``(H, W, 4)`` uint8 view of the Agg
+        buffer plus layout metadata, with no PNG encode. ``output_file`` may
+        then be None. Default is False
+    png_options : dict, optional
+        PNG encoding options, e.g. {"compression": 1, "palette": True}:
+        ``compression`` is the zlib level (0-9, default 6), ``palette`` writes
+        an 8-bit indexed PNG (exact up to 256 colors, otherwise quantized),
+        ``encoder`` is "zlib" or "parallel" (multithreaded, ``workers``
+        threads). Default is None (matplotlib's PNG writer)
+    rules : dict, optional
+        Star-to-risk overrides per domain for other NOS scoring conventions,
+        e.g. {"Comparability": {"Low": (1, None)}}: each risk maps to an
+        inclusive (min, max) star range and stars matching no range are
+        "High". Domains not given keep NOS_RULES. Default is None
+    label_options : dict, optional
+        Fit long study labels to a width, e.g. {"max_width": 4, "mode": "wrap"}:
+        ``max_width`` is in inches and ``mode`` is "truncate" (cut with "…",
+        the default) or "wrap" (break at spaces), using cached text widths.
+        Default is None (labels as given)
+    vector_options : dict, optional
+        How .svg/.pdf/.eps files store text: {"text": "path"} (glyph
+        outlines, the default) or {"text": "font"} (real text with embedded
+        fonts; smaller files with many labels). Default is None
+    deterministic : bool, optional
+        Write byte-reproducible files (no dates or matplotlib version, fixed
+        SVG ids) and leave an output untouched (bytes and modification
+        time) when its contents did not change. Default is False
+    collapse : str, optional
+        Draw one row per distinct judgment pattern, labelled with its number
+        of studies and ordered by "frequency" or "severity"; the summary bars
+        still count every study. Default is None (one row per study)
+    filter : dict, optional
+        Plot only the studies matching every key: "year" (a year, or an
+        inclusive (first, last) range with None for an open end, parsed from
+        the labels), "risk" (one or more overall judgments), e.g.
+        {"year": (2018, None), "risk": "High"}. Default is None (all studies)
+    sort_by : str or list, optional
+        Order the rows by "year", "risk" (severity) or "label", or by a list
+        of those; a leading "-" sorts descending. Default is None (input order)
+    
     Returns:
     --------
     None
-        The plot is saved to the specified output file
+        The plot is saved to the specified output file(s)
+    RenderedArray
+        Only with ``return_array=True``
     """
+    targets = output_targets(output_file, theme, outputs, THEME_OPTIONS, required=not return_array)
+    for path, _ in targets:
+        check_output_format(path)
+    check_collapse(collapse)
     if not os.path.exists(input_file):
         print(f"❌ Input file not found: {input_file}")
         sys.exit(1)
 
-    df = read_input_file(input_file)
-    df = process_detailed_nos(df)
-    professional_plot(df, output_file, theme)
+    resolve_rules(rules)
+    df = load_or_process(input_file, "nos", lambda: process_detailed_nos(read_input_file(input_file)), cache)
+    if rules:
+        df = assign_risks(df, rules)
+    if filter or sort_by:
+        index = study_index(df["Author, Year"], df["Overall RoB"], ["Low", "Moderate", "High"])
+        df = select_studies(df, index, filter, sort_by)
+    update = None
+    if incremental and targets:
+        update = diff_studies(state_file or default_state_file(targets), "nos", study_judgments(df), targets)
+        if not update.pages:
+            if not return_array:
+                print("✅ No study changes since the last render; outputs are up to date")
+                return
+            targets = []
+    counts = update.counts.get("") if update else None
+    if collapse:
+        judgments = study_judgments(df)
+        df, counts = collapse_patterns(df, judgments, "Author, Year", collapse), domain_counts(judgments)
+    result = render_variants(lambda t: build_nos_figure(df, t, counts), targets, SAVED_MESSAGE, max_memory,
+                             theme if return_array else None, png_options, label_options,
+                             vector_options=vector_options, deterministic=deterministic)
+    if update:
+        save_state(update)
+    return result
 
 if __name__ == "__main__":
     if len(sys.argv) not in [3,4]:
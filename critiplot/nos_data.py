@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+
+from .reader import read_table
+from .schema import Column, Schema, register_schema
+
+STAR_COLUMNS = [
+    "Representativeness", "Non-exposed Selection", "Exposure Ascertainment", "Outcome Absent at Start",
+    "Comparability (Age/Gender)", "Comparability (Other)",
+    "Outcome Assessment", "Follow-up Length", "Follow-up Adequacy",
+]
+SCHEMA = register_schema(Schema("nos", [
+    Column("Author, Year", dtype="str"),
+    *[Column(col, dtype="numeric", min=0, max=5) for col in STAR_COLUMNS],
+    Column("Total Score"),
+    Column("Overall RoB", dtype="category"),
+]))
+INPUT_COLUMNS = SCHEMA.read_columns
+INPUT_DTYPES = SCHEMA.read_dtypes
+DOMAINS = ["Selection", "Comparability", "Outcome/Exposure", "Overall RoB"]
+
+
+def process_detailed_nos(df: pd.DataFrame) -> pd.DataFrame:
+    """Process NOS data with validation and memory optimizations"""
+    df = SCHEMA.validate(df)
+
+    df["Selection"] = df["Representativeness"] + df["Non-exposed Selection"] + df["Exposure Ascertainment"] + df["Outcome Absent at Start"]
+    df["Comparability"] = df["Comparability (Age/Gender)"] + df["Comparability (Other)"]
+    df["Outcome/Exposure"] = df["Outcome Assessment"] + df["Follow-up Length"] + df["Follow-up Adequacy"]
+
+    df["ComputedTotal"] = df["Selection"] + df["Comparability"] + df["Outcome/Exposure"]
+    mismatches = df[df["ComputedTotal"] != df["Total Score"]]
+    if not mismatches.empty:
+        print("⚠️ Warning: Total Score mismatches detected:")
+        print(mismatches[["Author, Year", "Total Score", "ComputedTotal"]])
+
+    return assign_risks(df)
+
+# Inclusive (min, max) star range per domain and risk, checked in RISKS order;
+# None leaves a bound open and stars outside every range are "High"
+NOS_RULES = {
+    "Selection": {"Low": (3, None), "Moderate": (2, 2)},
+    "Comparability": {"Low": (2, 2), "Moderate": (1, 1)},
+    "Outcome/Exposure": {"Low": (3, 3), "Moderate": (2, 2)},
+}
+RISK_COLUMNS = {domain: f"{domain} Risk" for domain in NOS_RULES}
+RISKS = ["Low", "Moderate", "High"]
+
+def resolve_rules(rules: dict = None) -> dict:
+    """NOS_RULES with the domains in ``rules`` replaced, e.g. {"Comparability": {"Low": (1, None)}}"""
+    resolved = dict(NOS_RULES)
+    for domain, ranges in (rules or {}).items():
+        if domain not in NOS_RULES:
+            raise ValueError(f"Unknown NOS domain {domain}. Choose from {list(NOS_RULES)}")
+        unknown = set(ranges) - set(RISKS)
+        if unknown:
+            raise ValueError(f"Unknown risk levels {sorted(unknown)} for {domain}. Use {RISKS}")
+        resolved[domain] = dict(ranges)
+    return resolved
+
+def assign_risks(df: pd.DataFrame, rules: dict = None) -> pd.DataFrame:
+    """Convert every domain's stars to a risk column in one np.select over the star matrix"""
+    rules = resolve_rules(rules)
+    domains = list(rules)
+    stars = df[domains].to_numpy(dtype=float)
+
+    conditions, choices = [], []
+    for risk in RISKS[:-1]:
+        ranges = [rules[domain].get(risk) for domain in domains]
+        low = np.array([np.nan if r is None else -np.inf if r[0] is None else r[0] for r in ranges])
+        high = np.array([np.nan if r is None else np.inf if r[1] is None else r[1] for r in ranges])
+        conditions.append((stars >= low) & (stars <= high))
+        choices.append(risk)
+    risks = np.select(conditions, choices, default="High").astype(object)
+
+    for i, domain in enumerate(domains):
+        df[RISK_COLUMNS[domain]] = risks[:, i]
+    return df
+
+def stars_to_rob(stars, domain, rules: dict = None):
+    """Convert one star count to risk of bias"""
+    ranges = resolve_rules(rules).get(domain, {})
+    for risk in RISKS[:-1]:
+        if risk not in ranges:
+            continue
+        low, high = ranges[risk]
+        if (low is None or stars >= low) and (high is None or stars <= high):
+            return risk
+    return "High"
+
+def study_judgments(df: pd.DataFrame) -> pd.DataFrame:
+    """Risk of bias per study and domain, indexed by "Author, Year"."""
+    judgments = pd.DataFrame({domain: df[RISK_COLUMNS[domain]].to_numpy() for domain in DOMAINS[:-1]})
+    judgments["Overall RoB"] = df["Overall RoB"].to_numpy()
+    judgments.index = df["Author, Year"].to_numpy()
+    return judgments
+
+def read_input_file(file_path: str) -> pd.DataFrame:
+    """Read input file in a single sniffed parse of the NOS columns"""
+    return read_table(file_path, INPUT_COLUMNS, INPUT_DTYPES)
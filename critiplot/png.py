@@ -0,0 +1,137 @@
+import os
+import struct
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+PALETTE_SIZE = 256
+BLOCK_BYTES = 1 << 20
+DEFAULT_PNG_OPTIONS = {"compression": 6, "palette": False, "encoder": "zlib", "workers": None, "grid": "matplotlib",
+                       "processes": None}
+# "numpy" paints the study grid's cells into the array instead of drawing them with matplotlib
+PNG_GRIDS = ["matplotlib", "numpy"]
+
+
+def png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def zlib_encoder(data, level: int, workers: int = None) -> bytes:
+    """Compress the scanlines as one zlib stream on the calling thread"""
+    return zlib.compress(data, level)
+
+
+def parallel_encoder(data, level: int, workers: int = None) -> bytes:
+    """Compress ~1 MB blocks on a thread pool and join them into one zlib stream.
+
+    Each block is raw deflate ended by a sync flush (the last one by a
+    final block), so the concatenation is a valid stream; zlib releases the
+    GIL while compressing. Costs a little size since blocks share no window.
+    """
+    data = memoryview(data).cast("B")
+    blocks = [data[i:i + BLOCK_BYTES] for i in range(0, len(data), BLOCK_BYTES)] or [data]
+
+    def compress(index):
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+        mode = zlib.Z_FINISH if index == len(blocks) - 1 else zlib.Z_SYNC_FLUSH
+        return compressor.compress(blocks[index]) + compressor.flush(mode)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        body = b"".join(pool.map(compress, range(len(blocks))))
+    header = zlib.compress(b"", level)[:2]
+    return header + body + struct.pack(">I", zlib.adler32(data))
+
+
+# Add an entry to plug in another encoder: f(scanlines, level, workers) -> zlib stream
+PNG_ENCODERS = {
+    "zlib": zlib_encoder,
+    "parallel": parallel_encoder,
+}
+
+
+def check_png_options(png_options: dict) -> dict:
+    """Fill in defaults and raise ValueError on unknown or out-of-range PNG options"""
+    png_options = png_options or {}
+    unknown = set(png_options) - set(DEFAULT_PNG_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown PNG options {sorted(unknown)}. Use {list(DEFAULT_PNG_OPTIONS)}")
+    options = {**DEFAULT_PNG_OPTIONS, **png_options}
+    if options["compression"] not in range(10):
+        raise ValueError(f"PNG compression must be an integer from 0 to 9, got {options['compression']!r}")
+    if options["grid"] not in PNG_GRIDS:
+        raise ValueError(f"PNG grid painter {options['grid']} not available. Choose from {PNG_GRIDS}")
+    if options["processes"] is not None and (not isinstance(options["processes"], int) or options["processes"] < 1):
+        raise ValueError(f"PNG processes must be a positive integer, got {options['processes']!r}")
+    if options["encoder"] not in PNG_ENCODERS:
+        raise ValueError(f"PNG encoder {options['encoder']} not available. Choose from {list(PNG_ENCODERS)}")
+    return options
+
+
+def to_palette(array: np.ndarray, fixed_colors=()) -> tuple:
+    """Map an RGBA image to (indices, RGBA palette).
+
+    Exact when the image has at most 256 colors; otherwise (anti-aliased
+    edges) the colors are reduced with Pillow's fast octree. ``fixed_colors``
+    (RGBA uint8 tuples, e.g. the background and theme colors) then get
+    palette slots of their own, so pixels of exactly those colors keep them.
+    """
+    image = Image.fromarray(array, "RGBA")
+    colors = image.getcolors(PALETTE_SIZE)
+    if colors is not None:
+        palette = np.array(sorted(color for _, color in colors), np.uint8)
+        packed = array.view(np.uint32)[..., 0]
+        keys = palette.view(np.uint32)[:, 0]
+        order = np.argsort(keys)
+        indices = order[np.searchsorted(keys[order], packed)].astype(np.uint8)
+        return indices, palette
+
+    fixed = np.array(list(dict.fromkeys(map(tuple, fixed_colors))), np.uint8).reshape(-1, 4)[:PALETTE_SIZE - 1]
+    quantized = image.quantize(PALETTE_SIZE - len(fixed), method=Image.Quantize.FASTOCTREE,
+                               dither=Image.Dither.NONE)
+    palette = np.concatenate([fixed, np.array(quantized.getpalette("RGBA"), np.uint8).reshape(-1, 4)])
+    indices = np.asarray(quantized) + np.uint8(len(fixed))
+    packed = array.view(np.uint32)[..., 0]
+    for slot, key in enumerate(fixed.view(np.uint32)[:, 0]):
+        indices[packed == key] = slot
+    return indices, palette
+
+
+def write_png(output_file: str, array: np.ndarray, dpi: float, compression: int = 6, palette: bool = False,
+              encoder: str = "zlib", workers: int = None, fixed_colors=()):
+    """Encode an (H, W, 4) uint8 image as PNG with the chosen options.
+
+    Fully opaque images drop the alpha channel (lossless); ``palette``
+    writes an 8-bit indexed image that keeps ``fixed_colors`` exact. The file is written to a temporary path
+    and moved into place.
+    """
+    height, width = array.shape[:2]
+    extra = b""
+    if palette:
+        pixels, colors = to_palette(array, fixed_colors)
+        color_type = 3
+        extra = png_chunk(b"PLTE", colors[:, :3].tobytes())
+        if (colors[:, 3] < 255).any():
+            extra += png_chunk(b"tRNS", colors[:, 3].tobytes())
+    elif (array[..., 3] == 255).all():
+        pixels, color_type = array[..., :3], 2
+    else:
+        pixels, color_type = array, 6
+
+    # Filter type 0 on every row: flat plot colors already compress to runs
+    scanlines = np.zeros((height, pixels[0].size + 1), np.uint8)
+    scanlines[:, 1:] = pixels.reshape(height, -1)
+    data = PNG_ENCODERS[encoder](scanlines, compression, workers)
+
+    ppm = int(round(dpi / 0.0254))
+    tmp_path = f"{output_file}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PNG_SIGNATURE)
+        f.write(png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)))
+        f.write(png_chunk(b"pHYs", struct.pack(">IIB", ppm, ppm, 1)))
+        f.write(extra)
+        f.write(png_chunk(b"IDAT", data))
+        f.write(png_chunk(b"IEND", b""))
+    os.replace(tmp_path, output_file)
@@ -0,0 +1,208 @@
+import math
+from typing import NamedTuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import PathCollection
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from matplotlib.text import Text
+from matplotlib.transforms import IdentityTransform
+
+from .text_metrics import LRUCache, font_key
+
+SPRITE_CACHE_SIZE = 1024
+# Sprites are rasterized at quarter-pixel offsets, like Agg places the real cells
+SUBPIXEL = 4
+# Pixels indexed per vectorized store when painting
+PAINT_BATCH = 1 << 22
+
+SPRITES = LRUCache(SPRITE_CACHE_SIZE)
+
+
+class Sprite(NamedTuple):
+    """A pre-rasterized cell symbol, cropped to its visible pixels.
+
+    ``opaque`` (rows, cols, packed RGBA) pixels are copied as they are; the
+    ``partial`` (rows, cols, RGB, alpha) anti-aliased ones are blended.
+    ``anchor`` is the (row, col) of the symbol's anchor point within ``rgba``.
+    """
+    rgba: np.ndarray
+    opaque: np.ndarray
+    partial: tuple
+    anchor: tuple
+
+
+class Stamps(NamedTuple):
+    """Where one sprite lands in the image: top-left (row, col) per cell and the clip rectangle"""
+    sprite: Sprite
+    rows: np.ndarray
+    cols: np.ndarray
+    clip: tuple
+    zorder: float
+
+
+def _rasterize(artist, size: int, dpi: float) -> Sprite:
+    """Draw ``artist`` (anchored at the canvas center) on a transparent Agg canvas and crop it"""
+    fig = Figure(figsize=(size / dpi, size / dpi), dpi=dpi)
+    FigureCanvasAgg(fig)
+    fig.patch.set_alpha(0)
+    fig.add_artist(artist)
+    fig.canvas.draw()
+    rgba = np.asarray(fig.canvas.buffer_rgba())
+
+    alpha = rgba[..., 3]
+    rows, cols = np.flatnonzero(alpha.any(axis=1)), np.flatnonzero(alpha.any(axis=0))
+    if not len(rows):
+        rows = cols = np.array([size // 2])
+    top, left = rows[0], cols[0]
+    rgba = rgba[top:rows[-1] + 1, left:cols[-1] + 1].copy()
+    alpha = rgba[..., 3]
+    partial = np.nonzero((alpha > 0) & (alpha < 255))
+    opaque = np.nonzero(alpha == 255)
+    return Sprite(
+        rgba,
+        (*opaque, rgba.view(np.uint32)[..., 0][opaque]),
+        (*partial, rgba[partial][:, :3].astype(np.float32), alpha[partial][:, None].astype(np.float32) / 255),
+        (size // 2 - top, size // 2 - left),
+    )
+
+
+def _subpixel(points: np.ndarray) -> tuple:
+    """Whole-pixel positions and the fractional part rounded to 1/SUBPIXEL of a pixel"""
+    steps = np.round(points * SUBPIXEL).astype(int)
+    return steps // SUBPIXEL, steps % SUBPIXEL
+
+
+def _marker_sprite(coll, path, face, edge, size, width, shift, dpi: float) -> Sprite:
+    key = ("marker", path.vertices.tobytes(), None if path.codes is None else path.codes.tobytes(),
+           tuple(face), tuple(edge), size, width, coll.get_snap(), shift, dpi)
+
+    def draw():
+        extent = np.abs(path.vertices).max() if len(path.vertices) else 1.0
+        canvas = 2 * math.ceil((extent * math.sqrt(size) + width) * dpi / 72 + 4)
+        center = (canvas / 2 + shift[0] / SUBPIXEL, canvas / 2 + shift[1] / SUBPIXEL)
+        marker = PathCollection([path], sizes=[size], offsets=[center], offset_transform=IdentityTransform(),
+                                facecolors=[face], edgecolors=[edge], linewidths=[width],
+                                antialiaseds=coll.get_antialiased())
+        marker.set_transform(IdentityTransform())
+        marker.set_snap(coll.get_snap())
+        return _rasterize(marker, canvas, dpi)
+
+    return SPRITES.lookup(key, draw)
+
+
+def _collection_stamps(coll, height: int, dpi: float) -> list:
+    """Group a scatter's points by style and sub-pixel phase; one sprite per group"""
+    path = coll.get_paths()[0]
+    offsets = np.asarray(coll.get_offsets(), dtype=float)
+    n = len(offsets)
+    faces = np.broadcast_to(coll.get_facecolor(), (n, 4)) if len(coll.get_facecolor()) else np.zeros((n, 4))
+    edges = np.broadcast_to(coll.get_edgecolor(), (n, 4)) if len(coll.get_edgecolor()) else np.zeros((n, 4))
+    sizes = np.resize(coll.get_sizes(), n) if len(coll.get_sizes()) else np.full(n, 36.0)
+    widths = np.resize(coll.get_linewidth(), n)
+    whole, shift = _subpixel(coll.get_offset_transform().transform(offsets))
+    groups, inverse = np.unique(np.column_stack([faces, edges, sizes, widths, shift]), axis=0, return_inverse=True)
+
+    stamps = []
+    for index, group in enumerate(groups):
+        sprite = _marker_sprite(coll, path, group[:4], group[4:8], group[8], group[9],
+                                (int(group[10]), int(group[11])), dpi)
+        xy = whole[inverse.ravel() == index]
+        stamps.append((sprite, height - xy[:, 1] - sprite.anchor[0], xy[:, 0] - sprite.anchor[1]))
+    return stamps
+
+
+def _text_stamp(text, height: int, dpi: float) -> tuple:
+    prop = text.get_fontproperties()
+    color = to_rgba(text.get_color(), text.get_alpha())
+    whole, shift = _subpixel(text.get_transform().transform([text.get_unitless_position()]))
+    shift = tuple(shift[0].tolist())
+    key = ("text", text.get_text(), font_key(prop), color, text.get_horizontalalignment(),
+           text.get_verticalalignment(), text.get_rotation(), shift, dpi)
+
+    def draw():
+        canvas = 2 * math.ceil(prop.get_size_in_points() * dpi / 72 * (len(text.get_text()) + 1))
+        symbol = Text(canvas / 2 + shift[0] / SUBPIXEL, canvas / 2 + shift[1] / SUBPIXEL, text.get_text(),
+                      color=color, fontproperties=prop, ha=text.get_horizontalalignment(),
+                      va=text.get_verticalalignment(), rotation=text.get_rotation(),
+                      transform=IdentityTransform())
+        return _rasterize(symbol, canvas, dpi)
+
+    sprite = SPRITES.lookup(key, draw)
+    return sprite, height - whole[:, 1] - sprite.anchor[0], whole[:, 0] - sprite.anchor[1]
+
+
+def _clip(artist, height: int, width: int) -> tuple:
+    """(top, left, bottom, right) image rows/cols an artist may paint into"""
+    box = artist.get_clip_box() if artist.get_clip_on() else None
+    if box is None:
+        return 0, 0, height, width
+    return (max(0, height - math.ceil(box.y1)), max(0, math.floor(box.x0)),
+            min(height, height - math.floor(box.y0)), min(width, math.ceil(box.x1)))
+
+
+def paintable(artist) -> bool:
+    """Scatter markers and plain text can be painted; anything else stays with matplotlib"""
+    if isinstance(artist, PathCollection):
+        return len(artist.get_paths()) == 1 and not artist.get_hatch() and artist.get_alpha() is None
+    return type(artist) is Text and "\n" not in artist.get_text() and not artist.get_usetex()
+
+
+def collect_stamps(artists: list, height: int, width: int, dpi: float) -> list:
+    """Sprites and pixel positions for ``artists``, read while the figure is laid out for the image"""
+    stamps = []
+    for artist in artists:
+        clip = _clip(artist, height, width)
+        groups = (_collection_stamps(artist, height, dpi) if isinstance(artist, PathCollection)
+                  else [_text_stamp(artist, height, dpi)])
+        stamps.extend(Stamps(sprite, rows, cols, clip, artist.get_zorder()) for sprite, rows, cols in groups)
+    return stamps
+
+
+def _blend(block: np.ndarray, rgb: np.ndarray, alpha: np.ndarray) -> np.ndarray:
+    """Source-over straight-alpha ``rgb``/``alpha`` onto (..., 4) uint8 pixels"""
+    out = block.astype(np.float32)
+    out[..., :3] = rgb * alpha + out[..., :3] * (1 - alpha) + 0.5
+    out[..., 3:] = 255 * alpha + out[..., 3:] * (1 - alpha) + 0.5
+    return out.astype(np.uint8)
+
+
+def paint(array: np.ndarray, stamps: list):
+    """Stamp every sprite into a contiguous (H, W, 4) uint8 image in z-order.
+
+    All cells sharing a sprite are written together: one indexed store of
+    the opaque pixels (as packed uint32) and one gather-blend-scatter of the
+    anti-aliased edge per batch, so the cost is the painted area rather than
+    per-marker path rasterization. Cells crossing their clip rectangle are
+    blended one at a time.
+    """
+    height, width = array.shape[:2]
+    pixels = array.view(np.uint32).reshape(-1)
+    flat = array.reshape(-1, 4)
+    for stamp in sorted(stamps, key=lambda s: s.zorder):
+        sprite = stamp.sprite
+        h, w = sprite.rgba.shape[:2]
+        top, left, bottom, right = stamp.clip
+        inside = (stamp.rows >= top) & (stamp.cols >= left) & (stamp.rows + h <= bottom) & (stamp.cols + w <= right)
+
+        rows_o, cols_o, values = sprite.opaque
+        rows_p, cols_p, rgb_p, alpha_p = sprite.partial
+        opaque = rows_o * width + cols_o
+        partial = rows_p * width + cols_p
+        starts = stamp.rows[inside] * width + stamp.cols[inside]
+        batch = max(1, PAINT_BATCH // max(1, len(opaque) + len(partial)))
+        for i in range(0, len(starts), batch):
+            base = starts[i:i + batch, None]
+            pixels[(base + opaque).ravel()] = np.tile(values, len(base))
+            if len(partial):
+                index = (base + partial).ravel()
+                flat[index] = _blend(flat[index].reshape(len(base), -1, 4), rgb_p, alpha_p).reshape(-1, 4)
+
+        for r0, c0 in zip(stamp.rows[~inside].tolist(), stamp.cols[~inside].tolist()):
+            r1, c1 = max(r0, top), max(c0, left)
+            r2, c2 = min(r0 + h, bottom), min(c0 + w, right)
+            if r1 < r2 and c1 < c2:
+                source = sprite.rgba[r1 - r0:r2 - r0, c1 - c0:c2 - c0]
+                array[r1:r2, c1:c2] = _blend(array[r1:r2, c1:c2], source[..., :3],
+                                             source[..., 3:].astype(np.float32) / 255)
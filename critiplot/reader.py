@@ -0,0 +1,180 @@
+import codecs
+import csv
+import os
+import re
+from typing import NamedTuple
+
+import pandas as pd
+
+SNIFF_BYTES = 64 * 1024
+DELIMITERS = [",", ";", "\t", "|"]
+EXCEL_ENGINES = {".xlsx": "openpyxl", ".xls": "xlrd"}
+COLUMNAR_EXTENSIONS = {".parquet", ".feather", ".arrow"}
+
+
+class CsvFormat(NamedTuple):
+    """Encoding, delimiter and header detected from the start of a CSV file"""
+    encoding: str
+    delimiter: str
+    header: list
+
+
+def normalize_header(name) -> str:
+    """Normalize a column name so spelling variants compare equal.
+
+    Underscores and runs of whitespace collapse to a single space, spaces
+    around commas are dropped and case is ignored, so ``Risk_of_Bias``,
+    ``risk of  bias`` and ``Risk of Bias`` (or ``Author, Year`` and
+    ``Author,Year``) all share one key.
+    """
+    key = re.sub(r"[\s_]+", " ", str(name)).strip().lower()
+    return re.sub(r"\s*,\s*", ",", key)
+
+
+def _detect_encoding(sample: bytes) -> str:
+    """Pick an encoding from BOMs, falling back to latin1 for non-UTF-8 bytes"""
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return "latin1"
+
+
+def _detect_delimiter(lines: list) -> str:
+    """Pick the delimiter giving the widest, most consistent rows"""
+    best, best_score = ",", (0, 0)
+    for delimiter in DELIMITERS:
+        widths = [len(row) for row in csv.reader(lines, delimiter=delimiter) if row]
+        if not widths or widths[0] < 2:
+            continue
+        score = (sum(w == widths[0] for w in widths), widths[0])
+        if score > best_score:
+            best, best_score = delimiter, score
+    return best
+
+
+def sniff_csv(file_path: str) -> CsvFormat:
+    """Detect encoding, delimiter and header from the first few KB of a CSV"""
+    with open(file_path, "rb") as f:
+        sample = f.read(SNIFF_BYTES)
+
+    encoding = _detect_encoding(sample)
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(sample, final=False)
+    lines = text.splitlines()
+    if len(sample) == SNIFF_BYTES and len(lines) > 1:
+        lines = lines[:-1]
+    if not lines:
+        raise ValueError(f"Input file is empty: {file_path}")
+
+    delimiter = _detect_delimiter(lines[:50])
+    header = next(csv.reader(lines[:1], delimiter=delimiter))
+    return CsvFormat(encoding, delimiter, header)
+
+
+def match_columns(header, columns) -> dict:
+    """Map header names to the wanted column spellings they are variants of"""
+    wanted = {}
+    for name in columns:
+        wanted.setdefault(normalize_header(name), name)
+
+    matched = {}
+    for name in header:
+        key = normalize_header(name)
+        if key in wanted and wanted[key] not in matched.values():
+            matched[name] = wanted[key]
+    return matched
+
+
+def _read_csv(file_path: str, columns, dtype, fmt: CsvFormat) -> pd.DataFrame:
+    """Run exactly one C-engine parse using a sniffed format"""
+    fmt = fmt or sniff_csv(file_path)
+    if columns is not None:
+        rename = match_columns(fmt.header, columns)
+    else:
+        rename = {name: name for name in fmt.header}
+    reverse = {v: k for k, v in rename.items()}
+    df = pd.read_csv(
+        file_path,
+        engine="c",
+        sep=fmt.delimiter,
+        encoding=fmt.encoding,
+        encoding_errors="replace",
+        usecols=list(rename) if columns is not None else None,
+        dtype={reverse[k]: v for k, v in (dtype or {}).items() if k in reverse} or None,
+    )
+    return df.rename(columns=rename)
+
+
+def _read_excel(file_path: str, ext: str, columns) -> pd.DataFrame:
+    """Read an Excel sheet, keeping only wanted columns"""
+    if columns is None:
+        return pd.read_excel(file_path, engine=EXCEL_ENGINES[ext])
+    keys = {normalize_header(c) for c in columns}
+    df = pd.read_excel(file_path, engine=EXCEL_ENGINES[ext],
+                       usecols=lambda name: normalize_header(name) in keys)
+    rename = match_columns(df.columns, columns)
+    return df[list(rename)].rename(columns=rename)
+
+
+def _read_columnar(file_path: str, ext: str, columns) -> pd.DataFrame:
+    """Memory-map a Parquet or Feather/Arrow file, reading only wanted columns"""
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+
+    if ext == ".parquet":
+        parquet_file = pq.ParquetFile(file_path, memory_map=True)
+        header = parquet_file.schema_arrow.names
+    else:
+        with pa.memory_map(file_path) as source:
+            header = pa.ipc.open_file(source).schema.names
+
+    rename = match_columns(header, columns) if columns is not None else {}
+    selected = list(rename) if columns is not None else None
+    if ext == ".parquet":
+        table = parquet_file.read(columns=selected)
+    else:
+        table = feather.read_table(file_path, columns=selected, memory_map=True)
+    return table.to_pandas().rename(columns=rename)
+
+
+def read_table(file_path: str, columns=None, dtype=None, fmt: CsvFormat = None) -> pd.DataFrame:
+    """Read a CSV, Excel, Parquet or Feather/Arrow file in a single parse.
+
+    Parameters:
+    -----------
+    file_path : str
+        Path to the input file
+    columns : list, optional
+        Column names (and aliases) to load. Header variants are matched with
+        ``normalize_header`` and renamed to the spelling given here. Names
+        absent from the file are skipped so the caller's validation can
+        report them. ``None`` loads every column unchanged.
+    dtype : dict, optional
+        Dtypes keyed by the spellings in ``columns``
+    fmt : CsvFormat, optional
+        A result of ``sniff_csv`` to reuse instead of sniffing again
+
+    Returns:
+    --------
+    pd.DataFrame
+        The loaded data with matched columns renamed
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".csv":
+        return _read_csv(file_path, columns, dtype, fmt)
+    elif ext in EXCEL_ENGINES:
+        df = _read_excel(file_path, ext, columns)
+    elif ext in COLUMNAR_EXTENSIONS:
+        df = _read_columnar(file_path, ext, columns)
+    else:
+        raise ValueError(f"Unsupported file format: {ext}. "
+                         "Provide a CSV, Excel, Parquet or Feather file.")
+
+    if dtype:
+        df = df.astype({k: v for k, v in dtype.items() if k in df.columns})
+    return df
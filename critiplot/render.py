@@ -0,0 +1,388 @@
+import contextlib
+import hashlib
+import os
+from typing import NamedTuple
+
+import numpy as np
+from matplotlib import rc_context
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+from matplotlib.text import Text
+
+from .layout import measure_tight_bbox
+from .bands import save_banded_png
+from .memory import plan_save, save_tiled_png
+from .png import check_png_options, write_png
+from .raster import collect_stamps, paint, paintable
+from .text_metrics import check_label_options, fit_tick_labels, text_cache
+from .vector import check_vector_options, vector_rc
+
+VALID_EXTENSIONS = [".png", ".pdf", ".svg", ".eps"]
+# Metadata that would make identical plots differ between matplotlib versions;
+# dates are fixed through SOURCE_DATE_EPOCH instead
+DETERMINISTIC_METADATA = {
+    ".png": {"Software": None},
+    ".pdf": {"Creator": None, "Producer": None},
+    ".svg": {"Creator": None},
+    ".eps": {"Creator": "critiplot"},
+}
+DETERMINISTIC_RC = {"svg.hashsalt": "critiplot"}
+
+
+def theme_family(theme: str) -> str:
+    """Themes in one family share markers and differ only in colors"""
+    return "smiley" if theme.startswith("smiley") else "square"
+
+
+def check_output_format(output_file: str):
+    """Raise ValueError unless ``output_file`` has a supported extension"""
+    ext = os.path.splitext(output_file)[1].lower()
+    if ext not in VALID_EXTENSIONS:
+        raise ValueError(f"Unsupported file format: {ext}. Use one of {VALID_EXTENSIONS}")
+
+
+def output_targets(output_file, theme, outputs, theme_options, required: bool = True) -> list:
+    """Combine ``output_file``/``theme`` and an ``outputs`` mapping into (path, theme) pairs.
+
+    Every theme (including ``theme`` itself) is validated up front so a bad
+    entry fails before any file is written. With ``required=False`` an
+    empty list is allowed, e.g. when only an array is returned.
+    """
+    targets = []
+    if output_file is not None:
+        targets.append((output_file, theme))
+    targets.extend((outputs or {}).items())
+    if not targets and required:
+        raise ValueError("Provide output_file or an outputs mapping of {path: theme}.")
+
+    for target_theme in [theme] + [t for _, t in targets]:
+        if target_theme not in theme_options:
+            raise ValueError(f"Theme {target_theme} not available. Choose from {list(theme_options.keys())}")
+    return targets
+
+
+@contextlib.contextmanager
+def reproducible_save():
+    """Fix dates (``SOURCE_DATE_EPOCH``, unless already set) and SVG ids for the saves inside"""
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    os.environ["SOURCE_DATE_EPOCH"] = epoch or "0"
+    try:
+        with rc_context(DETERMINISTIC_RC):
+            yield
+    finally:
+        if epoch is None:
+            del os.environ["SOURCE_DATE_EPOCH"]
+
+
+def file_digest(path: str) -> bytes:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def replace_if_changed(tmp_path: str, output_file: str) -> bool:
+    """Move ``tmp_path`` over ``output_file`` unless both hash the same.
+
+    An unchanged output is left alone (same bytes, inode and modification
+    time, so rsync and CDNs see nothing new). Returns True if replaced.
+    """
+    if (os.path.exists(output_file) and os.path.getsize(output_file) == os.path.getsize(tmp_path)
+            and file_digest(output_file) == file_digest(tmp_path)):
+        os.remove(tmp_path)
+        return False
+    os.replace(tmp_path, output_file)
+    return True
+
+
+def new_figure(**kwargs) -> Figure:
+    """A figure on an Agg canvas, created without pyplot.
+
+    No GUI backend is resolved and the figure is not registered with
+    pyplot, so rendering works headless and the figure is freed once it is
+    no longer referenced. PDF, SVG and EPS saves switch canvas as usual.
+    """
+    fig = Figure(**kwargs)
+    FigureCanvasAgg(fig)
+    return fig
+
+
+def row_lines(ax, ys, **kwargs) -> LineCollection:
+    """Full-width horizontal lines at data ``ys``, drawn as one LineCollection.
+
+    Draws and autoscales like an ``axhline`` per row (the view only grows
+    when a line is outside it), but is a single artist: vector files get
+    one group instead of one per row and layout walks one child, not
+    thousands.
+    """
+    lines = LineCollection([[(0, y), (1, y)] for y in ys], transform=ax.get_yaxis_transform(),
+                           capstyle="projecting", **kwargs)
+    ax.add_collection(lines, autolim=False)
+    ys = np.asarray(ys, dtype=float)
+    ymin, ymax = ax.get_ybound()
+    ax.update_datalim(np.column_stack([np.zeros(len(ys)), ys]), updatex=False)
+    if ((ys < ymin) | (ys > ymax)).any():
+        ax.autoscale_view(scalex=False)
+    return lines
+
+
+def legend_handles(legend) -> list:
+    """Artists drawn in a legend's handle column"""
+    return getattr(legend, "legend_handles", None) or legend.legendHandles
+
+
+class RenderedArray(NamedTuple):
+    """An RGBA image straight from the Agg canvas, plus where things landed in it.
+
+    ``array`` is a read-write ``(H, W, 4)`` uint8 view of the renderer's
+    buffer (no copy, no PNG round trip); it keeps the buffer alive on its
+    own. ``layout`` holds ``dpi``, ``width``, ``height`` and ``axes``: one
+    ``{"title", "bbox"}`` entry per axes with ``bbox`` as pixel
+    ``(left, top, right, bottom)`` measured from the top-left corner.
+    """
+    array: np.ndarray
+    layout: dict
+
+
+class _BufferSink:
+    """File-like target for ``savefig(format="rgba")`` that keeps the renderer buffer"""
+
+    def __init__(self, fig, painted: list = (), dpi: float = None):
+        self.fig = fig
+        self.painted = painted
+        self.dpi = dpi
+        self.buffer = None
+        self.axes = []
+        self.stamps = []
+
+    def write(self, data):
+        # Called while the figure is still cropped to the saved bbox, so
+        # window extents are pixel positions in the returned image
+        self.buffer = data
+        self.axes = [(ax.get_title(), ax.get_window_extent().frozen()) for ax in self.fig.axes if ax.get_visible()]
+        if self.painted:
+            height, width = data.shape[:2]
+            self.stamps = collect_stamps(self.painted, height, width, self.dpi)
+        return data.nbytes
+
+    def seek(self, *args):
+        return 0
+
+
+class ThemedFigure:
+    """A laid-out figure whose judgment colors and markers can be switched.
+
+    The figure, axes, labels and summary bars are built once. Artists whose
+    color depends on a judgment are registered with ``bind`` and recolored
+    by ``set_theme``; the study grid is drawn per theme family through
+    ``draw_cells(family, colors)``, which returns (artist, key) bindings.
+    A family's grid is drawn the first time it is needed and afterwards
+    only shown or hidden; view limits ``draw_cells`` sets for its family
+    are restored when switching back to it.
+    """
+
+    def __init__(self, fig, theme_options: dict, draw_cells, fallback: str = "#BBBBBB"):
+        self.fig = fig
+        self.theme_options = theme_options
+        self.fallback = fallback
+        self.theme = None
+        self.save_options = {"dpi": 300, "bbox_inches": "tight"}
+        self._draw_cells = draw_cells
+        self._bindings = []
+        self._layers = {}
+        self._layer_artists = {}
+        self._layer_limits = {}
+        self._tight_bboxes = {}
+        self.changed = False
+
+    def bind(self, artist, key):
+        """Recolor ``artist`` on theme changes; ``key`` is a judgment or one per point"""
+        self._bindings.append((artist, key))
+
+    def _recolor(self, artist, key, colors):
+        if not isinstance(key, str):
+            artist.set_facecolors([colors.get(k, self.fallback) for k in key])
+            return
+        color = colors.get(key, self.fallback)
+        if isinstance(artist, Line2D):
+            artist.set_markerfacecolor(color)
+        elif isinstance(artist, Text):
+            artist.set_color(color)
+        else:
+            artist.set_facecolor(color)
+
+    def set_theme(self, theme: str):
+        """Switch colors (and the grid layer, across families) to ``theme``"""
+        if theme not in self.theme_options:
+            raise ValueError(f"Theme {theme} not available. Choose from {list(self.theme_options.keys())}")
+        colors = self.theme_options[theme]
+        family = theme_family(theme)
+
+        if family not in self._layers:
+            before = {id(artist) for ax in self.fig.axes for artist in ax.get_children()}
+            self._layers[family] = self._draw_cells(family, colors)
+            self._layer_artists[family] = [artist for ax in self.fig.axes for artist in ax.get_children()
+                                           if id(artist) not in before]
+            self._layer_limits[family] = [(ax, ax.get_xlim(), ax.get_ylim()) for ax in self.fig.axes]
+        elif family != theme_family(self.theme or ""):
+            for ax, xlim, ylim in self._layer_limits[family]:
+                ax.set_xlim(xlim)
+                ax.set_ylim(ylim)
+        for layer_family, bindings in self._layers.items():
+            for artist, _ in bindings:
+                artist.set_visible(layer_family == family)
+
+        for artist, key in self._bindings + self._layers[family]:
+            self._recolor(artist, key, colors)
+        self.theme = theme
+
+    def palette_colors(self) -> list:
+        """The background and current theme colors as RGBA bytes, kept exact in palette PNGs"""
+        colors = [self.fig.get_facecolor(), *self.theme_options[self.theme].values(), self.fallback]
+        return [tuple(int(round(c * 255)) for c in to_rgba(color)) for color in colors]
+
+    def _raster_options(self, options: dict) -> dict:
+        """Replace a "tight" bbox with one measured once per (dpi, pad, theme family).
+
+        Themes of one family only differ in colors, so every raster variant
+        reuses the measurement instead of sizing a full canvas to find it.
+        """
+        if isinstance(options.get("bbox_inches"), str) and options["bbox_inches"] == "tight":
+            key = (options["dpi"], options.get("pad_inches"), theme_family(self.theme or ""))
+            if key not in self._tight_bboxes:
+                self._tight_bboxes[key] = measure_tight_bbox(self.fig, options["dpi"], options.get("pad_inches"))
+            options = {**options, "bbox_inches": self._tight_bboxes[key]}
+        return options
+
+    def save(self, output_file: str, max_memory=None, png_options: dict = None, vector_options: dict = None,
+             deterministic: bool = False, **kwargs):
+        """Save the figure using ``save_options`` (300 dpi, tight bbox) updated by ``kwargs``.
+
+        With ``max_memory`` (bytes or a size like "512MB") the save is planned
+        to stay within that budget and the chosen strategy is reported.
+        ``png_options`` switches PNG files to the ``write_png`` encoder
+        (with ``"grid": "numpy"`` the cells are painted by ``to_array``);
+        with ``"processes"`` horizontal bands are drawn in that many forked
+        processes and stitched by ``save_banded_png``. Tiled and banded
+        saves only honor its compression level. ``vector_options``
+        ({"text": "path"|"font"}) sets how SVG, PDF and EPS files store text.
+        ``deterministic`` writes byte-reproducible files (no dates or
+        version strings, fixed SVG ids) to a temporary path and only
+        replaces ``output_file`` if the contents changed (``changed`` is
+        then False).
+        """
+        options = {**self.save_options, **kwargs}
+        plan = None
+        if max_memory is not None:
+            plan = plan_save(self.fig, output_file, options["dpi"], max_memory)
+            print(f"✅ max_memory: {output_file} rendered {plan.describe()}")
+            options["dpi"] = plan.dpi
+
+        ext = os.path.splitext(output_file)[1].lower()
+        target = f"{output_file}.tmp" if deterministic else output_file
+        # savefig can't infer the format from the temporary name
+        file_options = {"format": ext[1:]} if deterministic else {}
+        if deterministic and ext in DETERMINISTIC_METADATA:
+            file_options["metadata"] = DETERMINISTIC_METADATA[ext]
+        with reproducible_save() if deterministic else contextlib.nullcontext():
+            if plan is not None and plan.strategy in ("tiled", "reduced dpi"):
+                compression = check_png_options(png_options)["compression"]
+                save_tiled_png(self.fig, target, band_rows=plan.band_rows, compression=compression, **options)
+            elif png_options is not None and ext == ".png":
+                png = check_png_options(png_options)
+                processes = png.pop("processes")
+                if processes:
+                    save_banded_png(self.fig, target, processes=processes, compression=png["compression"], **options)
+                else:
+                    rendered = self.to_array(paint_grid=png.pop("grid") == "numpy", **options)
+                    write_png(target, rendered.array, rendered.layout["dpi"], fixed_colors=self.palette_colors(),
+                              **png)
+            elif ext == ".png":
+                self.fig.savefig(target, **{**self._raster_options(options), **file_options})
+            else:
+                with rc_context(vector_rc(vector_options)):
+                    self.fig.savefig(target, **{**options, **file_options})
+        self.changed = not deterministic or replace_if_changed(target, output_file)
+        if not self.changed:
+            print(f"✅ deterministic: {output_file} unchanged, kept the existing file")
+        return plan
+
+    def to_array(self, paint_grid: bool = False, **kwargs) -> RenderedArray:
+        """Render with ``save_options`` (updated by ``kwargs``) into an RGBA array.
+
+        With ``paint_grid`` matplotlib draws everything but the study grid's
+        markers and symbols, which are then stamped into the array from
+        pre-rasterized sprites (see ``raster.paint``). The cells land within
+        about a pixel of matplotlib's and are painted above the gridlines.
+        """
+        options = self._raster_options({**self.save_options, **kwargs, "format": "rgba"})
+        painted = []
+        if paint_grid:
+            layer = self._layer_artists.get(theme_family(self.theme or ""), [])
+            painted = [artist for artist in layer if artist.get_visible() and paintable(artist)]
+        sink = _BufferSink(self.fig, painted, options["dpi"])
+        for artist in painted:
+            artist.set_visible(False)
+        try:
+            self.fig.savefig(sink, **options)
+        finally:
+            for artist in painted:
+                artist.set_visible(True)
+        array = np.asarray(sink.buffer)
+        if sink.stamps:
+            paint(array, sink.stamps)
+        height, width = array.shape[:2]
+        axes = [{"title": title, "bbox": (round(bbox.x0), round(height - bbox.y1), round(bbox.x1), round(height - bbox.y0))}
+                for title, bbox in sink.axes]
+        layout = {"dpi": options["dpi"], "width": width, "height": height, "axes": axes}
+        return RenderedArray(array, layout)
+
+    def close(self):
+        """Drop the theme layers; the figure itself is freed with this object"""
+        self._bindings.clear()
+        self._layers.clear()
+        self._layer_artists.clear()
+
+
+def render_variants(build, targets: list, message: str, max_memory=None, array_theme: str = None,
+                    png_options: dict = None, label_options: dict = None, vector_options: dict = None,
+                    deterministic: bool = False):
+    """Build a figure once and save it for every (path, theme) in ``targets``.
+
+    ``build(theme)`` returns a ThemedFigure; later targets only re-theme it.
+    ``message`` is formatted with each saved path. ``max_memory``,
+    ``png_options``, ``vector_options`` and ``deterministic`` are passed on
+    to ``ThemedFigure.save``. With
+    ``array_theme`` the figure is finally rendered in that theme and
+    returned as a RenderedArray. ``label_options`` fits the first axes' y
+    tick labels (the studies) with ``fit_tick_labels``. Text is measured
+    through the process-wide ``text_cache``.
+    """
+    if png_options is not None:
+        check_png_options(png_options)
+    if label_options is not None:
+        label_options = check_label_options(label_options)
+    check_vector_options(vector_options)
+    themed = None
+    try:
+        with text_cache():
+            for output_file, theme in targets + ([(None, array_theme)] if array_theme else []):
+                if themed is None:
+                    themed = build(theme)
+                    if label_options is not None:
+                        fit_tick_labels(themed.fig.axes[0], label_options["max_width"], label_options["mode"])
+                else:
+                    themed.set_theme(theme)
+                if output_file is None:
+                    return themed.to_array()
+                themed.save(output_file, max_memory=max_memory, png_options=png_options,
+                            vector_options=vector_options, deterministic=deterministic)
+                if themed.changed:
+                    print(message.format(output_file))
+    finally:
+        if themed is not None:
+            themed.close()
@@ -1,33 +1,17 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import sys
 import os
+from matplotlib.artist import setp
 from matplotlib.lines import Line2D
 from collections import defaultdict
-
-def process_robis(df: pd.DataFrame) -> pd.DataFrame:
-    """Process ROBIS data with memory optimizations"""
-    column_map = {
-        "Study Eligibility Criteria": "Study Eligibility",
-        "Identification & Selection of Studies": "Identification & Selection",
-        "Data Collection & Study Appraisal": "Data Collection",
-        "Overall RoB": "Overall Risk"
-    }
-    df = df.rename(columns=column_map)
-
-    required_columns = [
-        "Review",
-        "Study Eligibility",
-        "Identification & Selection",
-        "Data Collection",
-        "Synthesis & Findings",
-        "Overall Risk"
-    ]
-    missing = [c for c in required_columns if c not in df.columns]
-    if missing:
-        raise ValueError(f"Missing required columns: {missing}")
-    return df
+from .cache import load_or_process
+from .collapse import check_collapse, collapse_patterns, domain_counts
+from .incremental import default_state_file, diff_studies, save_state
+from .layout import figure_layout
+from .render import (ThemedFigure, check_output_format, legend_handles, new_figure, output_targets,
+                     render_variants, row_lines)
+from .subset import select_studies, study_index
+from .robis_data import DOMAINS, process_robis, read_input_file, standardize_risk, study_judgments
 
 def risk_to_symbol(risk: str) -> str:
     """Convert risk level to symbol"""
@@ -39,95 +23,63 @@ def risk_to_symbol(risk: str) -> str:
         return "☹"
     return "?"
 
-def standardize_risk(risk):
-    """Standardize risk level input"""
-    risk = str(risk).strip().lower()
-    if risk in ['high', 'h']:
-        return 'High'
-    elif risk in ['unclear', 'uncertain', 'u']:
-        return 'Unclear'
-    elif risk in ['low', 'l']:
-        return 'Low'
-    else:
-        return 'Unclear'
+THEME_OPTIONS = {
+    "default": {"Low":"#06923E","Unclear":"#FFD93D","High":"#DC2525"},
+    "blue": {"Low":"#3a83b7","Unclear":"#7fb2e6","High":"#084582"},
+    "gray": {"Low":"#63BF93FF","Unclear":"#5B6D80","High":"#FF884DFF"},
+    "smiley": {"Low":"#06923E","Unclear":"#FFD93D","High":"#DC2525"},
+    "smiley_blue": {"Low":"#3a83b7","Unclear":"#7fb2e6","High":"#084582"}
+}
 
-def professional_robis_plot(df: pd.DataFrame, output_file: str, theme: str = "default"):
-    """Create professional ROBIS plot with balanced font sizes"""
-    theme_options = {
-        "default": {"Low":"#06923E","Unclear":"#FFD93D","High":"#DC2525"},
-        "blue": {"Low":"#3a83b7","Unclear":"#7fb2e6","High":"#084582"},
-        "gray": {"Low":"#63BF93FF","Unclear":"#5B6D80","High":"#FF884DFF"},
-        "smiley": {"Low":"#06923E","Unclear":"#FFD93D","High":"#DC2525"},
-        "smiley_blue": {"Low":"#3a83b7","Unclear":"#7fb2e6","High":"#084582"}
-    }
+SAVED_MESSAGE = "✅ ROBIS professional plot saved to {}"
 
-    if theme not in theme_options:
-        raise ValueError(f"Theme {theme} not available. Choose from {list(theme_options.keys())}")
-    colors = theme_options[theme]
+def build_robis_figure(df: pd.DataFrame, theme: str = "default", counts: dict = None) -> ThemedFigure:
+    """Lay out the ROBIS figure once; the result can be re-themed and saved repeatedly.
 
-    domains = ["Study Eligibility","Identification & Selection","Data Collection","Synthesis & Findings","Overall Risk"]
-    
+    ``counts`` ({domain: {risk: n}}) supplies precomputed summary counts,
+    e.g. from an incremental update, instead of tallying the grid.
+    """
+    if theme not in THEME_OPTIONS:
+        raise ValueError(f"Theme {theme} not available. Choose from {list(THEME_OPTIONS.keys())}")
+    colors = THEME_OPTIONS[theme]
 
-    n_studies = len(df)
-    per_study_height = 0.65      
-    min_first_plot_height = 3.0  
-    second_plot_height = 3.5  
-    gap_between_plots = 1.7    
-    top_margin = 1.0           
-    bottom_margin = 0.5        
-    
-    first_plot_height = max(min_first_plot_height, n_studies * per_study_height)
-    total_height = first_plot_height + gap_between_plots + second_plot_height + top_margin + bottom_margin
-    
-    fig = plt.figure(figsize=(24, total_height))
+    domains = DOMAINS
     
 
-    ax0_bottom = (bottom_margin + second_plot_height + gap_between_plots) / total_height
-    ax0_height = first_plot_height / total_height
-    ax1_bottom = bottom_margin / total_height
-    ax1_height = second_plot_height / total_height
-    
-    ax0 = fig.add_axes([0.12, ax0_bottom, 0.75, ax0_height])
-    ax1 = fig.add_axes([0.12, ax1_bottom, 0.75, ax1_height])
+    n_studies = len(df)
+    layout = figure_layout("robis", n_studies)
+    fig = new_figure(figsize=layout.figsize)
+    ax0 = fig.add_axes(layout.grid_rect)
+    ax1 = fig.add_axes(layout.summary_rect)
     
   
     domain_pos = {d: i for i, d in enumerate(domains)}
     review_pos = {a: i for i, a in enumerate(df["Review"].tolist())}
     
     
-    for y in range(len(review_pos)):
-        ax0.axhline(y, color='lightgray', linewidth=0.8, zorder=0)
-    ax0.axhline(-0.5, color='lightgray', linewidth=0.8, zorder=0)
-    ax0.axhline(len(review_pos)-0.5, color='lightgray', linewidth=0.8, zorder=0)
-    
-    if theme.startswith("smiley"):
-    
-        for _, row in df.iterrows():
-            y_pos = review_pos[row["Review"]]
-            
-            for domain in domains:
-                risk = standardize_risk(row[domain])
-                symbol = risk_to_symbol(risk)
-                x_pos = domain_pos[domain]
-                ax0.text(x_pos, y_pos, symbol, fontsize=32, ha='center', va='center',
-                        color=colors.get(risk, "#BBBBBB"), fontweight="bold", zorder=1)
-    else:
+    row_lines(ax0, [*range(len(review_pos)), -0.5, len(review_pos)-0.5], colors='lightgray', linewidth=0.8, zorder=0)
 
-        x_coords = []
-        y_coords = []
-        point_colors = []
-        
-        for _, row in df.iterrows():
-            y_pos = review_pos[row["Review"]]
-            
-            for domain in domains:
-                risk = standardize_risk(row[domain])
-                x_coords.append(domain_pos[domain])
-                y_coords.append(y_pos)
-                point_colors.append(colors.get(risk, "#BBBBBB"))
-        
-        ax0.scatter(x_coords, y_coords, c=point_colors, s=1300, marker="s", 
-                   edgecolor='white', linewidth=1, zorder=1)
+    cells = []
+    for _, row in df.iterrows():
+        y_pos = review_pos[row["Review"]]
+        for domain in domains:
+            cells.append((domain_pos[domain], y_pos, standardize_risk(row[domain])))
+
+    def draw_cells(family, colors):
+        if family == "smiley":
+            bindings = []
+            for x_pos, y_pos, risk in cells:
+                text = ax0.text(x_pos, y_pos, risk_to_symbol(risk), fontsize=32, ha='center', va='center',
+                                color=colors.get(risk, "#BBBBBB"), fontweight="bold", zorder=1)
+                bindings.append((text, risk))
+            return bindings
+
+        x_coords, y_coords, risks = zip(*cells) if cells else ((), (), ())
+        scatter = ax0.scatter(x_coords, y_coords, c=[colors.get(r, "#BBBBBB") for r in risks], s=1300, marker="s",
+                              edgecolor='white', linewidth=1, zorder=1)
+        return [(scatter, list(risks))]
+
+    themed = ThemedFigure(fig, THEME_OPTIONS, draw_cells)
     
 
     ax0.set_xticks(range(len(domains)))
@@ -145,14 +97,16 @@ def professional_robis_plot(df: pd.DataFrame, output_file: str, theme: str = "de
   
     bar_data = defaultdict(lambda: defaultdict(int))
     
-    for _, row in df.iterrows():
-        for domain in domains:
-            risk = standardize_risk(row[domain])
-            bar_data[domain][risk] += 1
+    if counts is None:
+        for x_pos, _, risk in cells:
+            bar_data[domains[x_pos]][risk] += 1
+    else:
+        for domain, risk_counts in counts.items():
+            bar_data[domain].update(risk_counts)
     
     
-    total_reviews = len(df)
     for domain in bar_data:
+        total_reviews = sum(bar_data[domain].values())
         for risk in bar_data[domain]:
             bar_data[domain][risk] = (bar_data[domain][risk] / total_reviews) * 100
     
@@ -163,7 +117,7 @@ def professional_robis_plot(df: pd.DataFrame, output_file: str, theme: str = "de
     bottom = None
     for risk in ["High", "Unclear", "Low"]:
         values = [bar_data[domain].get(risk, 0) for domain in inverted_domains]
-        ax1.barh(
+        bars = ax1.barh(
             inverted_domains, 
             values, 
             left=bottom, 
@@ -172,6 +126,8 @@ def professional_robis_plot(df: pd.DataFrame, output_file: str, theme: str = "de
             label=risk, 
             height=bar_height
         )
+        for patch in bars:
+            themed.bind(patch, risk)
         if bottom is None:
             bottom = values
         else:
@@ -203,8 +159,7 @@ def professional_robis_plot(df: pd.DataFrame, output_file: str, theme: str = "de
     for label in ax1.get_xticklabels():
         label.set_fontweight("bold")
     
-    for y in range(len(inverted_domains)):
-        ax1.axhline(y-0.5, color='lightgray', linewidth=0.8, zorder=0)
+    row_lines(ax1, [y - 0.5 for y in range(len(inverted_domains))], colors='lightgray', linewidth=0.8, zorder=0)
     
  
     legend_elements = [
@@ -224,56 +179,129 @@ def professional_robis_plot(df: pd.DataFrame, output_file: str, theme: str = "de
         title_fontsize=22
     )
     legend.get_frame().set_edgecolor('black')
-    plt.setp(legend.get_texts(), fontweight="normal")
-    plt.setp(legend.get_title(), fontweight="bold")
-
+    setp(legend.get_texts(), fontweight="normal")
+    setp(legend.get_title(), fontweight="bold")
+    for handle, risk in zip(legend_handles(legend), ["Low", "Unclear", "High"]):
+        themed.bind(handle, risk)
 
-    valid_ext = [".png", ".pdf", ".svg", ".eps"]
-    ext = os.path.splitext(output_file)[1].lower()
-    if ext not in valid_ext:
-        raise ValueError(f"Unsupported file format: {ext}. Use one of {valid_ext}")
-    plt.savefig(output_file, dpi=300, bbox_inches='tight')
-    plt.close()
-    print(f"✅ ROBIS professional plot saved to {output_file}")
-    
-
-    del bar_data
+    themed.set_theme(theme)
+    return themed
 
-def read_input_file(file_path: str) -> pd.DataFrame:
-    """Read input file with memory optimizations"""
-    ext = os.path.splitext(file_path)[1].lower()
-    if ext == ".csv":
-        return pd.read_csv(file_path, engine='c')
-    elif ext in [".xls", ".xlsx"]:
-        return pd.read_excel(file_path, engine='openpyxl')
-    else:
-        raise ValueError(f"Unsupported file format: {ext}. Provide a CSV or Excel file.")
+def professional_robis_plot(df: pd.DataFrame, output_file: str, theme: str = "default"):
+    """Create professional ROBIS plot with balanced font sizes"""
+    check_output_format(output_file)
+    render_variants(lambda t: build_robis_figure(df, t), [(output_file, theme)], SAVED_MESSAGE)
 
-def plot_robis(input_file: str, output_file: str, theme: str = "default"):
+def plot_robis(input_file: str, output_file: str = None, theme: str = "default", cache: bool = False,
+               outputs: dict = None, incremental: bool = False, state_file: str = None, max_memory=None,
+               return_array: bool = False, png_options: dict = None, label_options: dict = None,
+               vector_options: dict = None,
+               deterministic: bool = False, collapse: str = None,
+               filter: dict = None, sort_by=None):
     """
     Generate a ROBIS (Risk Of Bias In Systematic reviews) plot from input data.
     
     Parameters:
     -----------
     input_file : str
-        Path to the input CSV or Excel file containing ROBIS data
+        Path to the input CSV, Excel, Parquet or Feather file containing ROBIS data
     output_file : str
         Path where the output plot will be saved (supports .png, .pdf, .svg, .eps)
     theme : str, optional
         Color theme for the plot. Options: "default", "blue", "gray", "smiley", "smiley_blue"
         Default is "default"
+    cache : bool, optional
+        Store the normalized data as a Feather sidecar next to the input file
+        and reuse it on later calls until the input changes. Default is False
+    outputs : dict, optional
+        Extra {output_path: theme} variants, e.g. {"a.png": "default", "b.pdf": "blue"}.
+        The data is parsed and the figure laid out once; each variant only
+        recolors the existing artists before saving.
+    incremental : bool, optional
+        Keep the judgment matrix and domain counts in a state file, diff the
+        new input by "Review", update the counts by delta and skip rendering
+        when no review changed. Default is False
+    state_file : str, optional
+        State file for incremental mode. Default is "<first output>.state.json"
+    max_memory : int or str, optional
+        Memory budget for saving, in bytes or as a size like "512MB". Each
+        save is planned to fit (full raster, PNG tiling, reduced dpi or the
+        vector backend for .pdf/.svg/.eps) and the chosen strategy is printed.
+        Default is None (no budget)
+    return_array : bool, optional
+        Also render the figure in ``theme`` straight into memory and return it
+        as a RenderedArray: a zero-copy ``(H, W, 4)`` uint8 view of the Agg
+        buffer plus layout metadata, with no PNG encode. ``output_file`` may
+        then be None. Default is False
+    png_options : dict, optional
+        PNG encoding options, e.g. {"compression": 1, "palette": True}:
+        ``compression`` is the zlib level (0-9, default 6), ``palette`` writes
+        an 8-bit indexed PNG (exact up to 256 colors, otherwise quantized),
+        ``encoder`` is "zlib" or "parallel" (multithreaded, ``workers``
+        threads). Default is None (matplotlib's PNG writer)
+    label_options : dict, optional
+        Fit long review labels to a width, e.g. {"max_width": 4, "mode": "wrap"}:
+        ``max_width`` is in inches and ``mode`` is "truncate" (cut with "…",
+        the default) or "wrap" (break at spaces), using cached text widths.
+        Default is None (labels as given)
+    vector_options : dict, optional
+        How .svg/.pdf/.eps files store text: {"text": "path"} (glyph
+        outlines, the default) or {"text": "font"} (real text with embedded
+        fonts; smaller files with many labels). Default is None
+    deterministic : bool, optional
+        Write byte-reproducible files (no dates or matplotlib version, fixed
+        SVG ids) and leave an output untouched (bytes and modification
+        time) when its contents did not change. Default is False
+    collapse : str, optional
+        Draw one row per distinct judgment pattern, labelled with its number
+        of reviews and ordered by "frequency" or "severity"; the summary bars
+        still count every review. Default is None (one row per review)
+    filter : dict, optional
+        Plot only the reviews matching every key: "year" (a year, or an
+        inclusive (first, last) range with None for an open end, parsed from
+        the labels), "risk" (one or more overall judgments), e.g.
+        {"year": (2018, None), "risk": "High"}. Default is None (all reviews)
+    sort_by : str or list, optional
+        Order the rows by "year", "risk" (severity) or "label", or by a list
+        of those; a leading "-" sorts descending. Default is None (input order)
     
     Returns:
     --------
     None
-        The plot is saved to the specified output file path
+        The plot is saved to the specified output file path(s)
+    RenderedArray
+        Only with ``return_array=True``
     """
+    targets = output_targets(output_file, theme, outputs, THEME_OPTIONS, required=not return_array)
+    for path, _ in targets:
+        check_output_format(path)
+    check_collapse(collapse)
     if not os.path.exists(input_file):
         raise FileNotFoundError(f"Input file not found: {input_file}")
 
-    df = read_input_file(input_file)
-    df = process_robis(df)
-    professional_robis_plot(df, output_file, theme)
+    df = load_or_process(input_file, "robis", lambda: process_robis(read_input_file(input_file)), cache)
+    if filter or sort_by:
+        index = study_index(df["Review"], [standardize_risk(risk) for risk in df["Overall Risk"]],
+                            ["Low", "Unclear", "High"])
+        df = select_studies(df, index, filter, sort_by)
+    update = None
+    if incremental and targets:
+        update = diff_studies(state_file or default_state_file(targets), "robis", study_judgments(df), targets)
+        if not update.pages:
+            if not return_array:
+                print("✅ No review changes since the last render; outputs are up to date")
+                return
+            targets = []
+    counts = update.counts.get("") if update else None
+    if collapse:
+        judgments = study_judgments(df)
+        df, counts = collapse_patterns(df, judgments, "Review", collapse), domain_counts(judgments)
+    result = render_variants(lambda t: build_robis_figure(df, t, counts), targets, SAVED_MESSAGE, max_memory,
+                             theme if return_array else None, png_options, label_options,
+                             vector_options=vector_options, deterministic=deterministic)
+    if update:
+        save_state(update)
+    return result
 
 if __name__ == "__main__":
     if len(sys.argv) not in [3,4]:
@@ -0,0 +1,42 @@
+import pandas as pd
+
+from .reader import read_table
+from .schema import Column, Schema, register_schema
+
+SCHEMA = register_schema(Schema("robis", [
+    Column("Review", dtype="str"),
+    Column("Study Eligibility", aliases=("Study Eligibility Criteria",)),
+    Column("Identification & Selection", aliases=("Identification & Selection of Studies",)),
+    Column("Data Collection", aliases=("Data Collection & Study Appraisal",)),
+    Column("Synthesis & Findings"),
+    Column("Overall Risk", aliases=("Overall RoB",)),
+]))
+INPUT_COLUMNS = SCHEMA.read_columns
+INPUT_DTYPES = SCHEMA.read_dtypes
+DOMAINS = ["Study Eligibility","Identification & Selection","Data Collection","Synthesis & Findings","Overall Risk"]
+
+def process_robis(df: pd.DataFrame) -> pd.DataFrame:
+    """Process ROBIS data with memory optimizations"""
+    return SCHEMA.validate(df)
+
+def standardize_risk(risk):
+    """Standardize risk level input"""
+    risk = str(risk).strip().lower()
+    if risk in ['high', 'h']:
+        return 'High'
+    elif risk in ['unclear', 'uncertain', 'u']:
+        return 'Unclear'
+    elif risk in ['low', 'l']:
+        return 'Low'
+    else:
+        return 'Unclear'
+
+def study_judgments(df: pd.DataFrame) -> pd.DataFrame:
+    """Standardized risk per review and domain, indexed by "Review"."""
+    judgments = pd.DataFrame({domain: [standardize_risk(risk) for risk in df[domain]] for domain in DOMAINS})
+    judgments.index = df["Review"].to_numpy()
+    return judgments
+
+def read_input_file(file_path: str) -> pd.DataFrame:
+    """Read input file in a single sniffed parse of the ROBIS columns"""
+    return read_table(file_path, INPUT_COLUMNS, INPUT_DTYPES)
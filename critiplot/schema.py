@@ -0,0 +1,146 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from .reader import normalize_header
+
+SCHEMAS = {}
+
+
+class Column(NamedTuple):
+    """One input column: its name, accepted aliases and what values are valid.
+
+    ``dtype`` is "str" or "category" (applied when reading) or "numeric"
+    (checked after reading, with optional ``min``/``max``). ``allowed``
+    restricts the values to a set. Optional columns are only checked when
+    present.
+    """
+    name: str
+    aliases: tuple = ()
+    dtype: str = None
+    allowed: frozenset = None
+    min: float = None
+    max: float = None
+    required: bool = True
+
+
+class SchemaError(ValueError):
+    """Raised with every problem found in one validation pass"""
+
+    def __init__(self, tool: str, errors: list):
+        self.tool = tool
+        self.errors = errors
+        super().__init__(f"Invalid {tool} input ({len(errors)} problem(s)):\n"
+                         + "\n".join(f"- {error}" for error in errors))
+
+
+def _range(column: Column) -> str:
+    if column.min is None:
+        return f"at most {column.max:g}"
+    if column.max is None:
+        return f"at least {column.min:g}"
+    return f"{column.min:g}-{column.max:g}"
+
+
+class Schema:
+    """Declarative description of a tool's input, compiled once into a validator.
+
+    ``columns`` lists the known columns; ``other`` describes every column
+    not listed (MMAT's criteria). Column groups that share a check are
+    validated together: numeric ranges as one NumPy comparison over the
+    stacked block, allowed values as one ``DataFrame.isin`` per value set.
+    """
+
+    def __init__(self, tool: str, columns: list, other: Column = None):
+        self.tool = tool
+        self.columns = list(columns)
+        self.other = other
+        self.names = [column.name for column in self.columns]
+        self._by_name = {column.name: column for column in self.columns}
+        self._aliases = {}
+        for column in self.columns:
+            for alias in column.aliases:
+                self._aliases[normalize_header(alias)] = column.name
+
+    @property
+    def read_columns(self) -> list:
+        """Names and aliases in schema order, for ``read_table``"""
+        return [name for column in self.columns for name in (column.name, *column.aliases)]
+
+    @property
+    def read_dtypes(self) -> dict:
+        """Reader dtypes keyed by every spelling of the typed columns"""
+        return {name: column.dtype for column in self.columns if column.dtype in ("str", "category")
+                for name in (column.name, *column.aliases)}
+
+    def rename_aliases(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Rename alias columns to their canonical name unless that name is already present"""
+        rename = {}
+        for name in df.columns:
+            target = self._aliases.get(normalize_header(name))
+            if target is not None and target not in df.columns and target not in rename.values():
+                rename[name] = target
+        return df.rename(columns=rename) if rename else df
+
+    def _spec(self, name) -> Column:
+        column = self._by_name.get(name)
+        if column is None and self.other is not None:
+            column = self.other._replace(name=name)
+        return column
+
+    def errors(self, df: pd.DataFrame) -> list:
+        """Every problem with ``df`` (after alias renaming), as messages"""
+        missing = [column.name for column in self.columns if column.required and column.name not in df.columns]
+        errors = [f"Missing required columns: {missing}"] if missing else []
+
+        present = [spec for spec in map(self._spec, df.columns) if spec is not None]
+        numeric = []
+        for spec in present:
+            if spec.dtype != "numeric":
+                continue
+            if pd.api.types.is_numeric_dtype(df[spec.name]):
+                numeric.append(spec)
+            else:
+                errors.append(f"Column {spec.name} must be numeric.")
+
+        ranged = [spec for spec in numeric if spec.min is not None or spec.max is not None]
+        if ranged:
+            values = df[[spec.name for spec in ranged]].to_numpy(dtype=float)
+            low = np.array([-np.inf if spec.min is None else spec.min for spec in ranged])
+            high = np.array([np.inf if spec.max is None else spec.max for spec in ranged])
+            outside = (values < low) | (values > high)
+            for i in np.flatnonzero(outside.any(axis=0)):
+                spec = ranged[i]
+                bad = ", ".join(f"{v:g}" for v in sorted(set(values[outside[:, i], i].tolist()))[:5])
+                errors.append(f"Column {spec.name} contains invalid values {bad} ({_range(spec)} allowed).")
+
+        groups = {}
+        for spec in present:
+            if spec.allowed is not None:
+                groups.setdefault(spec.allowed, []).append(spec.name)
+        for allowed, names in groups.items():
+            invalid = ~df[names].isin(allowed)
+            for name in invalid.columns[invalid.to_numpy().any(axis=0)]:
+                bad = set(df.loc[invalid[name], name].unique().tolist())
+                errors.append(f"Invalid values for {name}: {bad}. Allowed: {sorted(allowed)}")
+        return errors
+
+    def validate(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Rename aliases, then raise SchemaError listing every problem (or return the frame)"""
+        df = self.rename_aliases(df)
+        errors = self.errors(df)
+        if errors:
+            raise SchemaError(self.tool, errors)
+        return df
+
+
+def register_schema(schema: Schema) -> Schema:
+    SCHEMAS[schema.tool] = schema
+    return schema
+
+
+def get_schema(tool: str) -> Schema:
+    if tool not in SCHEMAS:
+        raise ValueError(f"No input schema for {tool}. Choose from {list(SCHEMAS.keys())}")
+    return SCHEMAS[tool]
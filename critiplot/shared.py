@@ -0,0 +1,170 @@
+import contextlib
+import numbers
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+ALIGN = 8
+# Type of each string-table entry; object columns mix them (e.g. JBI's 1 and "Not Applicable")
+VALUE_TYPES = (str, int, float)
+
+# Blocks attached in this process, kept open while their frames may still view them
+_attached = {}
+
+
+class SharedColumn(NamedTuple):
+    """Where one column lives in the block: raw ``"array"`` bytes or a row of the ``"codes"`` matrix"""
+    name: object
+    kind: str
+    dtype: object
+    offset: int
+
+
+class SharedFrame(NamedTuple):
+    """Picklable handle of a DataFrame placed in shared memory by ``shared_frame``.
+
+    It holds only the block name and the layout, so handing it to a worker
+    costs a few hundred bytes however large the frame is.
+    """
+    name: str
+    rows: int
+    columns: tuple
+    codes_offset: int
+    n_strings: int
+    strings_offset: int
+
+
+def _value_type(value) -> int:
+    if isinstance(value, str):
+        return 0
+    if isinstance(value, numbers.Integral) and not isinstance(value, (bool, np.bool_)):
+        return 1
+    if isinstance(value, numbers.Real):
+        return 2
+    raise ValueError(f"Cannot share value {value!r} of type {type(value).__name__}")
+
+
+def _aligned(size: int) -> int:
+    return -(-size // ALIGN) * ALIGN
+
+
+def encode_frame(df: pd.DataFrame) -> tuple:
+    """Split ``df`` into raw numeric arrays, one int32 code matrix and a string table.
+
+    Every non-numeric column (str, object, category) is factorized over a
+    single table shared by all of them, so the judgment columns become rows
+    of one (columns, studies) code matrix, -1 marking a missing cell.
+    Returns (arrays, codes, strings, types, layout) with ``layout`` the
+    list of (column, kind, dtype) in column order.
+    """
+    arrays, text, layout = [], [], []
+    for name, column in df.items():
+        if isinstance(column.dtype, np.dtype) and column.dtype.kind in "biuf":
+            layout.append((name, "array", column.dtype))
+            arrays.append(column.to_numpy())
+        else:
+            layout.append((name, "codes", column.dtype))
+            text.append(column.to_numpy(dtype=object))
+    if text:
+        codes, uniques = pd.factorize(np.concatenate(text))
+        codes = codes.astype(np.int32).reshape(len(text), len(df))
+    else:
+        codes, uniques = np.empty((0, len(df)), dtype=np.int32), []
+    types = np.array([_value_type(value) for value in uniques], dtype=np.int8)
+    strings = [str(value) for value in uniques]
+    return arrays, codes, strings, types, layout
+
+
+def _views(buf, handle: SharedFrame) -> tuple:
+    """Read-only numpy views of the code matrix and the string table's offsets and types"""
+    n_codes = sum(column.kind == "codes" for column in handle.columns)
+    codes = np.ndarray((n_codes, handle.rows), dtype=np.int32, buffer=buf, offset=handle.codes_offset)
+    offsets = np.ndarray(handle.n_strings + 1, dtype=np.int64, buffer=buf, offset=handle.strings_offset)
+    types = np.ndarray(handle.n_strings, dtype=np.int8, buffer=buf, offset=handle.strings_offset + offsets.nbytes)
+    for view in (codes, offsets, types):
+        view.flags.writeable = False
+    return codes, offsets, types
+
+
+@contextlib.contextmanager
+def shared_frame(df: pd.DataFrame):
+    """Place a normalized frame (e.g. from ``process_robis``) in one shared memory block.
+
+    Yields the ``SharedFrame`` handle to pass to workers, which call
+    ``attach_frame`` instead of unpickling the frame; the block is unlinked
+    when the ``with`` block ends. The index is not shared: attached frames
+    get a RangeIndex.
+    """
+    arrays, codes, strings, types, layout = encode_frame(df)
+    encoded = [value.encode("utf-8") for value in strings]
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    blob = b"".join(encoded)
+
+    placed, position = [], 0
+    for array in arrays:
+        placed.append(position)
+        position = _aligned(position + array.nbytes)
+    slots = {"array": iter(placed), "codes": iter(range(len(codes)))}
+    columns = tuple(SharedColumn(name, kind, dtype, next(slots[kind])) for name, kind, dtype in layout)
+    strings_offset = _aligned(position + codes.nbytes)
+    blob_offset = strings_offset + offsets.nbytes + types.nbytes
+
+    block = shared_memory.SharedMemory(create=True, size=max(1, blob_offset + len(blob)))
+    try:
+        _write(block.buf, [*zip(arrays, placed), (codes, position), (offsets, strings_offset),
+                           (types, strings_offset + offsets.nbytes), (np.frombuffer(blob, np.uint8), blob_offset)])
+        yield SharedFrame(block.name, len(df), columns, position, len(strings), strings_offset)
+    finally:
+        block.close()
+        block.unlink()
+
+
+def _write(buf, parts: list):
+    """Copy each (array, offset) into the block; the views are gone before it is closed"""
+    block = np.ndarray(len(buf), dtype=np.uint8, buffer=buf)
+    for array, offset in parts:
+        data = np.ascontiguousarray(array).view(np.uint8).ravel()
+        block[offset:offset + len(data)] = data
+
+
+def _open(name: str):
+    try:
+        # Python 3.13+: an attaching process must not unlink the block at exit
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def attach_frame(handle: SharedFrame) -> pd.DataFrame:
+    """Rebuild the frame behind ``handle`` from the shared block without copying its buffers.
+
+    Numeric columns are read-only views of the block; text columns are
+    the shared codes looked up in the string table, which is decoded once
+    per distinct value. The block stays attached for the life of the
+    process.
+    """
+    if handle.name not in _attached:
+        _attached[handle.name] = _open(handle.name)
+    buf = _attached[handle.name].buf
+    codes, offsets, types = _views(buf, handle)
+
+    blob = bytes(buf[handle.strings_offset + offsets.nbytes + types.nbytes:][:int(offsets[-1])])
+    table = np.empty(handle.n_strings + 1, dtype=object)
+    for i, (start, end, kind) in enumerate(zip(offsets[:-1], offsets[1:], types)):
+        table[i] = VALUE_TYPES[kind](blob[start:end].decode("utf-8"))
+    # Missing cells have code -1, which picks this last entry
+    table[-1] = np.nan
+
+    data = {}
+    for column in handle.columns:
+        if column.kind == "array":
+            view = np.ndarray(handle.rows, dtype=column.dtype, buffer=buf, offset=column.offset)
+            view.flags.writeable = False
+            data[column.name] = view
+        else:
+            values = table[codes[column.offset]]
+            data[column.name] = values if column.dtype == object else pd.array(values, dtype=column.dtype)
+    return pd.DataFrame(data, copy=False)
@@ -0,0 +1,126 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+FILTER_KEYS = ("year", "risk", "category")
+SORT_KEYS = ("year", "risk", "label", "category")
+# A four-digit year anywhere in a study label, e.g. "Smith, 2019" or "Study 1 2021"
+YEAR_PATTERN = r"\b(1[89]\d\d|20\d\d)\b"
+
+
+class StudyIndex(NamedTuple):
+    """Per-row arrays a subset is selected and ordered by, computed once per dataset.
+
+    ``years`` is the year parsed from each label (NaN without one), ``risk``
+    the overall judgment as a code into ``severity`` (least to most severe,
+    -1 if unknown) and ``categories`` the study category codes (MMAT only).
+    """
+    labels: np.ndarray
+    years: np.ndarray
+    risk: np.ndarray
+    severity: list
+    categories: pd.Categorical
+
+
+def study_index(labels, overall, severity: list, categories=None) -> StudyIndex:
+    """Build the index from the row labels, overall judgments and (optionally) categories"""
+    labels = pd.Series(np.asarray(labels, dtype=object)).astype(str)
+    years = pd.to_numeric(labels.str.extract(YEAR_PATTERN, expand=False), errors="coerce").to_numpy(dtype=float)
+    risk = pd.Categorical(np.asarray(overall, dtype=object), categories=severity).codes
+    if categories is not None:
+        categories = pd.Categorical(np.asarray(categories, dtype=object))
+    return StudyIndex(labels.to_numpy(dtype=object), years, risk, list(severity), categories)
+
+
+def _values(value) -> list:
+    return [value] if isinstance(value, str) or not hasattr(value, "__iter__") else list(value)
+
+
+def _year_mask(years: np.ndarray, value) -> np.ndarray:
+    if isinstance(value, (tuple, list)):
+        if len(value) != 2:
+            raise ValueError(f"Year filter {value} must be a year or a (first, last) range")
+        first, last = value
+        mask = ~np.isnan(years)
+        if first is not None:
+            mask &= years >= first
+        if last is not None:
+            mask &= years <= last
+        return mask
+    return years == value
+
+
+def filter_mask(index: StudyIndex, filter: dict) -> np.ndarray:
+    """Boolean row mask for ``filter``, e.g. {"year": (2018, None), "risk": "High"}.
+
+    ``year`` is a year or an inclusive (first, last) range with None for an
+    open end; ``risk`` and ``category`` are one value or a list of values.
+    Rows without a parsed year never match a year filter.
+    """
+    unknown = set(filter) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filter keys {sorted(unknown)}. Use {list(FILTER_KEYS)}")
+    mask = np.ones(len(index.labels), dtype=bool)
+    if "year" in filter:
+        mask &= _year_mask(index.years, filter["year"])
+    if "risk" in filter:
+        wanted = _values(filter["risk"])
+        missing = [risk for risk in wanted if risk not in index.severity]
+        if missing:
+            raise ValueError(f"Risk {missing} not available. Choose from {index.severity}")
+        mask &= np.isin(index.risk, [index.severity.index(risk) for risk in wanted])
+    if "category" in filter:
+        if index.categories is None:
+            raise ValueError("Only MMAT studies have a category to filter by")
+        wanted = _values(filter["category"])
+        missing = [category for category in wanted if category not in index.categories.categories]
+        if missing:
+            raise ValueError(f"Category {missing} not available. Choose from {list(index.categories.categories)}")
+        mask &= np.isin(index.categories.codes, index.categories.categories.get_indexer(wanted))
+    return mask
+
+
+def sort_order(index: StudyIndex, sort_by, rows: np.ndarray) -> np.ndarray:
+    """Reorder ``rows`` by one key or a list of keys; "-key" sorts descending.
+
+    Keys are "year", "risk" (by severity), "label" and "category". The sort
+    is stable, so ties keep the input order; rows without a year or a known
+    risk come last.
+    """
+    keys = _values(sort_by)
+    for key in reversed(keys):
+        descending = key.startswith("-")
+        name = key[1:] if descending else key
+        if name not in SORT_KEYS:
+            raise ValueError(f"Cannot sort by {name}. Choose from {list(SORT_KEYS)}")
+        if name == "category" and index.categories is None:
+            raise ValueError("Only MMAT studies have a category to sort by")
+        if name == "year":
+            values = index.years[rows]
+        elif name == "risk":
+            values = np.where(index.risk[rows] < 0, np.nan, index.risk[rows])
+        elif name == "label":
+            values = pd.factorize(index.labels[rows], sort=True)[0]
+        else:
+            values = index.categories.codes[rows]
+        values = np.asarray(values, dtype=float)
+        missing = np.isnan(values)
+        values = np.where(missing, np.inf, -values if descending else values)
+        rows = rows[np.argsort(values, kind="stable")]
+    return rows
+
+
+def select_studies(df: pd.DataFrame, index: StudyIndex, filter: dict = None, sort_by=None) -> pd.DataFrame:
+    """Rows of ``df`` matching ``filter`` in ``sort_by`` order, taken in one ``take``.
+
+    Without ``filter`` and ``sort_by`` ``df`` is returned as it is.
+    """
+    if not filter and not sort_by:
+        return df
+    rows = np.flatnonzero(filter_mask(index, filter)) if filter else np.arange(len(df))
+    if sort_by:
+        rows = sort_order(index, sort_by, rows)
+    if not len(rows):
+        raise ValueError(f"No studies match the filter {filter}")
+    return df.take(rows).reset_index(drop=True)
@@ -0,0 +1,120 @@
+import os
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from . import jbi_case_report_data, jbi_case_series_data, mmat_data, nos_data, robis_data
+
+# Only the matplotlib-free data modules are imported here, so summaries can be
+# computed (e.g. behind a web API) without loading the plotting stack
+
+
+class SummaryTool(NamedTuple):
+    """How to load one input of a tool and count its judgments.
+
+    ``percent`` computes the bars' percentages where they are not simply
+    the counts' row shares (MMAT), as (pages, domains, categories).
+    """
+    read: object
+    process: object
+    judgments: object
+    categories: list
+    page: str
+    percent: object = None
+
+
+def mmat_percent(df: pd.DataFrame) -> np.ndarray:
+    """MMAT bar percentages, from the same ``criterion_distribution`` the plot draws"""
+    return mmat_data.criterion_distribution(df, mmat_data.get_criteria_columns(df))[1]
+
+
+TOOLS = {
+    "nos": SummaryTool(nos_data.read_input_file, nos_data.process_detailed_nos, nos_data.study_judgments,
+                       ["High", "Moderate", "Low"], None),
+    "robis": SummaryTool(robis_data.read_input_file, robis_data.process_robis, robis_data.study_judgments,
+                         ["High", "Unclear", "Low"], None),
+    "jbi_case_report": SummaryTool(jbi_case_report_data.read_input_file,
+                                   jbi_case_report_data.process_jbi_case_report,
+                                   jbi_case_report_data.study_judgments,
+                                   ["High", "Unclear", "Low", "Not Applicable"], None),
+    "jbi_case_series": SummaryTool(jbi_case_series_data.read_input_file,
+                                   jbi_case_series_data.process_jbi_case_series,
+                                   jbi_case_series_data.study_judgments,
+                                   ["High", "Unclear", "Low", "Not Applicable"], None),
+    "mmat": SummaryTool(mmat_data.read_input_file, mmat_data.process_mmat, mmat_data.study_judgments,
+                        ["High", "Moderate", "Low"], "Study_Category", mmat_percent),
+}
+
+
+def judgment_counts(judgments: pd.DataFrame, categories: list, pages=None) -> tuple:
+    """Count every (page, domain, judgment) cell in one ``np.bincount``.
+
+    Returns the sorted page labels and a (pages, domains, categories) array
+    of counts; cells without a judgment are not counted.
+    """
+    n_studies, n_domains = judgments.shape
+    n_categories = len(categories)
+    if pages is None:
+        page_labels, page_codes = [""], np.zeros(n_studies, dtype=np.intp)
+    else:
+        page_codes, page_labels = pd.factorize(np.asarray(pages), sort=True)
+    codes = pd.Categorical(judgments.to_numpy(dtype=object).ravel(), categories=categories).codes
+    cells = (np.repeat(page_codes, n_domains) * n_domains + np.tile(np.arange(n_domains), n_studies)) * n_categories
+    judged = codes >= 0
+    counts = np.bincount(cells[judged] + codes[judged], minlength=len(page_labels) * n_domains * n_categories)
+    return list(page_labels), counts.reshape(len(page_labels), n_domains, n_categories)
+
+
+def judgment_percent(counts: np.ndarray) -> np.ndarray:
+    """Each count as a percentage of its row (last axis) total; rows without judgments are 0"""
+    totals = counts.sum(axis=-1, keepdims=True)
+    return np.divide(counts, totals, out=np.zeros(counts.shape), where=totals > 0) * 100
+
+
+def summarize(tool: str, data) -> pd.DataFrame:
+    """
+    Count and percentage of studies per domain and judgment, as in the summary bars.
+
+    Nothing is drawn and matplotlib is never imported.
+
+    Parameters:
+    -----------
+    tool : str
+        "nos", "robis", "jbi_case_report", "jbi_case_series" or "mmat"
+    data : str or pd.DataFrame
+        Path of an input file, or a table with the tool's input columns
+
+    Returns:
+    --------
+    pd.DataFrame
+        One row per domain and judgment (every combination, zeros included)
+        with "count" and "percent" columns. Percentages are of the studies
+        judged in that domain, as plotted: for MMAT an Overall_Rating of
+        Yes/No/Can't tell counts towards the total but not towards any
+        judgment. MMAT rows also carry their "Study_Category".
+    """
+    if tool not in TOOLS:
+        raise ValueError(f"Tool {tool} cannot be summarized. Choose from {list(TOOLS.keys())}")
+    spec = TOOLS[tool]
+    if isinstance(data, pd.DataFrame):
+        df = spec.process(data.copy())
+    else:
+        if not os.path.exists(data):
+            raise FileNotFoundError(f"Input file not found: {data}")
+        df = spec.process(spec.read(data))
+
+    judgments = spec.judgments(df)
+    pages, counts = judgment_counts(judgments, spec.categories, None if spec.page is None else df[spec.page])
+    percent = judgment_percent(counts) if spec.percent is None else spec.percent(df)
+
+    n_pages, n_domains, n_categories = counts.shape
+    table = pd.DataFrame({
+        "domain": np.tile(np.repeat(np.asarray(judgments.columns, dtype=object), n_categories), n_pages),
+        "judgment": np.tile(np.asarray(spec.categories, dtype=object), n_pages * n_domains),
+        "count": counts.ravel(),
+        "percent": percent.ravel(),
+    })
+    if spec.page is not None:
+        table.insert(0, spec.page, np.repeat(np.asarray(pages, dtype=object), n_domains * n_categories))
+    return table
@@ -0,0 +1,186 @@
+import contextlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import matplotlib
+import matplotlib.text
+from matplotlib.backends.backend_agg import RendererAgg, get_hinting_flag
+from matplotlib.font_manager import FontProperties, fontManager
+from matplotlib.ticker import FixedFormatter
+
+METRICS_CACHE_SIZE = 65536
+ELLIPSIS = "…"
+LABEL_MODES = ["truncate", "wrap"]
+# Vector renderers measure through their own font code (outlines, core
+# fonts, AFM), so their metrics are cached apart from Agg's
+VECTOR_RENDERERS = {"RendererSVG": (), "RendererPdf": ("pdf.use14corefonts",), "RendererPS": ("ps.useafm",)}
+
+
+class LRUCache(OrderedDict):
+    """A bounded mapping that evicts the least recently used entry"""
+
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key, compute):
+        if key in self:
+            self.hits += 1
+            self.move_to_end(key)
+            return self[key]
+        self.misses += 1
+        value = self[key] = compute()
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+        return value
+
+
+# Process-wide: shared by every render and, through save/load, by batch jobs
+METRICS = LRUCache(METRICS_CACHE_SIZE)
+VECTOR_METRICS = LRUCache(METRICS_CACHE_SIZE)
+
+
+def _measure_text(renderer, text, fontprop, ismath, dpi):
+    return renderer.get_text_width_height_descent(text, fontprop, ismath=ismath)
+
+
+# The cache replaces matplotlib's private per-renderer metrics cache and is
+# only installed where that function exists
+METRICS_HOOK = hasattr(matplotlib.text, "_get_text_metrics_with_cache")
+_original_metrics = matplotlib.text._get_text_metrics_with_cache if METRICS_HOOK else _measure_text
+# Open text_cache() blocks across threads; the hook is installed while any is open
+_depth = 0
+_depth_lock = threading.Lock()
+
+
+def font_key(prop: FontProperties) -> tuple:
+    """Font files, size and style that decide a string's extent"""
+    if hasattr(fontManager, "_find_fonts_by_props"):
+        fonts = tuple(fontManager._find_fonts_by_props(prop))
+    else:
+        fonts = (fontManager.findfont(prop),)
+    return (fonts, prop.get_size_in_points(), prop.get_style(), prop.get_weight(), prop.get_stretch(),
+            str(get_hinting_flag()))
+
+
+def _cached_metrics(renderer, text, fontprop, ismath, dpi):
+    def measure():
+        return _original_metrics(renderer, text, fontprop, ismath, dpi)
+
+    if type(renderer) is RendererAgg:
+        return METRICS.lookup((text, font_key(fontprop), str(ismath), dpi), measure)
+    # PDF and EPS saves wrap the vector renderer in a MixedModeRenderer
+    name = type(getattr(renderer, "_vector_renderer", renderer)).__name__
+    if name not in VECTOR_RENDERERS:
+        return measure()
+    settings = tuple(matplotlib.rcParams[key] for key in VECTOR_RENDERERS[name])
+    return VECTOR_METRICS.lookup((name, text, font_key(fontprop), str(ismath), dpi, settings), measure)
+
+
+@contextlib.contextmanager
+def text_cache():
+    """Route text measurement through the process-wide metrics caches.
+
+    Matplotlib keys its own metrics cache on the renderer instance, so
+    every savefig starts cold; these caches are keyed on the string, font
+    and dpi instead. SVG, PDF and EPS metrics are cached per renderer
+    type. Without ``METRICS_HOOK`` text is measured as usual. Re-entrant
+    and thread-safe.
+    """
+    global _depth
+    with _depth_lock:
+        if _depth == 0 and METRICS_HOOK:
+            matplotlib.text._get_text_metrics_with_cache = _cached_metrics
+        _depth += 1
+    try:
+        yield
+    finally:
+        with _depth_lock:
+            _depth -= 1
+            if _depth == 0 and METRICS_HOOK:
+                matplotlib.text._get_text_metrics_with_cache = _original_metrics
+
+
+def load_text_cache(path: str):
+    """Merge text metrics saved by ``save_text_cache`` (e.g. by another batch worker)"""
+    if not os.path.exists(path):
+        return
+    try:
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return
+    for text, fonts, size, style, weight, stretch, hinting, ismath, dpi, metrics in entries:
+        key = (text, (tuple(fonts), size, style, weight, stretch, hinting), ismath, dpi)
+        METRICS.setdefault(key, tuple(metrics))
+
+
+def save_text_cache(path: str):
+    """Write the metrics cache, merged with what is already in ``path``, atomically"""
+    load_text_cache(path)
+    entries = [[text, list(font[0]), *font[1:], ismath, dpi, list(metrics)]
+               for (text, font, ismath, dpi), metrics in METRICS.items()]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entries, f)
+    os.replace(tmp_path, path)
+
+
+def text_width(text: str, prop: FontProperties) -> float:
+    """Width of ``text`` in points, from the metrics cache"""
+    width, _, _ = _cached_metrics(_MEASURE_RENDERER, text, prop, False, 72)
+    return width
+
+
+def fit_label(text: str, max_width: float, prop: FontProperties, mode: str = "truncate") -> str:
+    """Shorten ``text`` to ``max_width`` points by truncating with "…" or wrapping at spaces"""
+    if text_width(text, prop) <= max_width:
+        return text
+
+    if mode == "wrap":
+        lines, line = [], ""
+        for word in text.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if line and text_width(candidate, prop) > max_width:
+                lines.append(line)
+                candidate = word
+            line = candidate
+        return "\n".join(lines + [line])
+
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if text_width(text[:mid].rstrip() + ELLIPSIS, prop) <= max_width:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:low].rstrip() + ELLIPSIS
+
+
+def check_label_options(label_options: dict) -> dict:
+    """Raise ValueError unless ``label_options`` is {"max_width": inches, "mode": "truncate"|"wrap"}"""
+    unknown = set(label_options) - {"max_width", "mode"}
+    if unknown:
+        raise ValueError(f"Unknown label options {sorted(unknown)}. Use ['max_width', 'mode']")
+    options = {"mode": "truncate", **label_options}
+    if not isinstance(options.get("max_width"), (int, float)) or options["max_width"] <= 0:
+        raise ValueError(f"Label max_width must be a positive number of inches, got {options.get('max_width')!r}")
+    if options["mode"] not in LABEL_MODES:
+        raise ValueError(f"Label mode {options['mode']} not available. Choose from {LABEL_MODES}")
+    return options
+
+
+def fit_tick_labels(ax, max_width: float, mode: str = "truncate"):
+    """Fit an axes' y tick labels to ``max_width`` inches, keeping their font settings"""
+    labels = ax.get_yticklabels()
+    if labels:
+        ax.yaxis.set_major_formatter(FixedFormatter([
+            fit_label(label.get_text(), max_width * 72, label.get_fontproperties(), mode) for label in labels
+        ]))
+
+
+_MEASURE_RENDERER = RendererAgg(1, 1, 72)
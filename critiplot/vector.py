@@ -0,0 +1,26 @@
+DEFAULT_VECTOR_OPTIONS = {"text": "path"}
+# rcParams per text mode. "path" draws glyph outlines; every glyph is
+# defined once (SVG <defs>, PDF Type 3 font) and referenced per character.
+# "font" keeps text as text: one SVG <text> element per label and embedded
+# TrueType fonts in PDF/EPS, so files are smaller and text is searchable.
+VECTOR_TEXT_MODES = {
+    "path": {},
+    "font": {"svg.fonttype": "none", "pdf.fonttype": 42, "ps.fonttype": 42},
+}
+
+
+def check_vector_options(vector_options: dict) -> dict:
+    """Fill in defaults and raise ValueError on unknown SVG/PDF/EPS options"""
+    vector_options = vector_options or {}
+    unknown = set(vector_options) - set(DEFAULT_VECTOR_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown vector options {sorted(unknown)}. Use {list(DEFAULT_VECTOR_OPTIONS)}")
+    options = {**DEFAULT_VECTOR_OPTIONS, **vector_options}
+    if options["text"] not in VECTOR_TEXT_MODES:
+        raise ValueError(f"Vector text mode {options['text']} not available. Choose from {list(VECTOR_TEXT_MODES)}")
+    return options
+
+
+def vector_rc(vector_options: dict) -> dict:
+    """rcParams to save SVG, PDF and EPS files with"""
+    return VECTOR_TEXT_MODES[check_vector_options(vector_options)["text"]]
@@ -11,13 +11,15 @@ setup(
 
     install_requires=[
         "numpy>=2.0",
-        "pandas>=2.0",
         "matplotlib>=3.5",
-        "seaborn>=0.12",
-        "pyarrow>=10.0",
-        "openpyxl>=3.0"
-
     ],
+    extras_require={
+        # Parsing input files (CSV, Excel, Parquet, Feather) and the CLI
+        "pandas": ["pandas>=2.0", "pyarrow>=10.0", "openpyxl>=3.0"],
+    },
+    entry_points={
+        "console_scripts": ["critiplot=critiplot.cli:main"],
+    },
     author="Vihaan Sahu",
     author_email="pteroisvolitans12@gmail.com",
     description="Visualize risk-of-bias in systematic reviews and meta-analyses",
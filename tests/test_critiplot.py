@@ -88,4 +88,676 @@ def test_plot_mmat():
     pattern = output_file.replace(".png", "_*.png")
     generated_files = glob.glob(pattern)
     
-    assert len(generated_files) > 0, f"No MMAT plots were generated. Expected files matching: {pattern}"
\ No newline at end of file
+    assert len(generated_files) > 0, f"No MMAT plots were generated. Expected files matching: {pattern}"
+
+def test_read_input_file_sniffs_csv_variants(tmp_path):
+    """Test that semicolon-separated latin1 CSVs with underscore headers parse in one pass."""
+    from critiplot import grade
+    from critiplot.reader import sniff_csv
+
+    input_file = os.path.join(DATA_DIR, "sample_grade.csv")
+    variant = tmp_path / "grade_variant.csv"
+    with open(input_file, encoding="utf-8") as f:
+        text = f.read().replace(",", ";").replace("Mortality", "Mortalité")
+    variant.write_bytes(text.encode("latin1"))
+
+    fmt = sniff_csv(str(variant))
+    assert fmt.encoding == "latin1"
+    assert fmt.delimiter == ";"
+
+    df = grade.read_input_file(str(variant))
+    assert "Risk of Bias" in df.columns
+    assert df["Outcome"].iloc[0] == "Mortalité"
+
+
+def test_parquet_input_and_sidecar_cache(tmp_path):
+    """Test Parquet input and reuse of the normalized-data Feather sidecar."""
+    import shutil
+    from critiplot import nos
+    from critiplot.cache import cache_path, load_processed
+
+    input_file = os.path.join(DATA_DIR, "sample_nos.csv")
+    parquet_file = tmp_path / "nos.parquet"
+    nos.read_input_file(input_file).to_parquet(parquet_file)
+    assert nos.read_input_file(str(parquet_file)).shape == nos.read_input_file(input_file).shape
+
+    csv_file = str(tmp_path / "nos.csv")
+    shutil.copy(input_file, csv_file)
+    plot_nos(csv_file, str(tmp_path / "nos.png"), cache=True)
+    assert os.path.exists(cache_path(csv_file, "nos"))
+
+    cached = load_processed(csv_file, "nos")
+    assert cached is not None
+    assert cached["Selection"].tolist() == nos.process_detailed_nos(nos.read_input_file(csv_file))["Selection"].tolist()
+
+
+def test_plot_nos_fan_out(tmp_path):
+    """Test that one call renders several theme/format variants."""
+    input_file = os.path.join(DATA_DIR, "sample_nos.csv")
+    outputs = {
+        str(tmp_path / "nos_default.png"): "default",
+        str(tmp_path / "nos_blue.pdf"): "blue",
+        str(tmp_path / "nos_smiley.png"): "smiley",
+    }
+
+    plot_nos(input_file, outputs=outputs)
+    for path in outputs:
+        assert os.path.exists(path), f"{path} was not generated"
+
+    with pytest.raises(ValueError):
+        plot_nos(input_file, outputs={str(tmp_path / "bad.png"): "no-such-theme"})
+
+    # Each family keeps its own grid limits, whatever order the variants come in
+    import numpy as np
+    from PIL import Image
+    report_file = os.path.join(DATA_DIR, "sample_jbi_case_report.csv")
+    order = ["smiley", "default", "smiley_blue"]
+    plot_jbi_case_report(report_file, outputs={str(tmp_path / f"fan_{theme}.png"): theme for theme in order})
+    for theme in order:
+        plot_jbi_case_report(report_file, str(tmp_path / f"single_{theme}.png"), theme=theme)
+        assert np.array_equal(np.asarray(Image.open(tmp_path / f"fan_{theme}.png")),
+                              np.asarray(Image.open(tmp_path / f"single_{theme}.png")))
+
+
+def test_plot_mmat_incremental(tmp_path):
+    """Test that incremental mode re-renders only the categories whose studies changed."""
+    import pandas as pd
+
+    input_file = str(tmp_path / "mmat.csv")
+    df = pd.read_csv(os.path.join(DATA_DIR, "sample_mmat.csv"))
+    df.to_csv(input_file, index=False)
+    output_file = str(tmp_path / "mmat.png")
+
+    plot_mmat(input_file, output_file, incremental=True)
+    assert os.path.exists(output_file + ".state.json")
+    outputs = sorted(glob.glob(str(tmp_path / "mmat_*.png")))
+    mtimes = {path: os.stat(path).st_mtime_ns for path in outputs}
+
+    plot_mmat(input_file, output_file, incremental=True)
+    assert {path: os.stat(path).st_mtime_ns for path in outputs} == mtimes
+
+    category = df["Study_Category"].iloc[0]
+    criterion = df.columns[3]
+    df.loc[0, criterion] = "No" if df.loc[0, criterion] != "No" else "Yes"
+    df.to_csv(input_file, index=False)
+    plot_mmat(input_file, output_file, incremental=True)
+    for path in outputs:
+        changed = os.stat(path).st_mtime_ns != mtimes[path]
+        assert changed == path.endswith(f"_{category}.png")
+
+
+def test_plot_nos_max_memory(tmp_path):
+    """Test that a small max_memory budget tiles the PNG without changing its size."""
+    from PIL import Image
+    from critiplot.memory import parse_memory, process_rss
+
+    input_file = os.path.join(DATA_DIR, "sample_nos.csv")
+    full_file = str(tmp_path / "full.png")
+    tiled_file = str(tmp_path / "tiled.png")
+    plot_nos(input_file, full_file)
+    budget = process_rss() + parse_memory("100MB")
+    plot_nos(input_file, tiled_file, max_memory=budget)
+
+    with Image.open(full_file) as full, Image.open(tiled_file) as tiled:
+        assert tiled.size == full.size
+        assert tiled.mode == "RGBA"
+
+    assert parse_memory("512MB") == 512 * 2 ** 20
+    plot_nos(input_file, str(tmp_path / "vector.pdf"), max_memory=budget)
+    with pytest.raises(MemoryError):
+        plot_nos(input_file, str(tmp_path / "tiny.png"), max_memory="1MB")
+
+
+
+def test_plot_return_array(tmp_path):
+    """Test that return_array hands back the rendered RGBA pixels and axes layout."""
+    import numpy as np
+    from PIL import Image
+
+    input_file = os.path.join(DATA_DIR, "sample_nos.csv")
+    output_file = str(tmp_path / "nos.png")
+    result = plot_nos(input_file, output_file, return_array=True)
+
+    height, width = result.array.shape[:2]
+    assert result.array.shape == (result.layout["height"], result.layout["width"], 4)
+    assert result.array.dtype == np.uint8
+    with Image.open(output_file) as saved:
+        assert saved.size == (width, height)
+    for ax in result.layout["axes"]:
+        left, top, right, bottom = ax["bbox"]
+        assert 0 <= left < right <= width and 0 <= top < bottom <= height
+
+    arrays = plot_mmat(os.path.join(DATA_DIR, "sample_mmat.csv"), return_array=True)
+    assert arrays and all(a.array.ndim == 3 for a in arrays.values())
+
+
+
+def test_plot_png_options(tmp_path):
+    """Test palette, compression level and parallel PNG encoding."""
+    from PIL import Image
+
+    input_file = os.path.join(DATA_DIR, "sample_nos.csv")
+    default_file = str(tmp_path / "default.png")
+    palette_file = str(tmp_path / "palette.png")
+    parallel_file = str(tmp_path / "parallel.png")
+    plot_nos(input_file, default_file)
+    plot_nos(input_file, palette_file, png_options={"palette": True, "compression": 9})
+    plot_nos(input_file, parallel_file, png_options={"encoder": "parallel", "workers": 2, "compression": 1})
+
+    with Image.open(default_file) as default, Image.open(palette_file) as palette, \
+            Image.open(parallel_file) as parallel:
+        assert palette.mode == "P"
+        assert palette.size == parallel.size == default.size
+        parallel.load()
+    assert os.path.getsize(palette_file) < os.path.getsize(default_file)
+
+    # Quantizing the anti-aliased edges keeps the background and risk colors exact
+    import numpy as np
+    from matplotlib.colors import to_rgba
+    from critiplot.nos import THEME_OPTIONS
+    drawn = np.asarray(Image.open(default_file).convert("RGBA"))
+    indexed = np.asarray(Image.open(palette_file).convert("RGBA"))
+    for color in ["white", *THEME_OPTIONS["default"].values()]:
+        rgba = np.array([round(c * 255) for c in to_rgba(color)], np.uint8)
+        exact = (drawn == rgba).all(axis=2)
+        assert exact.any() and (indexed[exact] == rgba).all()
+
+    with pytest.raises(ValueError):
+        plot_nos(input_file, str(tmp_path / "bad.png"), png_options={"compression": 12})
+
+
+
+def test_schema_reports_every_error(tmp_path):
+    """Test that schema validation lists all problems at once and resolves aliases."""
+    from critiplot.schema import SchemaError, get_schema
+    import pandas as pd
+
+    bad_file = tmp_path / "bad_nos.csv"
+    bad_file.write_text(
+        '"Author, Year",Representativeness,Non-exposed Selection,Exposure Ascertainment,Outcome Absent at Start,'
+        'Comparability (Age/Gender),Comparability (Other),Outcome Assessment,Follow-up Length,Follow-up Adequacy,'
+        'Overall RoB\nA,1,7,1,1,1,1,1,x,-1,Low\n'
+    )
+    with pytest.raises(SchemaError) as excinfo:
+        plot_nos(str(bad_file), str(tmp_path / "bad.png"))
+    assert len(excinfo.value.errors) == 4
+
+    robis = get_schema("robis").validate(pd.DataFrame(columns=[
+        "Review", "Study Eligibility Criteria", "Identification & Selection", "Data Collection",
+        "Synthesis & Findings", "Overall RoB",
+    ]))
+    assert list(robis.columns)[-1] == "Overall Risk"
+
+
+
+def test_nos_rules_override(tmp_path):
+    """Test that NOS risk columns come from the rule table and honor overrides."""
+    from critiplot import nos
+
+    df = nos.process_detailed_nos(nos.read_input_file(os.path.join(DATA_DIR, "sample_nos.csv")))
+    for domain, column in nos.RISK_COLUMNS.items():
+        assert df[column].tolist() == [nos.stars_to_rob(stars, domain) for stars in df[domain]]
+
+    lenient = nos.assign_risks(df.copy(), {"Comparability": {"Low": (1, None)}})
+    assert set(lenient.loc[df["Comparability"] >= 1, "Comparability Risk"]) == {"Low"}
+    assert lenient["Selection Risk"].tolist() == df["Selection Risk"].tolist()
+
+    overlapping = {"Comparability": {"Moderate": (1, 2), "Low": (2, 2)}}
+    ranked = nos.assign_risks(df.copy(), overlapping)
+    assert ranked["Comparability Risk"].tolist() == [
+        nos.stars_to_rob(stars, "Comparability", overlapping) for stars in df["Comparability"]]
+    assert nos.stars_to_rob(2, "Comparability", overlapping) == "Low"
+
+    plot_nos(os.path.join(DATA_DIR, "sample_nos.csv"), str(tmp_path / "lenient.png"),
+             rules={"Comparability": {"Low": (1, None)}})
+    with pytest.raises(ValueError):
+        nos.resolve_rules({"Comparability": {"Excellent": (2, 2)}})
+
+
+
+def test_layout_engine_matches_tight_bbox(tmp_path):
+    """Test memoized layouts and that the measured bbox matches a tight savefig."""
+    from critiplot import nos
+    from critiplot.layout import figure_layout, grade_layout
+
+    assert figure_layout("nos", 6) is figure_layout("nos", 6)
+    assert figure_layout("nos", 40).figsize[1] > figure_layout("nos", 6).figsize[1]
+    assert [grade_layout(n).figsize[1] - 5.8 for n in (5, 6)] == pytest.approx([1.5, 6 * 0.49])
+
+    df = nos.process_detailed_nos(nos.read_input_file(os.path.join(DATA_DIR, "sample_nos.csv")))
+    themed = nos.build_nos_figure(df)
+    tight_file = str(tmp_path / "tight.png")
+    themed.fig.savefig(tight_file, dpi=300, bbox_inches="tight")
+    measured_file = str(tmp_path / "measured.png")
+    themed.save(measured_file)
+    themed.close()
+    with open(tight_file, "rb") as tight, open(measured_file, "rb") as measured:
+        assert tight.read() == measured.read()
+
+
+def test_cli_render_skips_up_to_date_outputs(tmp_path, capsys):
+    """Test the critiplot CLI batch mode and its make-style skipping."""
+    import shutil
+    from critiplot.cli import main
+
+    inputs = []
+    for name in ["a.csv", "b.csv"]:
+        path = tmp_path / name
+        shutil.copy(os.path.join(DATA_DIR, "sample_robis.csv"), path)
+        inputs.append(str(path))
+    template = str(tmp_path / "out" / "{stem}_{theme}.png")
+
+    assert main(["render", "--tool", "robis", "--theme", "blue", *inputs, "-o", template]) == 0
+    assert os.path.exists(tmp_path / "out" / "a_blue.png")
+    assert os.path.exists(tmp_path / "out" / "b_blue.png")
+
+    assert main(["render", "--tool", "robis", "--theme", "blue", *inputs, "-o", template]) == 0
+    assert "Rendered 0 file(s), skipped 2 up to date" in capsys.readouterr().out
+
+    # a_b.csv's MMAT outputs (out/a_b_<category>.png) are not a.csv's (out/a_<category>.png)
+    from critiplot.cli import is_up_to_date
+    mmat_inputs = [str(tmp_path / "a.csv"), str(tmp_path / "a_b.csv")]
+    shutil.copy(os.path.join(DATA_DIR, "sample_mmat.csv"), mmat_inputs[1])
+    assert main(["render", "--tool", "mmat", mmat_inputs[1], "-o", str(tmp_path / "mmat" / "{stem}.png")]) == 0
+    assert is_up_to_date("mmat", mmat_inputs[1], str(tmp_path / "mmat" / "a_b.png"))
+    assert not is_up_to_date("mmat", mmat_inputs[0], str(tmp_path / "mmat" / "a.png"))
+
+
+def test_plot_aggregate(tmp_path):
+    """Test the cross-review aggregate figure and its per-review percentages."""
+    import shutil
+    from critiplot import plot_aggregate
+
+    inputs = []
+    for name in ["review_a.csv", "review_b.csv"]:
+        path = tmp_path / name
+        shutil.copy(os.path.join(DATA_DIR, "sample_robis.csv"), path)
+        inputs.append(str(path))
+    output_file = str(tmp_path / "aggregate.png")
+
+    percentages = plot_aggregate(inputs, output_file, tool="robis")
+    assert os.path.exists(output_file)
+    assert set(percentages.index.get_level_values("review")) == {"review_a", "review_b"}
+    assert percentages.sum(axis=1).round(6).eq(100).all()
+
+    with pytest.raises(ValueError):
+        plot_aggregate(inputs, output_file, tool="grade")
+
+    # MMAT Overall_Rating of Yes/No count towards the total as in summarize() and the plotted bars
+    import pandas as pd
+    mmat_df = pd.read_csv(os.path.join(DATA_DIR, "sample_mmat.csv"))
+    randomized = mmat_df[mmat_df["Study_Category"] == "Randomized"].copy()
+    randomized["Overall_Rating"] = ["Yes", "No", "High", "Low", "Low"]
+    randomized.to_csv(tmp_path / "randomized.csv", index=False)
+    percentages = plot_aggregate([str(tmp_path / "randomized.csv")], str(tmp_path / "mmat.png"), tool="mmat")
+    summary = critiplot.summarize("mmat", randomized).set_index(["domain", "judgment"])["percent"]
+    assert percentages.xs("randomized").stack().to_dict() == summary.to_dict()
+    assert percentages.loc[("randomized", "Overall Rating")].tolist() == [20.0, 0.0, 40.0]
+
+
+def test_text_metrics_cache_and_label_fitting(tmp_path):
+    """Test the shared text cache (identical pixels, hits on re-render) and label fitting."""
+    import numpy as np
+    from matplotlib.font_manager import FontProperties
+    import threading
+    import matplotlib.text
+    from critiplot import text_metrics
+    from critiplot.text_metrics import METRICS, fit_label, load_text_cache, save_text_cache, text_cache, text_width
+
+    input_file = os.path.join(DATA_DIR, "sample_robis.csv")
+    first = plot_robis(input_file, return_array=True)
+    hits = METRICS.hits
+    second = plot_robis(input_file, return_array=True)
+    assert METRICS.hits > hits
+    assert np.array_equal(first.array, second.array)
+
+    def enter_and_leave():
+        for _ in range(200):
+            with text_cache():
+                pass
+
+    threads = [threading.Thread(target=enter_and_leave) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert text_metrics._depth == 0
+    if text_metrics.METRICS_HOOK:
+        assert matplotlib.text._get_text_metrics_with_cache is text_metrics._original_metrics
+
+    prop = FontProperties(size=19, weight="bold")
+    label = "Longauthorname and colleagues, 2021"
+    truncated = fit_label(label, 150, prop)
+    assert truncated.endswith("…") and text_width(truncated, prop) <= 150
+    wrapped = fit_label(label, 250, prop, mode="wrap")
+    assert "\n" in wrapped and wrapped.replace("\n", " ") == label
+
+    cache_file = str(tmp_path / "text_cache.json")
+    save_text_cache(cache_file)
+    size = len(METRICS)
+    METRICS.clear()
+    load_text_cache(cache_file)
+    assert len(METRICS) == size
+
+    fitted = plot_robis(input_file, return_array=True, label_options={"max_width": 0.5})
+    assert fitted.array.shape == first.array.shape and not np.array_equal(fitted.array, first.array)
+    with pytest.raises(ValueError):
+        plot_robis(input_file, return_array=True, label_options={"max_width": 1, "mode": "shrink"})
+
+
+def test_plot_diff(tmp_path):
+    """Test the changed-judgments plot between two assessment rounds."""
+    from critiplot import plot_diff
+
+    old_file = os.path.join(DATA_DIR, "sample_robis.csv")
+    with open(old_file, encoding="utf-8") as f:
+        text = f.read()
+    new_file = tmp_path / "round2.csv"
+    new_file.write_text(text.replace("Study 2 2020,Low,Low,Low,Low,Low", "Study 2 2020,Low,High,Low,Low,High")
+                            .replace("Study 4 2016", "Study 5 2022"), encoding="utf-8")
+    output_file = str(tmp_path / "diff.png")
+
+    changes = plot_diff(old_file, str(new_file), output_file, tool="robis")
+    assert os.path.exists(output_file)
+    changed = changes[changes["status"] == "changed"]
+    assert set(changed["study"]) == {"Study 2 2020"}
+    assert list(changed["new"]) == ["High", "High"] and list(changed["old"]) == ["Low", "Low"]
+    assert set(changes.loc[changes["status"] == "added", "study"]) == {"Study 5 2022"}
+    assert set(changes.loc[changes["status"] == "removed", "study"]) == {"Study 4 2016"}
+
+    assert plot_diff(old_file, old_file, tool="robis").empty
+
+
+def test_render_core_without_pandas():
+    """Test that critiplot and the Agg render path import and draw without pandas or pyplot."""
+    import subprocess
+
+    code = "\n".join([
+        "import sys",
+        "sys.modules['pandas'] = None",
+        "import critiplot",
+        "from critiplot.render import ThemedFigure, new_figure",
+        "fig = new_figure(figsize=(2, 1))",
+        "fig.add_axes([0.1, 0.1, 0.8, 0.8]).text(0.1, 0.5, 'ok')",
+        "themed = ThemedFigure(fig, {'default': {}}, lambda family, colors: [])",
+        "themed.set_theme('default')",
+        "assert themed.to_array().array.shape[2] == 4",
+        "assert 'matplotlib.pyplot' not in sys.modules and 'seaborn' not in sys.modules",
+        "try:",
+        "    critiplot.plot_nos",
+        "except ImportError as e:",
+        "    assert 'critiplot[pandas]' in str(e)",
+        "else:",
+        "    raise AssertionError('plot_nos loaded without pandas')",
+    ])
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+def test_png_grid_painted_with_numpy(tmp_path):
+    """Test that the NumPy-painted study grid matches matplotlib's within a few pixels."""
+    import numpy as np
+    from PIL import Image
+
+    input_file = os.path.join(DATA_DIR, "sample_nos.csv")
+    for theme in ["default", "smiley"]:
+        drawn, painted = str(tmp_path / f"{theme}_mpl.png"), str(tmp_path / f"{theme}_numpy.png")
+        plot_nos(input_file, drawn, theme=theme, png_options={"grid": "matplotlib"})
+        plot_nos(input_file, painted, theme=theme, png_options={"grid": "numpy"})
+        a = np.asarray(Image.open(drawn).convert("RGBA"), dtype=np.int16)
+        b = np.asarray(Image.open(painted).convert("RGBA"), dtype=np.int16)
+        assert a.shape == b.shape
+        assert (np.abs(a - b).max(axis=2) > 32).mean() < 0.01
+
+    with pytest.raises(ValueError):
+        plot_nos(input_file, str(tmp_path / "bad.png"), png_options={"grid": "opencv"})
+
+
+def test_compact_vector_output(tmp_path):
+    """Test row gridlines as one collection, cached vector text metrics and font-backed SVG text."""
+    from critiplot.text_metrics import VECTOR_METRICS
+
+    input_file = os.path.join(DATA_DIR, "sample_robis.csv")
+    outlined, fonts = str(tmp_path / "outlined.svg"), str(tmp_path / "fonts.svg")
+    plot_robis(input_file, outlined)
+    hits = VECTOR_METRICS.hits
+    plot_robis(input_file, fonts, vector_options={"text": "font"})
+    assert VECTOR_METRICS.hits > hits
+
+    with open(outlined, encoding="utf-8") as f:
+        outlined_svg = f.read()
+    with open(fonts, encoding="utf-8") as f:
+        fonts_svg = f.read()
+    assert outlined_svg.count('<g id="LineCollection_') == 2
+    assert "<text" not in outlined_svg and "<text" in fonts_svg
+    assert len(fonts_svg) < len(outlined_svg)
+
+    with pytest.raises(ValueError):
+        plot_robis(input_file, fonts, vector_options={"text": "bitmap"})
+
+
+def test_deterministic_save_skips_unchanged_outputs(tmp_path, capsys):
+    """Test byte-reproducible saves that keep unchanged outputs and replace changed ones."""
+    input_file = os.path.join(DATA_DIR, "sample_robis.csv")
+    for ext in ["png", "pdf", "svg"]:
+        output_file = str(tmp_path / f"robis.{ext}")
+        plot_robis(input_file, output_file, deterministic=True)
+        with open(output_file, "rb") as f:
+            first = f.read()
+        inode, mtime = os.stat(output_file).st_ino, os.stat(output_file).st_mtime_ns
+        capsys.readouterr()
+
+        plot_robis(input_file, output_file, deterministic=True)
+        assert "unchanged" in capsys.readouterr().out
+        assert os.stat(output_file).st_ino == inode and os.stat(output_file).st_mtime_ns == mtime
+        with open(output_file, "rb") as f:
+            assert f.read() == first
+        assert b"Matplotlib v" not in first and not os.path.exists(f"{output_file}.tmp")
+
+        plot_robis(input_file, output_file, theme="blue", deterministic=True)
+        assert "saved" in capsys.readouterr().out
+        with open(output_file, "rb") as f:
+            assert f.read() != first
+
+    # Formats without fixed metadata (GRADE also writes e.g. JPEG) are saved as they are
+    jpeg_file = str(tmp_path / "grade.jpg")
+    plot_grade(os.path.join(DATA_DIR, "sample_grade.csv"), jpeg_file, deterministic=True)
+    assert os.path.exists(jpeg_file) and not os.path.exists(f"{jpeg_file}.tmp")
+
+
+def test_summarize_without_matplotlib():
+    """Test the compute-only summary: counts and percentages per domain, no matplotlib import."""
+    import subprocess
+
+    code = "\n".join([
+        "import sys, os",
+        "import critiplot",
+        f"data_dir = {DATA_DIR!r}",
+        "summary = critiplot.summarize('robis', os.path.join(data_dir, 'sample_robis.csv'))",
+        "assert list(summary.columns) == ['domain', 'judgment', 'count', 'percent']",
+        "assert (summary.groupby('domain').percent.sum().round(9) == 100).all()",
+        "assert 'matplotlib' not in sys.modules",
+    ])
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+    import pandas as pd
+    input_file = os.path.join(DATA_DIR, "sample_mmat.csv")
+    summary = critiplot.summarize("mmat", pd.read_csv(input_file))
+    assert summary.equals(critiplot.summarize("mmat", input_file))
+    overall = summary[summary["domain"] == "Overall Rating"]
+    assert overall.groupby("Study_Category")["count"].sum().to_dict() == \
+        pd.read_csv(input_file)["Study_Category"].value_counts().to_dict()
+
+    # A Yes/No/Can't tell Overall_Rating is counted in the plotted bar's total but under no judgment
+    from critiplot.mmat_data import criterion_distribution, get_criteria_columns, process_mmat
+    mixed = pd.read_csv(input_file)
+    mixed.loc[mixed.index[:2], "Overall_Rating"] = ["Yes", "Can't tell"]
+    summary = critiplot.summarize("mmat", mixed)
+    processed = process_mmat(mixed.copy())
+    _, distribution = criterion_distribution(processed, get_criteria_columns(processed))
+    assert summary["percent"].tolist() == distribution.ravel().tolist()
+    overall = summary[summary["domain"] == "Overall Rating"].groupby("Study_Category")["percent"].sum()
+    assert overall[mixed["Study_Category"].iloc[0]] < 100
+
+    with pytest.raises(ValueError):
+        critiplot.summarize("grade", input_file)
+
+
+def test_jbi_summary_bars_match_summarize():
+    """Test that the vectorized JBI summary bars stack the percentages summarize() reports."""
+    from critiplot.jbi_case_series import build_jbi_series_figure, process_jbi_case_series, read_input_file
+
+    input_file = os.path.join(DATA_DIR, "sample_jbi_case_series.csv")
+    themed = build_jbi_series_figure(process_jbi_case_series(read_input_file(input_file)))
+    bars = themed.fig.axes[1].patches
+    summary = critiplot.summarize("jbi_case_series", input_file)
+    expected = summary.set_index(["judgment", "domain"])["percent"]
+    domains = list(summary["domain"].unique())[::-1]
+
+    assert [bar.get_width() for bar in bars] == [
+        expected[(cat, domain)] for cat in ["High", "Unclear", "Low", "Not Applicable"] for domain in domains
+    ]
+    themed.close()
+
+
+def test_mmat_criterion_distribution_in_one_pass():
+    """Test that the one-pass MMAT distribution matches per-category value_counts."""
+    from critiplot.mmat import criterion_distribution, get_criteria_columns, process_mmat, read_input_file
+
+    df = process_mmat(read_input_file(os.path.join(DATA_DIR, "sample_mmat.csv")))
+    criteria_columns = get_criteria_columns(df)
+    categories, distribution = criterion_distribution(df, criteria_columns)
+    assert categories == sorted(df["Study_Category"].unique())
+    assert distribution.shape == (len(categories), len(criteria_columns) + 1, 3)
+
+    for category, expected in zip(categories, distribution):
+        category_df = df[df["Study_Category"] == category]
+        for criterion, row in zip(criteria_columns, expected):
+            shares = category_df[criterion].value_counts(normalize=True)
+            assert list(row) == [shares.get(rating, 0) * 100 for rating in ["No", "Can't tell", "Yes"]]
+        shares = category_df["Overall_Rating"].value_counts(normalize=True)
+        assert list(expected[-1]) == [shares.get(rating, 0) * 100 for rating in ["High", "Moderate", "Low"]]
+
+
+def test_collapse_identical_judgment_patterns(tmp_path):
+    """Test the collapsed view: one row per distinct pattern, bars still over every study."""
+    import pandas as pd
+    from critiplot.collapse import collapse_patterns
+    from critiplot.robis import process_robis, read_input_file, study_judgments
+
+    df = process_robis(read_input_file(os.path.join(DATA_DIR, "sample_robis.csv")))
+    big = pd.concat([df] * 50 + [df.iloc[:1]] * 7, ignore_index=True)
+    judgments = study_judgments(big)
+    n_patterns = len(judgments.drop_duplicates())
+
+    collapsed = collapse_patterns(big, judgments, "Review", "frequency")
+    assert len(collapsed) == n_patterns
+    counts = [int(label.rsplit("(n=", 1)[1].rstrip(")")) for label in collapsed["Review"]]
+    assert sum(counts) == len(big) and counts == sorted(counts)
+    assert collapsed["Review"].iloc[-1].startswith(str(df["Review"].iloc[0]))
+
+    severe = study_judgments(collapse_patterns(big, judgments, "Review", "severity"))
+    highs = (severe == "High").sum(axis=1).tolist()
+    assert highs == sorted(highs)
+
+    input_file = str(tmp_path / "big_robis.csv")
+    big.to_csv(input_file, index=False)
+    array = plot_robis(input_file, return_array=True, collapse="frequency")
+    assert array is not None
+    with pytest.raises(ValueError):
+        plot_robis(input_file, str(tmp_path / "out.png"), collapse="alphabetical")
+
+
+def test_filter_and_sort_studies():
+    """Test indexed filtering and sorting: year ranges, risk and MMAT category, stable multi-key sorts."""
+    import numpy as np
+    import pandas as pd
+    from critiplot.subset import select_studies, study_index
+
+    df = pd.DataFrame({"Label": ["A, 2016", "B, 2021", "C, 2019", "D (no year)", "E, 2021"],
+                       "Overall": ["Low", "High", "High", "Moderate", "Low"],
+                       "Category": ["Randomized", "Qualitative", "Randomized", "Randomized", "Qualitative"]})
+    index = study_index(df["Label"], df["Overall"], ["Low", "Moderate", "High"], df["Category"])
+    assert np.isnan(index.years[3]) and index.years[1] == 2021
+
+    labels = lambda subset: subset["Label"].str[0].tolist()
+    assert labels(select_studies(df, index, {"year": (2018, None)})) == ["B", "C", "E"]
+    assert labels(select_studies(df, index, {"year": 2021, "risk": "High"})) == ["B"]
+    assert labels(select_studies(df, index, {"category": "Randomized"}, sort_by="-risk")) == ["C", "D", "A"]
+    assert labels(select_studies(df, index, sort_by=["-year", "risk"])) == ["E", "B", "C", "A", "D"]
+    assert select_studies(df, index) is df
+
+    for bad in [{"risk": "Severe"}, {"stars": 3}, {"category": "Cohort"}]:
+        with pytest.raises(ValueError):
+            select_studies(df, index, bad)
+    with pytest.raises(ValueError):
+        select_studies(df, index, {"year": 1990})
+
+    array = plot_mmat(os.path.join(DATA_DIR, "sample_mmat.csv"), return_array=True,
+                      filter={"category": ["Randomized", "Qualitative"]}, sort_by="-risk")
+    assert set(array) == {"Randomized", "Qualitative"}
+
+
+def test_banded_png_rendered_in_processes(tmp_path):
+    """Test that bands drawn in worker processes stitch into the same PNG as a tiled save."""
+    import zlib
+    import numpy as np
+    from PIL import Image
+    from critiplot.bands import adler32_combine, band_rows
+    from critiplot.memory import save_tiled_png
+    from critiplot.robis import build_robis_figure, process_robis, read_input_file
+
+    first, second = b"critiplot" * 1000, bytes(range(256)) * 300
+    assert adler32_combine(zlib.adler32(first), zlib.adler32(second), len(second)) == zlib.adler32(first + second)
+
+    input_file = os.path.join(DATA_DIR, "sample_robis.csv")
+    full_file, banded_file, tiled_file = (str(tmp_path / name) for name in ["full.png", "banded.png", "tiled.png"])
+    plot_robis(input_file, full_file)
+    plot_robis(input_file, banded_file, png_options={"processes": 3})
+    with Image.open(full_file) as full, Image.open(banded_file) as banded:
+        assert banded.size == full.size
+        width, height = banded.size
+        banded = np.asarray(banded)
+
+    themed = build_robis_figure(process_robis(read_input_file(input_file)), "default")
+    save_tiled_png(themed.fig, tiled_file, band_rows=band_rows(width, height, 3), **themed.save_options)
+    assert np.array_equal(np.asarray(Image.open(tiled_file)), banded)
+
+    with pytest.raises(ValueError):
+        plot_robis(input_file, str(tmp_path / "bad.png"), png_options={"processes": 0})
+
+
+def _attached_total(handle):
+    from critiplot.shared import attach_frame
+    df = attach_frame(handle)
+    return int(df["Total Score"].sum()), df["Overall RoB"].tolist()
+
+
+def test_shared_frame_round_trip(tmp_path):
+    """Test that normalized frames round-trip through shared memory and attach in a worker process."""
+    import pickle
+    import pandas as pd
+    from concurrent.futures import ProcessPoolExecutor
+    from critiplot import grade, jbi_case_report_data, nos_data
+    from critiplot.bands import fork_context
+    from critiplot.shared import attach_frame, shared_frame
+
+    frames = [
+        nos_data.process_detailed_nos(nos_data.read_input_file(os.path.join(DATA_DIR, "sample_nos.csv"))),
+        jbi_case_report_data.process_jbi_case_report(
+            jbi_case_report_data.read_input_file(os.path.join(DATA_DIR, "sample_jbi_case_report.csv"))),
+        grade.process_grade(grade.read_input_file(os.path.join(DATA_DIR, "sample_grade.csv"))),
+    ]
+    for df in frames:
+        with shared_frame(df) as handle:
+            attached = attach_frame(handle)
+            pd.testing.assert_frame_equal(attached, df)
+            assert len(pickle.dumps(handle)) < len(pickle.dumps(df))
+
+    nos = frames[0]
+    with shared_frame(nos) as handle:
+        assert not attach_frame(handle)["Total Score"].to_numpy().flags.writeable
+        if fork_context() is not None:
+            with ProcessPoolExecutor(max_workers=1, mp_context=fork_context()) as pool:
+                total, overall = pool.submit(_attached_total, handle).result()
+            assert total == nos["Total Score"].sum()
+            assert overall == nos["Overall RoB"].tolist()